@@ -0,0 +1,149 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+from rest_framework import status
+
+from utils.async_views import AsyncAPIView
+from utils.cache_mixins import CachedResponseMixin
+from books.filters import cached_facet_counts, filter_books
+from books.models import BookCategory
+from books.serializers import BookSerializer, BookCategorySerializer
+from interactions.serializers import CommentSerializer
+from .book_apis import (
+    BookCategoryListAPIView,
+    BookDetailAPIView,
+    BookFilterAPIView,
+    BookFilterMixin,
+    BookListForCategoryAPIView,
+    BookSearchAPIView,
+    UserStatusMixin,
+)
+from .interaction_apis import CommentsForBookAPIView
+
+
+class AsyncBookCategoryListView(CachedResponseMixin, AsyncAPIView):
+    """Async view for listing book categories."""
+    sync_view = BookCategoryListAPIView
+
+    async def get(self, request):
+        """Get list of all book categories."""
+        async def compute():
+            categories = [category async for category in BookCategory.objects.all()]
+            return BookCategorySerializer(categories, many=True).data
+
+        return self.render(await self.aget_cached_data(compute))
+
+
+class AsyncBookListForCategoryView(UserStatusMixin, CachedResponseMixin, AsyncAPIView):
+    """Async view for listing books in a specific category."""
+    sync_view = BookListForCategoryAPIView
+
+    async def get(self, request, category_id):
+        """Get paginated list of books for a specific category."""
+        async def compute():
+            category = await aget_object_or_404(BookCategory, id=category_id)
+            books = self.sync_view.books_query(category)
+            pagination = self.pagination_class()
+            result_page = await pagination.apaginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        return self.render(await self.awith_user_statuses(
+            request,
+            await self.aget_cached_data(compute),
+        ))
+
+
+class AsyncBookDetailView(CachedResponseMixin, AsyncAPIView):
+    """Async view for book details."""
+    sync_view = BookDetailAPIView
+    authentication_required = True
+
+    async def get(self, request, book_id):
+        """Get details of a specific book."""
+        async def compute():
+            book = await aget_object_or_404(self.sync_view.book_query(), id=book_id)
+            return BookSerializer(book).data
+
+        book_data = await self.aget_cached_data(compute)
+        response_data = dict(book_data)
+        response_data.update(BookDetailAPIView.finish_user_overlay(
+            await BookDetailAPIView.user_overlay_query(request.user, book_id).afirst()
+        ))
+        return self.render(response_data)
+
+
+class AsyncBookSearchView(UserStatusMixin, CachedResponseMixin, AsyncAPIView):
+    """Async view for searching books."""
+    sync_view = BookSearchAPIView
+
+    async def get(self, request):
+        """Search books by query."""
+        query = request.query_params.get('query', '').strip()
+
+        async def compute():
+            # The SQLite index is read with a raw cursor, so the lookup
+            # itself runs in a thread.
+            books = await sync_to_async(self.sync_view.books_query)(query)
+            pagination = self.pagination_class()
+            result_page = await pagination.apaginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        return self.render(await self.awith_user_statuses(
+            request,
+            await self.aget_cached_data(compute),
+        ))
+
+
+class AsyncBookFilterView(BookFilterMixin, UserStatusMixin, CachedResponseMixin, AsyncAPIView):
+    """Async view for filtering books."""
+    sync_view = BookFilterAPIView
+
+    async def get(self, request):
+        """Filter books by price range, category id, author and context."""
+        message = self.parse_filters(request)
+        if message is not None:
+            return self.render({'message': message}, status.HTTP_400_BAD_REQUEST)
+
+        async def compute():
+            books = filter_books(self.filters)
+            pagination = self.pagination_class()
+            result_page = await pagination.apaginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        data = await self.awith_user_statuses(
+            request,
+            await self.aget_cached_data(compute),
+        )
+        if self.wants_facets(request):
+            data = {**data, 'facets': await sync_to_async(cached_facet_counts)(self.filters)}
+        return self.render(data)
+
+
+class AsyncCommentsForBookView(CachedResponseMixin, AsyncAPIView):
+    """Async view for listing comments for a book."""
+    sync_view = CommentsForBookAPIView
+
+    async def get(self, request, book_id):
+        """Get paginated list of comments for a specific book."""
+        async def compute():
+            comments = self.sync_view.comments_query(book_id)
+            pagination = self.pagination_class()
+            result_page = await pagination.apaginate_queryset(comments, request, view=self)
+            serializer = CommentSerializer(result_page, many=True)
+            return pagination.get_paginated_response(serializer.data).data
+
+        return self.render(await self.aget_cached_data(compute))
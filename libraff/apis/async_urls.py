@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import urls
+from .async_apis import *
+
+app_name = 'apis'
+
+# Served under ASGI (see ASGI_URLCONF): the hot read endpoints resolve to
+# their async views first, every other route to the usual DRF view.
+urlpatterns = [
+    path('categories/', AsyncBookCategoryListView.as_view(), name='categories'),
+    path('categories/<int:category_id>/books/', AsyncBookListForCategoryView.as_view(), name='category-books'),
+    path('book/<int:book_id>/', AsyncBookDetailView.as_view(), name='book-detail'),
+    path('books/search/', AsyncBookSearchView.as_view(), name='book-search'),
+    path('books/filter/', AsyncBookFilterView.as_view(), name='book-filter'),
+    path('book/<int:book_id>/comments/', AsyncCommentsForBookView.as_view(), name='comments-for-book'),
+] + urls.urlpatterns
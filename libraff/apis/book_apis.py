@@ -1,14 +1,21 @@
-import hashlib
 from rest_framework.views import APIView, Response, status
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
 
-from libraff.settings import CACHETIMEOUT
+from utils.cache_mixins import CachedResponseMixin
 from utils.custom_pagination import CustomPagination
+from utils.file_delivery import serve_file
+from utils.streaming import JSON, NDJSON, stream_export
+from books import trending
+from books.content_index import content_index
+from books.filters import FILTER_PARAMS, cached_facet_counts, filter_books, normalize_filters
 from books.models import Book, BookCategory, UserBookStatus
+from books.search import search_books
+from interactions.models import Like
+from favorites.models import Favorite
 from books.serializers import (
     BookSerializer,
     BookCategorySerializer,
@@ -16,104 +23,317 @@ from books.serializers import (
 )
 
 
-class BookCategoryListAPIView(APIView):
+class UserStatusMixin:
+    """
+    Adds the requesting user's reading status to a cached page of books.
+
+    The cached page is shared by every user and built with an empty
+    ``user_statuses`` context, so the serializer runs no status queries;
+    the statuses of the whole page are then fetched in one query.
+    """
+    serializer_context = {'user_statuses': {}}
+
+    def with_user_statuses(self, request, page):
+        if not request.user.is_authenticated or not page['results']:
+            return page
+        return self.merge_user_statuses(page, UserBookStatus.statuses_for(
+            request.user,
+            [book['id'] for book in page['results']],
+        ))
+
+    async def awith_user_statuses(self, request, page):
+        if not request.user.is_authenticated or not page['results']:
+            return page
+        return self.merge_user_statuses(page, await UserBookStatus.astatuses_for(
+            request.user,
+            [book['id'] for book in page['results']],
+        ))
+
+    @staticmethod
+    def merge_user_statuses(page, user_statuses):
+        if not user_statuses:
+            return page
+        page = dict(page)
+        page['results'] = [
+            {**book, 'user_status': user_statuses[book['id']]}
+            if book['id'] in user_statuses else book
+            for book in page['results']
+        ]
+        return page
+
+
+class BookCategoryListAPIView(CachedResponseMixin, APIView):
     """API view for listing book categories."""
     permission_classes = [AllowAny]
+    cache_family = 'Book_category_list'
+    cache_depends_on = ('Book_category_list',)
+    query_budget = 2
 
     def get(self, request):
         """Get list of all book categories."""
-        cache_key = 'Book_category_list'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        try:
+        def compute():
             category = BookCategory.objects.all()
-            serializer = BookCategorySerializer(category, many=True)
-            cache.set(cache_key, serializer.data, timeout=CACHETIMEOUT)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except BookCategory.DoesNotExist:
-            return Response(
-                {'message': 'Categories not found'},
-                status=status.HTTP_404_NOT_FOUND,
-            )
+            return BookCategorySerializer(category, many=True).data
+
+        data = self.get_cached_data(compute)
+        return Response(data, status=status.HTTP_200_OK)
 
 
-class BookListForCategoryAPIView(APIView):
+class BookListForCategoryAPIView(UserStatusMixin, CachedResponseMixin, APIView):
     """API view for listing books in a specific category."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'Book_list_for_category'
+    cache_vary_on = ('category_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('Book_list_for_category_{category_id}',)
+    query_budget = 5
 
     def get(self, request, category_id):
         """Get paginated list of books for a specific category."""
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = (
-            f'Book_list_for_category_{category_id}_'
-            f'page_{page}_size_{page_size}'
-        )
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
+        def compute():
+            category = get_object_or_404(BookCategory, id=category_id)
+            books = self.books_query(category)
+            pagination = self.pagination_class()
+            result_page = pagination.paginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
 
-        category = get_object_or_404(BookCategory, id=category_id)
-        books = Book.objects.filter(category=category).order_by('-created_at')
-        pagination = self.pagination_class()
-        result_page = pagination.paginate_queryset(books, request)
-        serializer = BookSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        paginated_response = self.with_user_statuses(
+            request,
+            self.get_cached_data(compute),
+        )
         return Response(paginated_response, status=status.HTTP_200_OK)
 
+    @staticmethod
+    def books_query(category):
+        """The books of ``category``, newest first; shared with the async view."""
+        return (
+            Book.objects.filter(category=category)
+            .select_related('category')
+            .order_by('-created_at', '-id')
+        )
+
+
+class TrendingBooksMixin(UserStatusMixin):
+    """
+    Serves a trending board: ``?window=`` one of ``trending.WINDOWS``
+    (default 24h) and ``?limit=`` up to ``TRENDING_MAX_RESULTS`` books. The
+    ranking is read from a sorted set, then the books in one query.
+    """
+    default_limit = 20
+
+    def trending_response(self, request, category_id=None):
+        window = request.query_params.get('window', '24h')
+        if window not in trending.WINDOWS:
+            return Response(
+                {'window': f'Choose one of {", ".join(trending.WINDOWS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= settings.TRENDING_MAX_RESULTS:
+            return Response(
+                {'limit': f'Must be between 1 and {settings.TRENDING_MAX_RESULTS}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scores = trending.top(window, limit, category_id)
+        if not scores and category_id is not None:
+            get_object_or_404(BookCategory, id=category_id)
+        books = Book.objects.select_related('category').in_bulk([book_id for book_id, _ in scores])
+        results = [
+            {
+                **BookSerializer(books[book_id], context=self.serializer_context).data,
+                'trending_score': round(score, 3),
+            }
+            for book_id, score in scores
+            # Deleted since it was scored.
+            if book_id in books
+        ]
+        return Response(
+            self.with_user_statuses(request, {'window': window, 'results': results}),
+            status=status.HTTP_200_OK,
+        )
+
+
+class TrendingBooksAPIView(TrendingBooksMixin, APIView):
+    """API view for the most popular books right now."""
+    permission_classes = [AllowAny]
+    query_budget = 3
+
+    def get(self, request):
+        """Get the trending books of a window."""
+        return self.trending_response(request)
+
+
+class TrendingBooksForCategoryAPIView(TrendingBooksMixin, APIView):
+    """API view for the most popular books of a category right now."""
+    permission_classes = [AllowAny]
+    query_budget = 3
+
+    def get(self, request, category_id):
+        """Get the trending books of a category in a window."""
+        return self.trending_response(request, category_id)
+
+
+class SimilarBooksAPIView(UserStatusMixin, CachedResponseMixin, APIView):
+    """
+    API view for the books readers of a book also liked, topped up with the
+    books closest to it by text when readers have not settled on enough.
+    """
+    permission_classes = [AllowAny]
+    cache_family = 'Book_similar'
+    cache_vary_on = ('book_id',)
+    cache_depends_on = ('Book_similar', 'Book_similar_{book_id}')
+    query_budget = 4
 
-class BookListAPIView(APIView):
+    def get(self, request, book_id):
+        """Get the neighbours of a book, readers' picks first, most similar first."""
+        def compute():
+            book = get_object_or_404(
+                Book.objects.select_related('similar_books'),
+                id=book_id,
+            )
+            similar = getattr(book, 'similar_books', None)
+            count = settings.RECOMMENDATIONS_NEIGHBOURS
+            pairs = [
+                (neighbour_id, score, 'readers')
+                for neighbour_id, score in (similar.neighbours if similar else [])
+            ]
+            if len(pairs) < count:
+                # Works for books nobody has interacted with, or that are not indexed yet.
+                taken = {neighbour_id for neighbour_id, _, _ in pairs}
+                pairs += [
+                    (neighbour_id, score, 'content')
+                    for neighbour_id, score in content_index.neighbours([book], count + len(taken))[0]
+                    if neighbour_id not in taken
+                ][:count - len(pairs)]
+            books = Book.objects.select_related('category').in_bulk(
+                [neighbour_id for neighbour_id, _, _ in pairs],
+            )
+            return {
+                'results': [
+                    {
+                        **BookSerializer(books[neighbour_id], context=self.serializer_context).data,
+                        'similarity': similarity,
+                        'source': source,
+                    }
+                    for neighbour_id, similarity, source in pairs
+                    # Deleted since the neighbours were computed.
+                    if neighbour_id in books
+                ],
+            }
+
+        data = self.with_user_statuses(request, self.get_cached_data(compute))
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class BookListAPIView(UserStatusMixin, CachedResponseMixin, APIView):
     """API view for listing all books."""
     permission_classes = [AllowAny]
+    pagination_class = CustomPagination
+    cache_family = 'Book_list'
+    cache_vary_on = ('page', 'page_size', 'cursor')
+    cache_depends_on = ('Book_list',)
+    query_budget = 4
 
     def get(self, request):
-        """Get list of all books."""
-        cache_key = 'Book_list'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        try:
-            books = Book.objects.all().order_by('-created_at')
-            serializer = BookCategorySerializer(books, many=True)
-            cache.set(cache_key, serializer.data, timeout=CACHETIMEOUT)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Book.DoesNotExist:
-            return Response(
-                {'message': 'Books not found'},
-                status=status.HTTP_404_NOT_FOUND,
+        """Get paginated list of all books, or the whole catalog with ?export=."""
+        export_format = request.query_params.get('export')
+        if export_format is not None:
+            if export_format not in (NDJSON, JSON):
+                return Response(
+                    {'message': f'export must be {NDJSON} or {JSON}'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            books = Book.objects.select_related('category').order_by('id')
+            return stream_export(
+                books,
+                BookSerializer,
+                export_format,
+                context=self.serializer_context,
             )
 
+        def compute():
+            books = Book.objects.select_related('category').order_by('-created_at', '-id')
+            pagination = self.pagination_class()
+            result_page = pagination.paginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.with_user_statuses(
+            request,
+            self.get_cached_data(compute),
+        )
+        return Response(paginated_response, status=status.HTTP_200_OK)
+
 
-class BookDetailAPIView(APIView):
+class BookDetailAPIView(CachedResponseMixin, APIView):
     """API view for book details."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    cache_family = 'Book_detail'
+    cache_vary_on = ('book_id',)
+    cache_depends_on = ('Book_detail_{book_id}',)
+    query_budget = {'GET': 4}
 
     def get(self, request, book_id):
         """Get details of a specific book."""
-        user = request.user
-        cache_key = f'Book_detail_{book_id}_user_{user.id}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        book = get_object_or_404(Book, id=book_id)
-        serializer = BookSerializer(book)
-        cache.set(cache_key, serializer.data, timeout=CACHETIMEOUT)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def compute():
+            book = get_object_or_404(self.book_query(), id=book_id)
+            return BookSerializer(book).data
+
+        book_data = self.get_cached_data(compute)
+        response_data = dict(book_data)
+        response_data.update(self.get_user_overlay(request.user, book_id))
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def book_query():
+        """Books as the detail payload reads them; shared with the async view."""
+        return Book.objects.select_related('category')
+
+    def get_user_overlay(self, user, book_id):
+        """Get the per-user part of the book detail in one query."""
+        return self.finish_user_overlay(self.user_overlay_query(user, book_id).first())
+
+    @staticmethod
+    def user_overlay_query(user, book_id):
+        return Book.objects.filter(id=book_id).annotate(
+            user_status=Subquery(
+                UserBookStatus.objects.filter(
+                    user=user,
+                    book=OuterRef('pk'),
+                ).values('status')[:1]
+            ),
+            is_liked=Exists(Like.objects.filter(user=user, book=OuterRef('pk'))),
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, book=OuterRef('pk'))
+            ),
+        ).values('user_status', 'is_liked', 'is_favorited')
+
+    @staticmethod
+    def finish_user_overlay(overlay):
+        overlay = overlay or {}
+        if overlay.get('user_status') is None:
+            overlay['user_status'] = UserBookStatus.UNREAD
+        return overlay
        
     def patch(self, request, book_id):
         """Update book status for a user."""
         user = request.user
         book = get_object_or_404(Book, id=book_id)
-        book_status = UserBookStatus.objects.get_or_create(
+        book_status, _ = UserBookStatus.objects.get_or_create(
             user=user,
             book=book,
         )
@@ -124,6 +344,7 @@ class BookDetailAPIView(APIView):
             context={'request': request},
         )
         if serializer.is_valid():
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -132,6 +353,7 @@ class BookDownloadAPIView(APIView):
     """API view for downloading books."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def get(self, request, book_id):
         """Download a specific book."""
@@ -141,97 +363,112 @@ class BookDownloadAPIView(APIView):
                 {'message': 'File is not available'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-          
-        response = FileResponse(
-            book.pdf.open(),
-            as_attachment=True,
-            filename=f'{book.title}.pdf',
-        )
-        return response
 
+        return serve_file(request, book.pdf, f'{book.title}.pdf')
 
-class BookSearchAPIView(APIView):
+
+class BookSearchAPIView(UserStatusMixin, CachedResponseMixin, APIView):
     """API view for searching books."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'Book_search'
+    cache_vary_on = ('query', 'page', 'page_size')
+    cursor_ordering = None
+    cache_depends_on = ('Book_search',)
+    query_budget = 5
 
     def get(self, request):
         """Search books by query."""
-        query = request.query_params.get('query', '')
-        page = request.query_params.get('page', '1')
-        page_size = request.query_params.get('page_size', '10')
-        cache_key = (
-            f'Book_search_query_{query}_'
-            f'page_{page}_size_{page_size}'
-        )
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
+        query = request.query_params.get('query', '').strip()
 
-        books = (
-            Book.objects.filter(title__icontains=query).order_by('-created_at')
-            if query else Book.objects.all()
+        def compute():
+            books = self.books_query(query)
+            pagination = self.pagination_class()
+            result_page = pagination.paginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.with_user_statuses(
+            request,
+            self.get_cached_data(compute),
         )
-        pagination = self.pagination_class()
-        result_page = pagination.paginate_queryset(books, request)
-        serializer = BookSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
+    @staticmethod
+    def books_query(query: str):
+        """Books matching ``query``, or all of them; shared with the async view."""
+        books = search_books(query) if query else Book.objects.order_by('id')
+        return books.select_related('category')
+
+
+class BookFilterMixin:
+    """
+    Parses the filter query parameters of the filter views once per request
+    and keys their cache entries by the normalized filter, so every spelling
+    of the same filter shares one entry. ``?facets=true`` adds facet counts.
+    """
 
-class BookFilterAPIView(APIView):
+    def parse_filters(self, request):
+        """Set ``self.filters``; returns an error message for a bad filter."""
+        try:
+            self.filters = normalize_filters(request.query_params)
+        except ValueError as exc:
+            return str(exc)
+        return None
+
+    def get_cache_params(self) -> dict:
+        params = super().get_cache_params()
+        params.update({name: self.filters.get(name) for name in FILTER_PARAMS})
+        return params
+
+    @staticmethod
+    def wants_facets(request) -> bool:
+        return request.query_params.get('facets', '').strip().lower() in ('1', 'true')
+
+
+class BookFilterAPIView(BookFilterMixin, UserStatusMixin, CachedResponseMixin, APIView):
     """API view for filtering books."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'Book_filter'
+    cache_vary_on = (
+        'price_from',
+        'price_to',
+        'category',
+        'author',
+        'context',
+        'page',
+        'page_size',
+        'cursor',
+    )
+    cache_depends_on = ('Book_filter',)
+    query_budget = 5
 
     def get(self, request, *args, **kwargs):
-        """Filter books by various criteria."""
+        """Filter books by price range, category id, author and context."""
+        message = self.parse_filters(request)
+        if message is not None:
+            return Response({'message': message}, status=status.HTTP_400_BAD_REQUEST)
         pagination = self.pagination_class()
-        data = request.query_params
-        price_from = data.get('price_from')
-        price_to = data.get('price_to')
-        for_category = data.get('category')
-        for_author = data.get('author')
-        for_context = data.get('context')
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-
-        cache_key = hashlib.md5(
-            (
-                f'Book_filter_price_from_{price_from}_'
-                f'price_to_{price_to}_'
-                f'cat_{for_category}_'
-                f'auth_{for_author}_'
-                f'context_{for_context}_'
-                f'page_{page}_'
-                f'size_{page_size}'
-            ).encode('utf-8')
-        ).hexdigest()
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-
-        books = Book.objects.all()
-        if price_from:
-            books = books.filter(price__gte=price_from)
-        if price_to:
-            books = books.filter(price__lte=price_to)
-        if for_category:
-            books = books.filter(category__icontains=for_category)
-        if for_author:
-            books = books.filter(author__icontains=for_author)
-        if for_context:
-            books = books.filter(context__icontains=for_context)
-
-        result_page = pagination.paginate_queryset(books, request)
-        serializer = BookSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
-        return Response(paginated_response, status=status.HTTP_200_OK)
 
+        def compute():
+            books = filter_books(self.filters)
+            result_page = pagination.paginate_queryset(books, request, view=self)
+            serializer = BookSerializer(
+                result_page,
+                many=True,
+                context=self.serializer_context,
+            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.with_user_statuses(
+            request,
+            self.get_cached_data(compute),
+        )
+        if self.wants_facets(request):
+            paginated_response = {**paginated_response, 'facets': cached_facet_counts(self.filters)}
+        return Response(paginated_response, status=status.HTTP_200_OK)
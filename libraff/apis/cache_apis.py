@@ -0,0 +1,45 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView, Response, status
+from rest_framework.permissions import IsAdminUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from utils import cache_stampede
+from utils.cache_mixins import cached_families
+from utils.cache_stats import family_stats
+from utils.permission_control import MetricsTokenPermission
+from utils.request_metrics import render_prometheus, request_metrics, routed_views
+from utils.tiered_cache import tiered_cache
+
+
+class CacheStatsAPIView(APIView):
+    """API view for cache statistics of the serving process."""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+    query_budget = 1
+
+    def get(self, request):
+        """Get per-tier, recompute and per-key-family counters."""
+        family_stats.flush()
+        return Response(
+            {
+                'families': family_stats.collect(cached_families()),
+                'tiers': tiered_cache.stats(),
+                'recompute': cache_stampede.stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class MetricsAPIView(APIView):
+    """Prometheus scrape endpoint for the per-view request timings."""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser | MetricsTokenPermission]
+    query_budget = 1
+
+    def get(self, request):
+        """Get latency histograms and query/cache counters in text format."""
+        request_metrics.flush()
+        return HttpResponse(
+            render_prometheus(request_metrics.collect(routed_views())),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
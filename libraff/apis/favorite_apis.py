@@ -1,25 +1,31 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.db import transaction
-from django.core.cache import cache
 
-from libraff.settings import CACHETIMEOUT
+from utils.cache_mixins import CachedResponseMixin
 from utils.custom_pagination import CustomPagination
 from utils.permission_control import OwnerOrAdminPermission
+from utils.upsert import insert_counted
 from books.models import Book
 from users.models import CustomerUser
 from favorites.models import Favorite
 from favorites.serializers import FavoriteSerializer
 
 
-class OpenFavoriteListForUserAPIView(APIView):
+class OpenFavoriteListForUserAPIView(CachedResponseMixin, APIView):
     """API view for listing user's open favorites."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'User_open_favorites'
+    cache_vary_on = ('user_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('User_{user_id}_open_favorites',)
+    query_budget = 4
 
     def get(self, request, user_id):
         """Get paginated list of user's open favorites."""
@@ -27,31 +33,27 @@ class OpenFavoriteListForUserAPIView(APIView):
         favorites = Favorite.objects.filter(
             user=user,
             status=Favorite.OPEN,
-        ).order_by('-created_at')
+        ).order_by('-created_at', '-id')
         
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'User_{user_id}_open_favorites_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-      
-        pagination = self.pagination_class()
-        result_page = pagination.paginate_queryset(favorites, request)
-        serializer = FavoriteSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        def compute():
+            pagination = self.pagination_class()
+            result_page = pagination.paginate_queryset(favorites, request, view=self)
+            serializer = FavoriteSerializer(result_page, many=True)
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.get_cached_data(compute)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
 
-class PrivateFavoriteListForUserAPIView(APIView):
+class PrivateFavoriteListForUserAPIView(CachedResponseMixin, APIView):
     """API view for listing user's private favorites."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, OwnerOrAdminPermission]
     pagination_class = CustomPagination
+    cache_family = 'User_private_favorites'
+    cache_vary_on = ('user_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('User_{user_id}_private_favorites',)
+    query_budget = 4
 
     def get(self, request, user_id):
         """Get paginated list of user's private favorites."""
@@ -59,51 +61,42 @@ class PrivateFavoriteListForUserAPIView(APIView):
         favorites = Favorite.objects.filter(
             user=user,
             status=Favorite.PRIVATE,
-        ).order_by('-created_at')
-        
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'User_{user_id}_private_favorites_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
+        ).order_by('-created_at', '-id')
         
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-      
-        pagination = self.pagination_class()
-        result_page = pagination.paginate_queryset(favorites, request)
-        serializer = FavoriteSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        def compute():
+            pagination = self.pagination_class()
+            result_page = pagination.paginate_queryset(favorites, request, view=self)
+            serializer = FavoriteSerializer(result_page, many=True)
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.get_cached_data(compute)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
 
-class FavoriteDetailAPIView(APIView):
+class FavoriteDetailAPIView(CachedResponseMixin, APIView):
     """API view for favorite details."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, OwnerOrAdminPermission]
+    cache_family = 'Favorite_detail'
+    cache_vary_on = ('favorite_id',)
+    cache_depends_on = ('Favorite_detail_{favorite_id}',)
+    query_budget = 2
 
     def get(self, request, favorite_id):
         """Get details of a specific favorite."""
         user = request.user
         favorite = get_object_or_404(Favorite, id=favorite_id)
-        cache_key = f'Favorite_detail_{favorite_id}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-
-        if favorite.status == favorite.PRIVATE and favorite.user != user:
+        if favorite.status == favorite.PRIVATE and favorite.user_id != user.id:
             return Response(
                 {'message': 'Authentication required for private favorites'},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        if favorite.status == favorite.OPEN or favorite.user == user:
-            serializer = FavoriteSerializer(favorite)
-            cache.set(cache_key, serializer.data, timeout=CACHETIMEOUT)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        if favorite.status == favorite.OPEN or favorite.user_id == user.id:
+            data = self.get_cached_data(
+                lambda: FavoriteSerializer(favorite).data,
+            )
+            return Response(data, status=status.HTTP_200_OK)
 
 
 class CreateFavoriteAPIView(APIView):
@@ -112,29 +105,37 @@ class CreateFavoriteAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, book_id):
-        """Create a new favorite for a book."""
+        """
+        Favorite a book. Idempotent: a repeated or concurrent request gets
+        the existing favorite back with 200 instead of an error.
+        """
         user = request.user
-        serializer = FavoriteSerializer(data=request.data)
-        book = get_object_or_404(Book, id=book_id)
-        
-        if Favorite.objects.filter(user=user, book=book).exists():
-            return Response(
-                {'message': 'Already favorited'},
-                status=status.HTTP_400_BAD_REQUEST,
+        try:
+            favorite_status = FavoriteSerializer().fields['status'].run_validation(
+                request.data.get('status', Favorite.OPEN),
             )
-        
-        with transaction.atomic():
-            if serializer.is_valid():
-                serializer.save(user=user, book=book)
-                return Response(
-                    serializer.data,
-                    status=status.HTTP_201_CREATED,
-                )
+        except serializers.ValidationError as exc:
             return Response(
-                serializer.errors,
+                {'status': exc.detail},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        values = {
+            'user_id': user.id,
+            'book_id': book_id,
+            'status': favorite_status,
+            'created_at': timezone.now(),
+        }
+        try:
+            favorite, _ = insert_counted(Favorite, values, Book, book_id, 'favorites_count')
+        except Book.DoesNotExist:
+            raise Http404
+
+        if favorite is None:
+            favorite = Favorite.objects.get(user=user, book_id=book_id)
+            return Response(FavoriteSerializer(favorite).data, status=status.HTTP_200_OK)
+        return Response(FavoriteSerializer(favorite).data, status=status.HTTP_201_CREATED)
+
 
 class FavoriteManagementAPIView(APIView):
     """API view for managing favorites."""
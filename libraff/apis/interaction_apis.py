@@ -1,62 +1,75 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.db import transaction
-from django.core.cache import cache
 
-from libraff.settings import CACHETIMEOUT
+from utils.cache_mixins import CachedResponseMixin
 from utils.custom_pagination import CustomPagination
 from utils.permission_control import OwnerOrAdminPermission
+from utils.upsert import delete_counted, insert_counted
 from books.models import Book
 from users.models import CustomerUser
+from interactions import like_buffer
 from interactions.models import Comment, Like
 from interactions.serializers import CommentSerializer, LikeSerializer
 
 
-class CommentsForBookAPIView(APIView):
+class CommentsForBookAPIView(CachedResponseMixin, APIView):
     """API view for listing comments for a book."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'Book_comments'
+    cache_vary_on = ('book_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('Book_{book_id}_comments',)
+    query_budget = 3
 
     def get(self, request, book_id):
         """Get paginated list of comments for a specific book."""
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'Book_{book_id}_comments_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        comments = Comment.objects.filter(book_id=book_id)
-        pagination = self.pagination_class()
-        result_page = pagination.paginate_queryset(comments, request)
-        serializer = CommentSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        def compute():
+            comments = self.comments_query(book_id)
+            pagination = self.pagination_class()
+            result_page = pagination.paginate_queryset(comments, request, view=self)
+            serializer = CommentSerializer(result_page, many=True)
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.get_cached_data(compute)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
+    @staticmethod
+    def comments_query(book_id):
+        """The comments of a book, newest first; shared with the async view."""
+        return (
+            Comment.objects.filter(book_id=book_id)
+            .select_related('user')
+            .order_by('-created_at', '-id')
+        )
+
 
-class CommentDetailAPIView(APIView):
+class CommentDetailAPIView(CachedResponseMixin, APIView):
     """API view for comment details."""
     permission_classes = [AllowAny]
+    cache_family = 'Comment_detail'
+    cache_vary_on = ('book_id', 'comment_id')
+    cache_depends_on = ('Comment_detail_{comment_id}',)
+    query_budget = 2
 
-    def get(self, request, comment_id):
+    def get(self, request, book_id, comment_id):
         """Get details of a specific comment."""
-        user = request.user
-        cache_key = f'Comment_detail_{comment_id}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
+        def compute():
+            comment = get_object_or_404(
+                Comment.objects.select_related('user'),
+                id=comment_id,
+                book_id=book_id,
+            )
+            return CommentSerializer(comment).data
 
-        comment = get_object_or_404(Comment, id=comment_id)
-        serializer = CommentSerializer(comment)
-        cache.set(cache_key, serializer.data, timeout=CACHETIMEOUT)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = self.get_cached_data(compute)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class CreateCommentAPIView(APIView):
@@ -125,165 +138,156 @@ class CommentManagementAPIView(APIView):
             )
 
 
-class CommentListForUserAPIView(APIView):
+class CommentListForUserAPIView(CachedResponseMixin, APIView):
     """API view for listing user's comments."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, OwnerOrAdminPermission]
     pagination_class = CustomPagination
+    cache_family = 'User_comments'
+    cache_vary_on = ('user_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('User_{user_id}_comments',)
+    query_budget = 4
 
     def get(self, request, user_id):
         """Get paginated list of comments by a specific user."""
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'User_{user_id}_comments_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-
-        pagination = self.pagination_class()
-        user = get_object_or_404(CustomerUser, id=user_id)
-        comment = Comment.objects.filter(user=user)
-        result_page = pagination.paginate_queryset(comment, request)
-        serializer = CommentSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        def compute():
+            pagination = self.pagination_class()
+            user = get_object_or_404(CustomerUser, id=user_id)
+            comment = (
+                Comment.objects.filter(user=user)
+                .select_related('user')
+                .order_by('-created_at', '-id')
+            )
+            result_page = pagination.paginate_queryset(comment, request, view=self)
+            serializer = CommentSerializer(result_page, many=True)
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.get_cached_data(compute)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
 
-class LikeListForBookAPIView(APIView):
+class LikeListForBookAPIView(CachedResponseMixin, APIView):
     """API view for listing likes for a book."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'Likes_for_book'
+    cache_vary_on = ('book_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('Likes_for_book_{book_id}',)
+    query_budget = 4
 
     def get(self, request, book_id):
         """Get paginated list of likes for a specific book."""
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'Likes_for_book_{book_id}_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        pagination = self.pagination_class()
-        book = get_object_or_404(Book, id=book_id)
-        likes = Like.objects.filter(book=book)
-        like_count = likes.count()
-        result_page = pagination.paginate_queryset(likes, request)
-        serializer = LikeSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        paginated_response['like_count'] = like_count
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        def compute():
+            pagination = self.pagination_class()
+            book = get_object_or_404(Book, id=book_id)
+            likes = Like.objects.filter(book=book).order_by('-created_at', '-id')
+            like_count = book.likes_count
+            result_page = pagination.paginate_queryset(likes, request, view=self)
+            serializer = LikeSerializer(result_page, many=True)
+            paginated_response = pagination.get_paginated_response(
+                serializer.data,
+            ).data
+            paginated_response['like_count'] = like_count
+            return paginated_response
+
+        paginated_response = self.get_cached_data(compute)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
 
-class LikeListForCommentAPIView(APIView):
+class LikeListForCommentAPIView(CachedResponseMixin, APIView):
     """API view for listing likes for a comment."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'Likes_for_comment'
+    cache_vary_on = ('comment_id', 'page', 'page_size', 'cursor')
+    cache_depends_on = ('Likes_for_comment_{comment_id}',)
+    query_budget = 4
 
     def get(self, request, comment_id):
         """Get paginated list of likes for a specific comment."""
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'Likes_for_comment_{comment_id}_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        pagination = self.pagination_class()
-        comment = get_object_or_404(Comment, id=comment_id)
-        likes = Like.objects.filter(comment=comment)
-        like_count = likes.count()
-        result_page = pagination.paginate_queryset(likes, request)
-        serializer = LikeSerializer(result_page, many=True)
-        paginated_response = pagination.get_paginated_response(
-            serializer.data,
-        ).data
-        paginated_response['like_count'] = like_count
-        cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
+        def compute():
+            pagination = self.pagination_class()
+            comment = get_object_or_404(Comment, id=comment_id)
+            likes = Like.objects.filter(comment=comment).order_by('-created_at', '-id')
+            like_count = comment.likes_count
+            result_page = pagination.paginate_queryset(likes, request, view=self)
+            serializer = LikeSerializer(result_page, many=True)
+            paginated_response = pagination.get_paginated_response(
+                serializer.data,
+            ).data
+            paginated_response['like_count'] = like_count
+            return paginated_response
+
+        paginated_response = self.get_cached_data(compute)
         return Response(paginated_response, status=status.HTTP_200_OK)
 
 
-class LikeManagementForBookAPIView(APIView):
+class LikeToggleMixin:
+    """
+    Idempotent like and unlike of one ``like_target``: POST makes sure the
+    user likes it, DELETE makes sure they don't, and both answer with the
+    resulting state. The row and the target's ``likes_count`` change
+    together (see ``utils.upsert``), so repeated and concurrent clicks are
+    no-ops rather than duplicate-key errors. With ``LIKE_WRITE_BEHIND`` the
+    click is buffered in Redis instead and answered with 202, and the same
+    body: ``like_count`` then includes the buffered clicks.
+    """
+    like_target = None
+
+    def set_like(self, request, target_id, liked: bool):
+        model = Like._meta.get_field(self.like_target).related_model
+        if like_buffer.enabled():
+            # Answered from Redis; the flush task writes it within seconds.
+            like_buffer.record(request.user.id, self.like_target, target_id, liked)
+            try:
+                like_count = like_buffer.buffered_count(self.like_target, target_id)
+            except model.DoesNotExist:
+                raise Http404
+            return Response(
+                {'is_liked': liked, 'like_count': like_count},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        values = {'user_id': request.user.id, f'{self.like_target}_id': target_id}
+        try:
+            if liked:
+                values['created_at'] = timezone.now()
+                _, like_count = insert_counted(Like, values, model, target_id, 'likes_count')
+            else:
+                _, like_count = delete_counted(Like, values, model, target_id, 'likes_count')
+        except model.DoesNotExist:
+            raise Http404
+        return Response(
+            {'is_liked': liked, 'like_count': like_count},
+            status=status.HTTP_200_OK,
+        )
+
+
+class LikeManagementForBookAPIView(LikeToggleMixin, APIView):
     """API view for managing likes on books."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    like_target = 'book'
 
     def post(self, request, book_id):
-        """Create a like for a book."""
-        user = request.user
-        book = get_object_or_404(Book, id=book_id)
-        if Like.objects.filter(user=user, book=book).exists():
-            return Response(
-                {'error': 'Already you liked this book'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        
-        with transaction.atomic():
-            like = Like.objects.create(user=user, book=book)
-            serializer = LikeSerializer(like)
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK,
-            )
-    
+        """Like a book."""
+        return self.set_like(request, book_id, liked=True)
+
     def delete(self, request, book_id):
-        """Delete a like from a book."""
-        user = request.user
-        book = get_object_or_404(Book, id=book_id)
-        like = Like.objects.filter(user=user, book=book).first()
-        if like:
-            like.delete()
-            return Response(
-                {'message': 'Like deleted successfully'},
-                status=status.HTTP_204_NO_CONTENT,
-            )
-        return Response(
-            {'error': 'Like not found'},
-            status=status.HTTP_404_NOT_FOUND,
-        )
+        """Remove a like from a book."""
+        return self.set_like(request, book_id, liked=False)
 
 
-class LikeManagementForCommentAPIView(APIView):
+class LikeManagementForCommentAPIView(LikeToggleMixin, APIView):
     """API view for managing likes on comments."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    like_target = 'comment'
 
     def post(self, request, comment_id):
-        """Create a like for a comment."""
-        user = request.user
-        comment = get_object_or_404(Comment, id=comment_id)
-        if Like.objects.filter(user=user, comment=comment).exists():
-            return Response(
-                {'error': 'Already you liked this comment'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        
-        with transaction.atomic():
-            like = Like.objects.create(user=user, comment=comment)
-            serializer = LikeSerializer(like)
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK,
-            )
-    
-    def delete(self, request, comment_id):
-        """Delete a like from a comment."""
-        user = request.user
-        comment = get_object_or_404(Comment, id=comment_id)
-        like = Like.objects.filter(user=user, comment=comment).first()
-        if like:
-            like.delete()
-            return Response(
-                {'message': 'Like deleted successfully'},
-                status=status.HTTP_204_NO_CONTENT,
-            )
-        return Response(
-            {'error': 'Like not found'},
-            status=status.HTTP_404_NOT_FOUND,
-        )
+        """Like a comment."""
+        return self.set_like(request, comment_id, liked=True)
 
+    def delete(self, request, comment_id):
+        """Remove a like from a comment."""
+        return self.set_like(request, comment_id, liked=False)
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks import dataset, report, runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every GET endpoint on a throwaway database seeded at the '
+        'given scale and save p50/p95/p99, query counts and bytes as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=dataset.SCALES, default='small')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', help='Defaults to benchmark-<scale>.json')
+        parser.add_argument('--compare', help='Baseline JSON to check this run against')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Allowed relative p95 slowdown before --compare fails',
+        )
+        parser.add_argument(
+            '--use-configured-cache',
+            action='store_true',
+            help='Benchmark against CACHES["default"] (cold runs clear it) '
+                 'instead of a private in-memory cache',
+        )
+
+    def handle(self, *args, **options):
+        caches = None if options['use_configured_cache'] else {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(**({'CACHES': caches} if caches else {})):
+                self.stdout.write(f'Seeding the {options["scale"]} dataset...')
+                ids = dataset.seed(options['scale'], options['seed'])
+                samples = runner.run(ids, options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        result = report.summarize(samples, {
+            'scale': options['scale'],
+            'seed': options['seed'],
+            'iterations': options['iterations'],
+        })
+        self.print_table(result)
+        output = options['output'] or f'benchmark-{options["scale"]}.json'
+        report.save(result, output)
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {output}'))
+
+        if options['compare']:
+            regressions = report.compare(
+                report.load(options['compare']),
+                result,
+                options['threshold'],
+            )
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def print_table(self, result):
+        self.stdout.write(
+            f'{"route":<40}{"mode":<6}{"status":>7}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"p99 ms":>9}{"queries":>9}{"bytes":>10}'
+        )
+        for name, route in result['routes'].items():
+            for mode in report.MODES:
+                row = route[mode]
+                self.stdout.write(
+                    f'{name:<40}{mode:<6}{row["status"]:>7}{row["p50_ms"]:>9.2f}'
+                    f'{row["p95_ms"]:>9.2f}{row["p99_ms"]:>9.2f}'
+                    f'{row["queries"]:>9}{row["bytes"]:>10}'
+                )
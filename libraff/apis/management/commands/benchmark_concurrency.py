@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks import concurrency, dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the hot read endpoints with concurrent clients through the WSGI '
+        'handler (threads) and the ASGI handler (async views, one event loop) '
+        'on a throwaway database and compare throughput per core'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=dataset.SCALES, default='small')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per handler')
+        parser.add_argument('--concurrency', type=int, default=50, help='Clients in flight')
+        parser.add_argument(
+            '--use-configured-cache',
+            action='store_true',
+            help='Load against CACHES["default"] (e.g. Redis, read with the async '
+                 'client under ASGI) instead of a private in-memory cache',
+        )
+
+    def handle(self, *args, **options):
+        overrides = {'QUERY_BUDGET_MODE': 'off'}
+        if not options['use_configured_cache']:
+            overrides['CACHES'] = {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            }
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(**overrides):
+                self.stdout.write(f'Seeding the {options["scale"]} dataset...')
+                ids = dataset.seed(options['scale'], options['seed'])
+                result = concurrency.run(ids, options['requests'], options['concurrency'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f'{"handler":<10}{"requests":>10}{"errors":>8}{"req/s":>10}'
+            f'{"req/cpu-s":>11}{"p50 ms":>9}{"p99 ms":>9}'
+        )
+        for handler, row in result.items():
+            self.stdout.write(
+                f'{handler:<10}{row["requests"]:>10}{row["errors"]:>8}{row["rps"]:>10.1f}'
+                f'{row["rps_per_core"]:>11.1f}{row["p50_ms"]:>9.2f}{row["p99_ms"]:>9.2f}'
+            )
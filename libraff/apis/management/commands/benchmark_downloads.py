@@ -0,0 +1,80 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apis.book_apis import BookDownloadAPIView
+from books.models import Book, BookCategory
+from users.models import CustomerUser
+from utils.file_delivery import PYTHON, X_ACCEL, X_SENDFILE
+
+
+class Command(BaseCommand):
+    help = 'Compare how long a worker is held per PDF download in each delivery mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=20, help='PDF size')
+        parser.add_argument('--requests', type=int, default=20, help='Downloads per mode')
+        parser.add_argument(
+            '--client-kbps',
+            type=int,
+            default=0,
+            help='Simulated client bandwidth; 0 drains the body as fast as possible',
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root,
+        ):
+            with transaction.atomic():
+                book = self.create_book(options['size_mb'])
+                self.stdout.write(
+                    f'{"mode":<12}{"mean ms":>10}{"p95 ms":>10}{"max ms":>10}'
+                    f'{"bytes via python":>18}'
+                )
+                for mode in (PYTHON, X_ACCEL, X_SENDFILE):
+                    self.report(mode, self.run(book, mode, options))
+                transaction.set_rollback(True)
+
+    def create_book(self, size_mb):
+        category = BookCategory.objects.create(category_name='Benchmark')
+        book = Book.objects.create(title='Benchmark', category=category)
+        book.pdf.save('benchmark.pdf', ContentFile(os.urandom(size_mb * 1024 * 1024)))
+        return book
+
+    def run(self, book, mode, options):
+        factory = APIRequestFactory()
+        view = BookDownloadAPIView.as_view()
+        user = CustomerUser(username='benchmark')
+        seconds_per_byte = 1 / (options['client_kbps'] * 1024) if options['client_kbps'] else 0
+
+        held, sent = [], 0
+        with override_settings(FILE_DELIVERY_MODE=mode):
+            for _ in range(options['requests']):
+                request = factory.get(f'/api/v1/book/{book.id}/download/')
+                force_authenticate(request, user=user)
+                started = time.perf_counter()
+                response = view(request, book_id=book.id)
+                # The worker is busy until the last body byte reaches the client.
+                body = response.streaming_content if response.streaming else [response.content]
+                for chunk in body:
+                    sent += len(chunk)
+                    if seconds_per_byte:
+                        time.sleep(len(chunk) * seconds_per_byte)
+                held.append((time.perf_counter() - started) * 1000)
+        return held, sent
+
+    def report(self, mode, result):
+        held, sent = result
+        held.sort()
+        p95 = held[min(len(held) - 1, int(len(held) * 0.95))]
+        self.stdout.write(
+            f'{mode:<12}{statistics.mean(held):>10.2f}{p95:>10.2f}'
+            f'{held[-1]:>10.2f}{sent:>18}'
+        )
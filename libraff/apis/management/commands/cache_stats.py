@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from utils.cache_mixins import cached_families
+from utils.cache_stats import family_stats
+
+
+class Command(BaseCommand):
+    help = 'Report hit ratio, payload size and recompute time per cache key family'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after reporting them',
+        )
+
+    def handle(self, *args, **options):
+        families = cached_families()
+        report = family_stats.collect(families)
+
+        self.stdout.write(
+            f'{"family":<28}{"hits":>10}{"recomputes":>12}'
+            f'{"hit ratio":>11}{"avg bytes":>12}{"avg ms":>10}'
+        )
+        for family, counters in report.items():
+            self.stdout.write(
+                f'{family:<28}{counters["hits"]:>10}{counters["recomputes"]:>12}'
+                f'{counters["hit_ratio"]:>11.1%}{counters["avg_payload_bytes"]:>12}'
+                f'{counters["avg_recompute_ms"]:>10.2f}'
+            )
+
+        if options['reset']:
+            family_stats.reset(families)
+            self.stdout.write(self.style.SUCCESS('Cache statistics reset'))
@@ -1,8 +1,73 @@
-from rest_framework.test import APITestCase
-from django.test import TestCase
+from rest_framework.test import APIRequestFactory, APITestCase
+from django.test import AsyncClient, TestCase
 from rest_framework import status
 from django.core.exceptions import ValidationError
-from books.models import BookCategory, Book
+import csv
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+import numpy as np
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import NOT_PROVIDED
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.core.management import call_command
+from books.models import BookCategory, Book, SimilarBooks, UserBookStatus
+from books.content_index import ContentIndex, content_index
+from books.filters import cached_facet_counts, facet_counts, filter_books, normalize_filters
+from books.importer import COPY_COLUMNS, BookImporter
+from books.search import search_books
+from apis.book_apis import BookListAPIView
+from benchmarks import concurrency, dataset, report, runner
+from books import recommendations, trending
+from books.tasks import build_book_image_variants, rebuild_trending, reconcile_counters, update_content_index
+from users.serializers import CustomerUserSerializer
+from users.tasks import build_avatar_variants
+from users.models import CustomerUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import resolve
+from utils.async_views import AsyncAPIView
+from interactions import like_buffer
+from interactions.models import Comment, Like
+from libraff.middleware import QueryBudgetExceeded, budget_report
+from utils.logging_pipeline import (
+    CompressedRotatingFileHandler,
+    JSONFormatter,
+    LogListener,
+    RoutingQueueHandler,
+)
+from favorites.models import Favorite
+from utils import cache_stampede
+from utils.cache_namespaces import bump_generation, get_generation
+from utils.custom_pagination import CustomPagination
+from utils.cache_stampede import cached_compute
+from utils.cache_stats import family_stats
+from utils.leaderboard import get_leaderboard
+from utils.tiered_cache import LocalLRUCache, TieredCache
+from utils.request_metrics import render_prometheus, request_metrics, routed_views
+from utils.request_timing import RequestTiming
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
 
 
 class BookCategoryModelTest(TestCase):
@@ -40,4 +105,1440 @@ class BookCategoryListAPITest(APITestCase):
         BookCategory.objects.all().delete()
         response = self.client.get(self.url)
         self.assertEqual(response.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
\ No newline at end of file
+        self.assertEqual(len(response.data), 0)
+
+
+class CacheNamespaceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_generation(self):
+        generation = get_generation('Book_list_for_category_1')
+        bump_generation('Book_list_for_category_1')
+        self.assertNotEqual(generation, get_generation('Book_list_for_category_1'))
+
+    def test_bump_leaves_other_namespaces(self):
+        generation = get_generation('Book_list_for_category_2')
+        bump_generation('Book_list_for_category_1')
+        self.assertEqual(generation, get_generation('Book_list_for_category_2'))
+
+    def test_category_save_invalidates_list(self):
+        BookCategory.objects.create(category_name='Dram')
+        response = self.client.get('/api/v1/categories/')
+        self.assertEqual(len(response.data), 1)
+        BookCategory.objects.create(category_name='Sevgi')
+        response = self.client.get('/api/v1/categories/')
+        self.assertEqual(len(response.data), 2)
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tiered = TieredCache(enabled=True, max_entries=2, timeout=30)
+
+    def test_local_lru_evicts_oldest(self):
+        local = LocalLRUCache(max_entries=2, timeout=30)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertIsNone(local.get('b'))
+        self.assertEqual(local.get('a'), 1)
+
+    def test_local_entry_expires(self):
+        local = LocalLRUCache(max_entries=2, timeout=30)
+        local.set('a', 1, timeout=0)
+        self.assertIsNone(local.get('a'))
+
+    def test_second_read_served_from_l1(self):
+        cache.set('Book_category_list_v1', [1])
+        self.assertEqual(self.tiered.get('Book_category_list_v1'), [1])
+        self.assertEqual(self.tiered.get('Book_category_list_v1'), [1])
+        stats = self.tiered.stats()
+        self.assertEqual(stats['l1_hits'], 1)
+        self.assertEqual(stats['l2_hits'], 1)
+
+    def test_invalidate_drops_local_entry(self):
+        self.tiered.set('Generation_Book_list', 1)
+        cache.set('Generation_Book_list', 2)
+        self.tiered.invalidate('Generation_Book_list')
+        self.assertEqual(self.tiered.get('Generation_Book_list'), 2)
+
+    def test_invalidate_without_l1_publishes_nothing(self):
+        with patch('utils.tiered_cache._uses_redis', return_value=True) as uses_redis:
+            TieredCache(enabled=False).invalidate('Generation_Book_list')
+        uses_redis.assert_not_called()
+
+    def test_counters_survive_concurrent_reads(self):
+        cache.set('Book_category_list_v1', [1])
+        threads = [
+            threading.Thread(target=lambda: [self.tiered.get('Book_category_list_v1') for _ in range(500)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.tiered.stats()
+        self.assertEqual(stats['l1_hits'] + stats['l1_misses'], 2000)
+
+
+class BookDetailAPITest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.book = Book.objects.create(title='Ali ve Nino', category=category)
+        self.reader = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.other = CustomerUser.objects.create_user(username='other', email='other@libraff.az')
+        self.url = f'/api/v1/book/{self.book.id}/'
+
+    def test_book_body_is_shared_between_users(self):
+        UserBookStatus.objects.create(user=self.reader, book=self.book, status=UserBookStatus.READING)
+        Like.objects.create(user=self.reader, book=self.book)
+
+        self.client.force_authenticate(self.reader)
+        reader_data = self.client.get(self.url).data
+        self.client.force_authenticate(self.other)
+        other_data = self.client.get(self.url).data
+
+        self.assertEqual(len([key for key in cache._cache if key.startswith(':1:Book_detail_')]), 1)
+        self.assertEqual(other_data['title'], 'Ali ve Nino')
+        self.assertEqual(reader_data['user_status'], UserBookStatus.READING)
+        self.assertTrue(reader_data['is_liked'])
+        self.assertEqual(other_data['user_status'], UserBookStatus.UNREAD)
+        self.assertFalse(other_data['is_liked'])
+        self.assertFalse(other_data['is_favorited'])
+
+    def test_status_update_shows_without_invalidation(self):
+        self.client.force_authenticate(self.reader)
+        self.client.get(self.url)
+        self.client.patch(self.url, {'status': UserBookStatus.FINISHED})
+        self.assertEqual(self.client.get(self.url).data['user_status'], UserBookStatus.FINISHED)
+
+
+class CacheStampedeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return [self.calls]
+
+    def test_counters_survive_concurrent_hits(self):
+        cached_compute('Book_list', self.compute, namespaces=['Book_list'])
+        hits = cache_stampede.stats()['hits']
+        threads = [
+            threading.Thread(
+                target=lambda: [cached_compute('Book_list', self.compute, namespaces=['Book_list']) for _ in range(250)],
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache_stampede.stats()['hits'], hits + 1000)
+
+    def test_value_computed_once(self):
+        cached_compute('Book_list', self.compute, namespaces=['Book_list'])
+        self.assertEqual(cached_compute('Book_list', self.compute, namespaces=['Book_list']), [1])
+        self.assertEqual(self.calls, 1)
+
+    def test_empty_result_is_cached(self):
+        cached_compute('Book_list', list, namespaces=['Book_list'])
+        self.assertEqual(cached_compute('Book_list', self.compute, namespaces=['Book_list']), [])
+
+    def test_invalidated_value_recomputed(self):
+        cached_compute('Book_list', self.compute, namespaces=['Book_list'])
+        bump_generation('Book_list')
+        self.assertEqual(cached_compute('Book_list', self.compute, namespaces=['Book_list']), [2])
+
+    def test_stale_value_served_while_locked(self):
+        cached_compute('Book_list', self.compute, namespaces=['Book_list'])
+        bump_generation('Book_list')
+        cache.add('Lock_Book_list', 'other-worker')
+        served = cache_stampede.stats()['stale_served']
+        self.assertEqual(cached_compute('Book_list', self.compute, namespaces=['Book_list']), [1])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache_stampede.stats()['stale_served'], served + 1)
+
+
+class CachedResponseMixinTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        family_stats.reset(['Book_category_list', 'Book_search'])
+        BookCategory.objects.create(category_name='Roman')
+
+    def test_hits_and_recomputes_are_counted_per_family(self):
+        self.client.get('/api/v1/categories/')
+        self.client.get('/api/v1/categories/')
+        family_stats.flush()
+        counters = family_stats.collect(['Book_category_list'])['Book_category_list']
+        self.assertEqual(counters['hits'], 1)
+        self.assertEqual(counters['recomputes'], 1)
+        self.assertEqual(counters['hit_ratio'], 0.5)
+        self.assertGreater(counters['avg_payload_bytes'], 0)
+
+    @override_settings(CACHE_STATS_PAYLOAD_SAMPLE_EVERY=2)
+    def test_payload_size_is_sampled(self):
+        family_stats.reset(['Sampled'])
+        with patch('utils.cache_stats.pickle.dumps', return_value=b'1234') as dumps:
+            for _ in range(3):
+                family_stats.record_recompute('Sampled', 0.01, ['payload'])
+        self.assertEqual(dumps.call_count, 2)
+        family_stats.flush()
+        counters = family_stats.collect(['Sampled'])['Sampled']
+        self.assertEqual((counters['recomputes'], counters['avg_payload_bytes']), (3, 4))
+
+    def test_filter_key_does_not_embed_query(self):
+        self.client.get('/api/v1/books/filter/', {'author': 'secret words'})
+        self.assertFalse([key for key in cache._cache if 'secret' in key])
+
+    def test_cache_stats_command(self):
+        self.client.get('/api/v1/categories/')
+        family_stats.flush()
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('Book_category_list', out.getvalue())
+
+
+class BookSearchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.in_context = Book.objects.create(
+            title='Dolu', author='Anar', context='Bir qala haqqinda roman', category=category,
+        )
+        self.in_title = Book.objects.create(
+            title='Qala', author='Elchin', context='Tarixi roman', category=category,
+        )
+        self.by_author = Book.objects.create(title='Sahil', author='Qalayev', category=category)
+
+    def test_title_match_ranks_first(self):
+        results = list(search_books('qala'))
+        self.assertEqual(results[0], self.in_title)
+        self.assertIn(self.in_context, results)
+
+    def test_author_is_searched(self):
+        self.assertEqual(list(search_books('qalayev')), [self.by_author])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.in_title.title = 'Saray'
+        self.in_title.save()
+        self.by_author.delete()
+        self.assertEqual(list(search_books('saray')), [self.in_title])
+        self.assertEqual(list(search_books('qalayev')), [])
+
+    def test_search_endpoint_orders_by_relevance(self):
+        response = self.client.get('/api/v1/books/search/', {'query': 'qala'})
+        self.assertEqual(response.data['results'][0]['title'], 'Qala')
+
+
+class CursorPaginationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.favorite_ids = [
+            Favorite.objects.create(
+                user=self.user,
+                book=Book.objects.create(title=f'Book {index}', category=category),
+            ).id
+            for index in range(25)
+        ]
+        self.url = f'/api/v1/user/{self.user.id}/favorites/open/'
+
+    def test_cursor_walks_every_row_once(self):
+        response = self.client.get(self.url, {'cursor': '', 'page_size': 10})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        seen = [favorite['id'] for favorite in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [favorite['id'] for favorite in response.data['results']]
+        self.assertEqual(seen, sorted(self.favorite_ids, reverse=True))
+
+    def test_cursor_bounds_the_leading_column(self):
+        first = self.client.get(self.url, {'cursor': '', 'page_size': 10})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+        page_query = [query['sql'] for query in queries.captured_queries if 'ORDER BY' in query['sql']][-1]
+        # The seek predicate the (user, status, created_at, id) index can range over.
+        self.assertRegex(page_query, r'"favorites_favorite"\."created_at" <= ')
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.client.get(self.url, {'cursor': '', 'page_size': 10})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_page_number_mode_is_unchanged(self):
+        response = self.client.get(self.url, {'page': 2, 'page_size': 10})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cursor_values(self):
+        pagination = CustomPagination()
+        for position in (['not-a-date', 'x'], [None, 1], [[1], {'a': 1}], ['2026-01-01T00:00:00+00:00', 2 ** 70]):
+            cursor = pagination.encode_cursor(position, False)
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+
+
+class CounterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.book = Book.objects.create(title='Ali ve Nino', category=category)
+        self.user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.comment = Comment.objects.create(user=self.user, book=self.book, content='Gozel')
+
+    def test_signals_keep_counters_in_step(self):
+        like = Like.objects.create(user=self.user, book=self.book)
+        Like.objects.create(user=self.user, comment=self.comment)
+        Favorite.objects.create(user=self.user, book=self.book)
+        self.book.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(
+            (self.book.likes_count, self.book.comments_count, self.book.favorites_count),
+            (1, 1, 1),
+        )
+        self.assertEqual(self.comment.likes_count, 1)
+
+        like.delete()
+        self.comment.delete()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.likes_count, self.book.comments_count), (0, 0))
+
+    def test_book_detail_reads_counter(self):
+        url = f'/api/v1/book/{self.book.id}/'
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).data['like_count'], '0')
+        Like.objects.create(user=self.user, book=self.book)
+        self.assertEqual(self.client.get(url).data['like_count'], '1')
+
+    def test_comment_detail_includes_like_count(self):
+        Like.objects.create(user=self.user, comment=self.comment)
+        response = self.client.get(f'/api/v1/book/{self.book.id}/comment/{self.comment.id}/detail/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['like_count'], '1')
+
+    def test_reconcile_repairs_drift(self):
+        Like.objects.create(user=self.user, book=self.book)
+        Book.objects.filter(id=self.book.id).update(likes_count=7, comments_count=0)
+        Comment.objects.filter(id=self.comment.id).update(likes_count=3)
+
+        self.assertEqual(reconcile_counters(), {'books': 1, 'comments': 1})
+        self.book.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual((self.book.likes_count, self.book.comments_count), (1, 1))
+        self.assertEqual(self.comment.likes_count, 0)
+        self.assertEqual(reconcile_counters(), {'books': 0, 'comments': 0})
+
+
+class LikeFavoriteToggleTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.book = Book.objects.create(title='Ali ve Nino', category=category)
+        self.user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.comment = Comment.objects.create(user=self.user, book=self.book, content='Gozel')
+        self.client.force_authenticate(self.user)
+
+    def test_like_is_idempotent(self):
+        url = f'/api/v1/book/{self.book.id}/like/manage/'
+        for _ in range(2):
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, {'is_liked': True, 'like_count': 1})
+        self.assertEqual(Like.objects.filter(user=self.user, book=self.book).count(), 1)
+
+        for _ in range(2):
+            response = self.client.delete(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, {'is_liked': False, 'like_count': 0})
+        self.assertFalse(Like.objects.exists())
+
+    def test_lost_race_keeps_one_row_and_count(self):
+        # The other click got in first.
+        Like.objects.create(user=self.user, comment=self.comment)
+        response = self.client.post(f'/api/v1/comment/{self.comment.id}/like/manage/')
+        self.assertEqual(response.data, {'is_liked': True, 'like_count': 1})
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 1)
+
+    def test_toggle_invalidates_cached_reads(self):
+        url = f'/api/v1/book/{self.book.id}/'
+        self.assertEqual(self.client.get(url).data['like_count'], '0')
+        self.client.post(f'/api/v1/book/{self.book.id}/like/manage/')
+        data = self.client.get(url).data
+        self.assertEqual((data['like_count'], data['is_liked']), ('1', True))
+
+    def test_missing_target_is_rolled_back(self):
+        response = self.client.post('/api/v1/book/999/like/manage/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post('/api/v1/book/999/favorite/create/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_favorite_is_idempotent(self):
+        url = f'/api/v1/book/{self.book.id}/favorite/create/'
+        created = self.client.post(url, {'status': Favorite.PRIVATE})
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        again = self.client.post(url)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['id'], created.data['id'])
+        self.assertEqual(again.data['status'], Favorite.PRIVATE)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.favorites_count, 1)
+
+        response = self.client.post(url, {'status': 'Secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+
+
+class LikeBufferTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.book = Book.objects.create(title='Ali ve Nino', category=category)
+        self.users = [
+            CustomerUser.objects.create_user(username=f'reader{index}', email=f'reader{index}@libraff.az')
+            for index in range(3)
+        ]
+        self.comment = Comment.objects.create(user=self.users[0], book=self.book, content='Gozel')
+
+    def test_apply_ops_collapses_and_recounts(self):
+        Like.objects.create(user=self.users[2], book=self.book)
+        generation = get_generation(f'Book_detail_{self.book.id}')
+        result = like_buffer.apply_ops([
+            ('book', self.book.id, self.users[0].id, True),
+            ('book', self.book.id, self.users[0].id, False),
+            ('book', self.book.id, self.users[0].id, True),
+            ('book', self.book.id, self.users[1].id, True),
+            ('book', self.book.id, self.users[2].id, False),
+            ('comment', self.comment.id, self.users[1].id, True),
+            # Deleted since the click.
+            ('book', 999, self.users[0].id, True),
+        ])
+        self.assertEqual(result, {'ops': 4, 'books': 1, 'comments': 1})
+        self.assertEqual(
+            set(Like.objects.filter(book=self.book).values_list('user_id', flat=True)),
+            {self.users[0].id, self.users[1].id},
+        )
+        self.book.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual((self.book.likes_count, self.comment.likes_count), (2, 1))
+        self.assertNotEqual(get_generation(f'Book_detail_{self.book.id}'), generation)
+
+        # A batch replayed after a crash changes nothing.
+        like_buffer.apply_ops([('book', self.book.id, self.users[1].id, True)])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.likes_count, 2)
+
+    @skipUnless(fakeredis, 'needs fakeredis[lua]')
+    def test_buffered_clicks_are_counted_and_flushed(self):
+        redis = fakeredis.FakeRedis()
+        url = f'/api/v1/book/{self.book.id}/like/manage/'
+        Like.objects.create(user=self.users[1], book=self.book)
+        with patch.object(like_buffer, '_client', return_value=redis), \
+                patch.object(like_buffer, 'enabled', return_value=True):
+            self.client.force_authenticate(self.users[0])
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data, {'is_liked': True, 'like_count': 2})
+            self.assertFalse(like_buffer.record(self.users[0].id, 'book', self.book.id, True))
+
+            # Liking again what is already stored changes nothing.
+            self.client.force_authenticate(self.users[1])
+            self.assertEqual(self.client.post(url).data['like_count'], 2)
+            self.assertEqual(self.client.delete(url).data['like_count'], 1)
+            self.assertEqual(
+                self.client.post('/api/v1/book/999/like/manage/').status_code,
+                status.HTTP_404_NOT_FOUND,
+            )
+            self.assertFalse(Like.objects.filter(user=self.users[0]).exists())
+
+            like_buffer.flush()
+            self.assertEqual(
+                set(Like.objects.filter(book=self.book).values_list('user_id', flat=True)),
+                {self.users[0].id},
+            )
+            self.assertEqual(redis.xlen(like_buffer.STREAM), 0)
+            self.assertEqual(like_buffer.buffered_count('book', self.book.id), 1)
+
+    @override_settings(LIKE_WRITE_BEHIND=True)
+    def test_needs_redis(self):
+        self.assertFalse(like_buffer.enabled())
+
+    def test_write_behind_answers_without_the_database(self):
+        self.client.force_authenticate(self.users[0])
+        with patch.object(like_buffer, 'enabled', return_value=True), \
+                patch.object(like_buffer, 'record', return_value=True) as record, \
+                patch.object(like_buffer, 'buffered_count', return_value=1):
+            response = self.client.post(f'/api/v1/book/{self.book.id}/like/manage/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        # The same body as the synchronous path.
+        self.assertEqual(response.data, {'is_liked': True, 'like_count': 1})
+        record.assert_called_once_with(self.users[0].id, 'book', self.book.id, True)
+        self.assertFalse(Like.objects.exists())
+
+
+class TrendingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        get_leaderboard().clear()
+        self.roman = BookCategory.objects.create(category_name='Roman')
+        self.poetry = BookCategory.objects.create(category_name='Poeziya')
+        self.novel = Book.objects.create(title='Ali ve Nino', category=self.roman)
+        self.other_novel = Book.objects.create(title='Dahi', category=self.roman)
+        self.poems = Book.objects.create(title='Seherli', category=self.poetry)
+        self.users = [
+            CustomerUser.objects.create_user(username=f'reader{index}', email=f'reader{index}@libraff.az')
+            for index in range(3)
+        ]
+
+    def ranking(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def test_signals_rank_books(self):
+        for user in self.users:
+            Like.objects.create(user=user, book=self.poems)
+        Favorite.objects.create(user=self.users[0], book=self.other_novel)
+        Comment.objects.create(user=self.users[0], book=self.novel, content='Gozel')
+
+        self.assertEqual(self.ranking('/api/v1/books/trending/'), ['Dahi', 'Seherli', 'Ali ve Nino'])
+        self.assertEqual(
+            self.ranking(f'/api/v1/books/trending/category/{self.roman.id}/', window='7d'),
+            ['Dahi', 'Ali ve Nino'],
+        )
+
+        Favorite.objects.all().delete()
+        self.assertEqual(self.ranking('/api/v1/books/trending/'), ['Seherli', 'Ali ve Nino'])
+
+    def test_older_events_weigh_less(self):
+        now = time.time()
+        trending.record(self.novel.id, 'like', 2, timestamp=now - 2 * trending.WINDOWS['24h'])
+        trending.record(self.poems.id, 'like', 1, timestamp=now)
+        self.assertEqual(self.ranking('/api/v1/books/trending/'), ['Seherli', 'Ali ve Nino'])
+        self.assertEqual(
+            self.ranking('/api/v1/books/trending/', window='7d'),
+            ['Ali ve Nino', 'Seherli'],
+        )
+        [(_, score)] = trending.top('24h', 1)
+        self.assertAlmostEqual(score, 1.0, places=3)
+
+    def test_unlike_takes_back_what_the_like_added(self):
+        self.client.force_authenticate(self.users[0])
+        url = f'/api/v1/book/{self.novel.id}/like/manage/'
+        self.client.post(url)
+        week_ago = timezone.now() - timezone.timedelta(days=7)
+        # Move the like (and its weight on the boards) a week back.
+        Like.objects.update(created_at=week_ago)
+        get_leaderboard().clear()
+        trending.record(self.novel.id, 'like', 1, timestamp=week_ago.timestamp())
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_200_OK)
+        for window in trending.WINDOWS:
+            [(_, score)] = get_leaderboard().top(trending.board_key(window), 1)
+            self.assertAlmostEqual(score, 0.0, places=6)
+
+    def test_rebuild_repairs_the_boards(self):
+        Like.objects.create(user=self.users[0], book=self.novel)
+        Like.objects.create(user=self.users[1], book=self.novel)
+        Like.objects.create(user=self.users[0], book=self.poems)
+        get_leaderboard().clear()
+        trending.record(self.other_novel.id, 'favorite')
+
+        self.assertEqual(rebuild_trending(), {'boards': 6, 'books': 2})
+        self.assertEqual(self.ranking('/api/v1/books/trending/'), ['Ali ve Nino', 'Seherli'])
+        [(_, score)] = trending.top('24h', 1)
+        self.assertAlmostEqual(score, 2.0, delta=0.1)
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/v1/books/trending/', {'window': '1y'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/books/trending/', {'limit': 1000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/books/trending/category/999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SimilarBooksTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # No content index to top the neighbours up from.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.settings_override = override_settings(CONTENT_INDEX_DIR=directory)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        category = BookCategory.objects.create(category_name='Roman')
+        self.books = [Book.objects.create(title=f'Book {index}', category=category) for index in range(4)]
+        self.users = [
+            CustomerUser.objects.create_user(username=f'reader{index}', email=f'reader{index}@libraff.az')
+            for index in range(3)
+        ]
+        first, second, third, _ = self.books
+        # Readers of the first book mostly also read the second.
+        for user in self.users:
+            Like.objects.create(user=user, book=first)
+            Favorite.objects.create(user=user, book=second)
+        UserBookStatus.objects.create(user=self.users[0], book=third, status=UserBookStatus.FINISHED)
+        UserBookStatus.objects.create(user=self.users[1], book=third, status=UserBookStatus.UNREAD)
+
+    def test_build_in_chunks_and_blocks(self):
+        result = recommendations.build(count=2, chunk_size=2, block_size=3)
+        self.assertEqual(result['interactions'], 7)
+        self.assertEqual(result['stored'], 3)
+
+        neighbours = SimilarBooks.objects.get(book=self.books[0]).neighbours
+        self.assertEqual([book_id for book_id, _ in neighbours], [self.books[1].id, self.books[2].id])
+        self.assertAlmostEqual(neighbours[0][1], 1.0, places=3)
+        self.assertAlmostEqual(neighbours[1][1], 3 ** -0.5, places=3)
+        self.assertFalse(SimilarBooks.objects.filter(book=self.books[3]).exists())
+
+    def test_matrix_skips_users_and_books_read_after_the_ids(self):
+        user_ids = np.array([self.users[1].id], dtype=np.int64)
+        book_ids = np.array([self.books[1].id, self.books[2].id], dtype=np.int64)
+        # The other readers' and books' ids lie on both sides of the known ones.
+        matrix = recommendations.interaction_matrix(user_ids, book_ids, chunk_size=2)
+        self.assertEqual(matrix.shape, (1, 2))
+        self.assertEqual(matrix.toarray().tolist(), [[3.0, 0.0]])
+        empty = recommendations.interaction_matrix(np.array([], dtype=np.int64), book_ids, chunk_size=2)
+        self.assertEqual(empty.nnz, 0)
+
+    def test_endpoint_serves_stored_neighbours(self):
+        url = f'/api/v1/book/{self.books[2].id}/similar/'
+        self.assertEqual(self.client.get(url).data, {'results': []})
+
+        recommendations.build()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [book['title'] for book in response.data['results']],
+            ['Book 0', 'Book 1'],
+        )
+        self.assertIn('similarity', response.data['results'][0])
+
+        # A rerun drops books that lost their neighbours.
+        UserBookStatus.objects.filter(book=self.books[2]).delete()
+        recommendations.build()
+        self.assertEqual(self.client.get(url).data, {'results': []})
+
+    def test_unknown_book(self):
+        response = self.client.get('/api/v1/book/999/similar/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ContentIndexTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.settings_override = override_settings(CONTENT_INDEX_DIR=directory)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        category = BookCategory.objects.create(category_name='Roman')
+        self.sea_wolves = Book.objects.create(
+            title='Sea wolves', author='Jack London',
+            context='Sailing the cold northern sea with a crew of wolves', category=category,
+        )
+        self.sea_wolf = Book.objects.create(
+            title='The sea wolf', author='Jack London',
+            context='A sailing ship and its captain on the northern sea', category=category,
+        )
+        self.recipes = Book.objects.create(
+            title='Kitchen recipes', author='Ann Cook',
+            context='Soups, bread and cakes for every day', category=category,
+        )
+
+    def neighbour_ids(self, book, count=2):
+        return [book_id for book_id, _ in content_index.neighbours([book], count)[0]]
+
+    def test_build_and_query(self):
+        result = content_index.build(chunk_size=2, dimensions=256)
+        self.assertEqual(result, {'books': 3, 'dimensions': 256})
+        neighbours = self.neighbour_ids(self.sea_wolves)
+        self.assertEqual(neighbours[0], self.sea_wolf.id)
+        self.assertNotIn(self.sea_wolves.id, neighbours)
+
+        # Books saved after the build are queried by their text.
+        newcomer = Book.objects.create(title='Wolves at sea', author='Jack London', category=self.recipes.category)
+        self.assertEqual(self.neighbour_ids(newcomer)[:2], [self.sea_wolves.id, self.sea_wolf.id])
+
+    def test_incremental_updates(self):
+        content_index.build(dimensions=256, capacity=3)
+        newcomer = Book.objects.create(title='Northern sea wolves', author='Jack London', category=self.recipes.category)
+        self.assertEqual(content_index.update(newcomer.id), 'added')
+        self.assertIn(newcomer.id, self.neighbour_ids(self.sea_wolves, count=3))
+
+        Book.objects.filter(id=self.recipes.id).update(title='Sea wolves cookbook', author='Jack London')
+        self.assertEqual(content_index.update(self.recipes.id), 'updated')
+        self.assertIn(self.recipes.id, self.neighbour_ids(self.sea_wolves, count=3))
+
+        sea_wolf_id = self.sea_wolf.id
+        Book.objects.filter(id=sea_wolf_id).delete()
+        self.assertEqual(content_index.update(sea_wolf_id), 'removed')
+        self.assertNotIn(sea_wolf_id, self.neighbour_ids(self.sea_wolves, count=3))
+        self.assertIsNone(content_index.update(sea_wolf_id))
+
+    def test_no_index(self):
+        index = ContentIndex(os.path.join(settings.CONTENT_INDEX_DIR, 'missing'))
+        self.assertIsNone(index.update(self.sea_wolf.id))
+        self.assertEqual(index.neighbours([self.sea_wolf], 2), [[]])
+
+    def test_saved_book_is_queued_after_commit(self):
+        with patch('books.signals.update_content_index.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.sea_wolf.save()
+        delay.assert_called_once_with(self.sea_wolf.id)
+
+    def test_update_refreshes_only_the_books_own_neighbours(self):
+        content_index.build(dimensions=256)
+        similar = get_generation('Book_similar')
+        own = get_generation(f'Book_similar_{self.sea_wolves.id}')
+
+        update_content_index(self.sea_wolf.id)
+        self.assertEqual(get_generation('Book_similar'), similar)
+        self.assertEqual(get_generation(f'Book_similar_{self.sea_wolves.id}'), own)
+        update_content_index(self.sea_wolves.id)
+        self.assertNotEqual(get_generation(f'Book_similar_{self.sea_wolves.id}'), own)
+
+    def test_interactions_keep_the_cached_neighbours(self):
+        content_index.build(dimensions=256)
+        url = f'/api/v1/book/{self.sea_wolves.id}/similar/'
+        self.client.get(url)
+        user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        Like.objects.create(user=user, book=self.sea_wolves)
+        Comment.objects.create(user=user, book=self.sea_wolves, content='Salty')
+        with patch.object(content_index, 'neighbours') as neighbours:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        neighbours.assert_not_called()
+
+    def test_endpoint_tops_up_with_content(self):
+        content_index.build(dimensions=256)
+        url = f'/api/v1/book/{self.sea_wolves.id}/similar/'
+        results = self.client.get(url).data['results']
+        self.assertEqual((results[0]['id'], results[0]['source']), (self.sea_wolf.id, 'content'))
+
+        SimilarBooks.objects.create(
+            book=self.sea_wolves, neighbours=[[self.recipes.id, 0.5]], computed_at=timezone.now(),
+        )
+        cache.clear()
+        results = self.client.get(url).data['results']
+        self.assertEqual(
+            [(book['id'], book['source']) for book in results[:2]],
+            [(self.recipes.id, 'readers'), (self.sea_wolf.id, 'content')],
+        )
+
+
+class ListIndexUsageTest(APITestCase):
+    """Every list endpoint reads its page through an index, in index order."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = BookCategory.objects.create(category_name='Roman')
+        self.book = Book.objects.create(title='Ali ve Nino', category=self.category, price=12)
+        self.user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.comment = Comment.objects.create(user=self.user, book=self.book, content='Great')
+        Like.objects.create(user=self.user, book=self.book)
+        Like.objects.create(user=self.user, comment=self.comment)
+        Favorite.objects.create(user=self.user, book=self.book, status=Favorite.OPEN)
+        self.client.force_authenticate(self.user)
+
+    def plan_of(self, url, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{url}{"&" if "?" in url else "?"}cursor=')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        sql = [
+            query['sql'] for query in queries.captured_queries
+            if f'FROM "{table}"' in query['sql'] and 'ORDER BY' in query['sql']
+        ][-1]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # The test tables are tiny enough for a sequential scan to win.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_list_endpoints_use_their_index(self):
+        endpoints = [
+            ('/api/v1/books/', 'books_book', 'book_created_idx'),
+            (f'/api/v1/categories/{self.category.id}/books/', 'books_book', 'book_category_created_idx'),
+            (f'/api/v1/books/filter/?category={self.category.id}', 'books_book', 'book_category_created_idx'),
+            (f'/api/v1/book/{self.book.id}/comments/', 'interactions_comment', 'comment_book_created_idx'),
+            (f'/api/v1/user/{self.user.id}/comments/', 'interactions_comment', 'comment_user_created_idx'),
+            (f'/api/v1/book/{self.book.id}/likes/', 'interactions_like', 'like_book_created_idx'),
+            (f'/api/v1/comment/{self.comment.id}/likes/', 'interactions_like', 'like_comment_created_idx'),
+            (f'/api/v1/user/{self.user.id}/favorites/open/', 'favorites_favorite', 'favorite_user_status_idx'),
+            (f'/api/v1/user/{self.user.id}/favorites/private/', 'favorites_favorite', 'favorite_user_status_idx'),
+        ]
+        for url, table, index in endpoints:
+            plan = self.plan_of(url, table)
+            self.assertIn(index, plan, url)
+            # The index order is the page order: no sort step.
+            self.assertNotRegex(plan, r'TEMP B-TREE|\bSort\b', url)
+
+
+class BookFilterFacetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.roman = BookCategory.objects.create(category_name='Roman')
+        self.epos = BookCategory.objects.create(category_name='Epos')
+        for title, author, price, category in (
+            ('Leyli ve Mecnun', 'Fuzuli', 5, self.epos),
+            ('Xosrov ve Sirin', 'Nizami', 15, self.epos),
+            ('Yeddi gozel', 'Nizami', 25, self.epos),
+            ('Ali ve Nino', 'Qurban Seid', 60, self.roman),
+            ('Draft', None, None, self.roman),
+        ):
+            Book.objects.create(title=title, author=author, price=price, category=category)
+
+    def test_category_filter_by_id(self):
+        response = self.client.get('/api/v1/books/filter/', {'category': self.roman.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({book['title'] for book in response.data['results']}, {'Ali ve Nino', 'Draft'})
+
+        response = self.client.get('/api/v1/books/filter/', {'category': 'Roman'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facets_of_the_current_filter(self):
+        with self.assertNumQueries(1):
+            facets = facet_counts(filter_books(normalize_filters({'price_to': '30'})))
+        self.assertEqual(facets['categories'], [{'id': self.epos.id, 'name': 'Epos', 'count': 3}])
+        self.assertEqual(
+            [bucket['count'] for bucket in facets['prices']],
+            [1, 1, 1, 0, 0],
+        )
+        self.assertEqual(facets['prices'][0], {'from': 0, 'to': 10, 'count': 1})
+        self.assertEqual(
+            facets['authors'],
+            [{'author': 'Nizami', 'count': 2}, {'author': 'Fuzuli', 'count': 1}],
+        )
+
+        response = self.client.get('/api/v1/books/filter/', {'facets': 'true', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(
+            [(category['name'], category['count']) for category in response.data['facets']['categories']],
+            [('Epos', 3), ('Roman', 2)],
+        )
+        self.assertNotIn('facets', self.client.get('/api/v1/books/filter/').data)
+
+    def test_facets_cached_per_normalized_filter(self):
+        with patch('books.filters.facet_counts', wraps=facet_counts) as counted:
+            first = cached_facet_counts(normalize_filters({'author': 'Nizami', 'page': '1'}))
+            second = cached_facet_counts(normalize_filters({'author': ' nizami ', 'page': '2'}))
+            self.assertEqual(first, second)
+            self.assertEqual(counted.call_count, 1)
+
+            # Saving a book invalidates them.
+            Book.objects.create(title='Iskendername', author='Nizami', price=40, category=self.epos)
+            facets = cached_facet_counts(normalize_filters({'author': 'nizami'}))
+            self.assertEqual(counted.call_count, 2)
+        self.assertEqual(facets['authors'], [{'author': 'Nizami', 'count': 3}])
+
+
+class UserStatusListTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.books = [
+            Book.objects.create(title=f'Book {index}', category=category)
+            for index in range(12)
+        ]
+        self.reader = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.other = CustomerUser.objects.create_user(username='other', email='other@libraff.az')
+        for book in self.books[::3]:
+            UserBookStatus.objects.create(user=self.reader, book=book, status=UserBookStatus.READING)
+
+    def statuses(self, response):
+        return {book['id']: book['user_status'] for book in response.data['results']}
+
+    def test_statuses_are_per_user_on_a_shared_page(self):
+        self.client.force_authenticate(self.reader)
+        reader_statuses = self.statuses(self.client.get('/api/v1/books/filter/', {'page_size': 12}))
+        self.client.force_authenticate(self.other)
+        other_statuses = self.statuses(self.client.get('/api/v1/books/filter/', {'page_size': 12}))
+
+        reading = {book.id for book in self.books[::3]}
+        self.assertEqual(
+            {book_id for book_id, value in reader_statuses.items() if value == UserBookStatus.READING},
+            reading,
+        )
+        self.assertEqual(set(other_statuses.values()), {UserBookStatus.UNREAD})
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.client.force_authenticate(self.reader)
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/books/filter/', {'page_size': 3})
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/books/filter/', {'page_size': 12})
+
+
+class BookDownloadTest(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        category = BookCategory.objects.create(category_name='Roman')
+        self.book = Book.objects.create(title='Ali ve Nino', category=category)
+        self.content = bytes(range(256)) * 40
+        self.book.pdf.save('ali.pdf', ContentFile(self.content))
+        self.user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/book/{self.book.id}/download/'
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(FILE_DELIVERY_MODE='x-accel', FILE_ACCEL_REDIRECT_PREFIX='/protected/')
+    def test_offload_to_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.book.pdf.name}')
+        self.assertEqual(response.content, b'')
+
+
+class BookListAPITest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        self.books = [
+            Book.objects.create(title=f'Book {index}', category=category)
+            for index in range(5)
+        ]
+        self.url = '/api/v1/books/'
+
+    def test_list_is_paginated(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [book['title'] for book in response.data['results']],
+            ['Book 4', 'Book 3'],
+        )
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_ndjson_export_streams_every_book(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'export': 'ndjson'})
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [book.id for book in self.books],
+        )
+
+    def test_json_array_export(self):
+        response = self.client.get(self.url, {'export': 'json'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['category'], 'Roman')
+
+    def test_unknown_export_format(self):
+        response = self.client.get(self.url, {'export': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImageVariantTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WIDTHS=[160, 320, 640])
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.category = BookCategory.objects.create(category_name='Roman')
+
+    def image(self, width, height, mode='RGB', image_format='JPEG'):
+        buffer = BytesIO()
+        Image.new(mode, (width, height), 'red').save(buffer, format=image_format)
+        return ContentFile(buffer.getvalue())
+
+    def test_cover_variants(self):
+        book = Book.objects.create(title='Ali ve Nino', category=self.category)
+        book.book_image.save('cover.jpg', self.image(1000, 1500), save=False)
+        with patch('books.signals.build_book_image_variants.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                book.save()
+        delay.assert_called_once_with(book.id)
+
+        self.assertTrue(build_book_image_variants(book.id))
+        book.refresh_from_db()
+        variants = book.book_image_variants
+        self.assertEqual(variants['source'], book.book_image.name)
+        for image_format in ('webp', 'jpeg'):
+            self.assertEqual(sorted(variants[image_format], key=int), ['160', '320', '640'])
+            path = variants[image_format]['320']
+            self.assertRegex(path, rf'^book_images/variants/cover-320w\.[0-9a-f]{{16}}\.{image_format}$')
+            with default_storage.open(path) as file:
+                self.assertEqual(Image.open(file).size, (320, 480))
+        # Nothing to do until the image changes.
+        self.assertFalse(build_book_image_variants(book.id))
+
+        data = self.client.get('/api/v1/books/').data['results'][0]
+        self.assertEqual(
+            data['book_image_variants']['webp']['160'],
+            f'{settings.MEDIA_URL}{variants["webp"]["160"]}',
+        )
+
+    def test_replaced_image_drops_old_variants(self):
+        book = Book.objects.create(title='Ali ve Nino', category=self.category)
+        book.book_image.save('cover.png', self.image(200, 100, 'RGBA', 'PNG'))
+        build_book_image_variants(book.id)
+        book.refresh_from_db()
+        # Narrower than every width but the smallest; never upscaled.
+        self.assertEqual(list(book.book_image_variants['jpeg']), ['160'])
+        old_paths = set(book.book_image_variants['jpeg'].values()) | set(book.book_image_variants['webp'].values())
+
+        book.book_image = None
+        book.save()
+        self.assertTrue(build_book_image_variants(book.id))
+        book.refresh_from_db()
+        self.assertEqual(book.book_image_variants, {})
+        self.assertFalse(any(default_storage.exists(path) for path in old_paths))
+
+    def test_avatar_variants(self):
+        user = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        user.avatar.save('me.jpg', self.image(400, 400))
+        self.assertTrue(build_avatar_variants(user.id))
+        user.refresh_from_db()
+        self.assertEqual(list(user.avatar_variants['webp']), ['160', '320'])
+        self.assertEqual(
+            CustomerUserSerializer(user).data['avatar_variants']['jpeg']['320'],
+            default_storage.url(user.avatar_variants['jpeg']['320']),
+        )
+
+
+class ImportBooksCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.roman = BookCategory.objects.create(category_name='Roman')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.csv_path = f'{directory}/feed.csv'
+        with open(self.csv_path, 'w', encoding='utf-8') as feed:
+            feed.write(
+                'title,author,context,price,category\n'
+                'Ali ve Nino,Qurban Seid,Baki,12,Roman\n'
+                'Dede Qorqud,,Dastan,8,Epos\n'
+                'Bad price,,,cheap,Roman\n'
+            )
+        self.jsonl_path = f'{directory}/feed.jsonl'
+        with open(self.jsonl_path, 'w', encoding='utf-8') as feed:
+            for index in range(5):
+                feed.write(json.dumps({'title': f'Kitab {index}', 'category': 'Epos'}) + '\n')
+
+    def test_csv_import(self):
+        generation = get_generation('Book_list')
+        out = StringIO()
+        call_command('import_books', self.csv_path, '--batch-size', '2', stdout=out)
+
+        self.assertIn('2 books imported, 1 skipped', out.getvalue())
+        self.assertEqual(BookCategory.objects.filter(category_name='Roman').count(), 1)
+        self.assertEqual(Book.objects.get(title='Ali ve Nino').category, self.roman)
+        self.assertEqual(Book.objects.get(title='Dede Qorqud').category.category_name, 'Epos')
+        self.assertEqual([book.title for book in search_books('nino')], ['Ali ve Nino'])
+        self.assertNotEqual(get_generation('Book_list'), generation)
+
+    def test_copy_writes_every_required_column(self):
+        required = {
+            field.column for field in Book._meta.concrete_fields
+            if not field.primary_key and not field.null and field.db_default is NOT_PROVIDED
+        }
+        self.assertLessEqual(required, set(COPY_COLUMNS))
+
+        book = Book(category_id=self.roman.id, title='Ali ve Nino', pdf='')
+        with patch('books.importer.connection') as connection_mock:
+            BookImporter().copy([book])
+        copy_expert = connection_mock.cursor.return_value.__enter__.return_value.cursor.copy_expert
+        sql, buffer = copy_expert.call_args.args
+        self.assertIn(f'({", ".join(COPY_COLUMNS)})', sql)
+        row = dict(zip(COPY_COLUMNS, next(csv.reader(buffer))))
+        self.assertEqual(len(row), len(COPY_COLUMNS))
+        self.assertEqual(row['book_image_variants'], '{}')
+        self.assertIsNotNone(parse_datetime(row['created_at']))
+
+    def test_jsonl_import_in_batches(self):
+        call_command('import_books', self.jsonl_path, '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(Book.objects.filter(category__category_name='Epos').count(), 5)
+        self.assertEqual(BookCategory.objects.filter(category_name='Epos').count(), 1)
+
+    def test_corrupt_rows_are_skipped(self):
+        with open(self.jsonl_path, 'w', encoding='utf-8') as feed:
+            feed.write(json.dumps({'title': 'Kitab 0', 'category': 'Epos'}) + '\n')
+            feed.write('{"title": "Kitab 1", "category": \n')
+            feed.write(json.dumps({'title': 'x' * 256, 'category': 'Epos'}) + '\n')
+            feed.write(json.dumps({'title': 'Kitab 3', 'category': 'x' * 101}) + '\n')
+            feed.write(json.dumps({'title': ['Kitab 4'], 'category': 'Epos'}) + '\n')
+            feed.write(json.dumps(['Kitab 5']) + '\n')
+            feed.write(json.dumps({'title': 'Kitab 6', 'category': 'Epos', 'price': 7}) + '\n')
+        out = StringIO()
+        call_command('import_books', self.jsonl_path, '--batch-size', '3', stdout=out)
+
+        self.assertIn('2 books imported, 5 skipped', out.getvalue())
+        self.assertEqual(
+            list(Book.objects.order_by('title').values_list('title', flat=True)),
+            ['Kitab 0', 'Kitab 6'],
+        )
+        self.assertFalse(BookCategory.objects.filter(category_name__startswith='xxx').exists())
+
+
+class BenchmarkTest(TestCase):
+    def test_every_get_route_is_driven(self):
+        ids = dataset.seed('tiny', seed=1)
+        result = report.summarize(runner.run(ids, iterations=1), {'scale': 'tiny'})
+
+        self.assertIn('apis:book-detail', result['routes'])
+        self.assertNotIn('apis:create-comment', result['routes'])
+        for name, route in result['routes'].items():
+            if name != 'apis:download-book':
+                self.assertEqual(route['warm']['status'], status.HTTP_200_OK, name)
+        self.assertEqual(report.compare(result, result), [])
+
+        slower = json.loads(json.dumps(result))
+        slower['routes']['apis:books']['cold']['queries'] += 1
+        self.assertEqual(len(report.compare(result, slower)), 1)
+
+    def test_seed_is_deterministic(self):
+        dataset.seed('tiny', seed=7)
+        titles = list(Book.objects.order_by('id').values_list('title', flat=True))
+        Book.objects.all().delete()
+        BookCategory.objects.all().delete()
+        CustomerUser.objects.all().delete()
+        dataset.seed('tiny', seed=7)
+        self.assertEqual(list(Book.objects.order_by('id').values_list('title', flat=True)), titles)
+
+
+class QueryBudgetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_every_route_stays_within_its_budget(self):
+        # Cold cache: the worst case every budget has to cover.
+        ids = dataset.seed('tiny', seed=3)
+        samples = runner.run(ids, iterations=1)
+        for name, route in samples.items():
+            self.assertLess(route['cold'][0]['status'], 500, name)
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_overrun_raises(self):
+        category = BookCategory.objects.create(category_name='Roman')
+        for index in range(3):
+            Book.objects.create(title=f'Book {index}', category=category)
+
+        with patch.object(BookListAPIView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded) as raised:
+                self.client.get('/api/v1/books/')
+        self.assertIn('budget 1', str(raised.exception))
+
+    @override_settings(QUERY_BUDGET_MODE='warn')
+    def test_stacks_only_captured_past_the_budget(self):
+        with patch('libraff.middleware.project_stack', return_value=[]) as project_stack:
+            self.client.get('/api/v1/categories/')
+        project_stack.assert_not_called()
+
+        with patch.object(BookListAPIView, 'query_budget', 0):
+            with patch('libraff.middleware.project_stack', return_value=[]) as project_stack:
+                self.client.get('/api/v1/books/')
+        self.assertTrue(project_stack.called)
+
+    def test_report_groups_repeated_sql(self):
+        request = APIRequestFactory().get('/api/v1/books/')
+        stack = traceback.extract_stack()[-1:]
+        queries = [('SELECT 1', stack)] + [('SELECT user WHERE id = %s', stack)] * 3
+        text = budget_report(request, queries, 2)
+        self.assertIn('ran 4 queries, budget 2', text)
+        self.assertIn('3x SELECT user WHERE id = %s', text)
+        self.assertNotIn('SELECT 1', text)
+
+    @override_settings(QUERY_BUDGET_MODE='warn')
+    def test_warn_mode_sets_header(self):
+        response = self.client.get('/api/v1/categories/')
+        self.assertEqual(response['X-Query-Budget'], '1/2')
+
+
+class LoggingPipelineTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = f'{directory}/test.log'
+
+    def make_logger(self, handler):
+        logger = logging.getLogger(f'pipeline_test_{id(handler)}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        listener = LogListener()
+        logger.addHandler(RoutingQueueHandler(listener, [handler]))
+        self.addCleanup(handler.close)
+        return logger, listener
+
+    def test_records_are_written_as_json_by_the_listener(self):
+        handler = CompressedRotatingFileHandler(self.path)
+        handler.setFormatter(JSONFormatter())
+        logger, listener = self.make_logger(handler)
+
+        logger.info('User_%s_liked_%s', 1, 2, extra={'user_id': 1})
+        listener.stop()
+
+        with open(self.path, encoding='utf-8') as log:
+            entry = json.loads(log.readline())
+        self.assertEqual(entry['message'], 'User_1_liked_2')
+        self.assertEqual(entry['user_id'], 1)
+        self.assertEqual(entry['level'], 'INFO')
+
+    def test_rotated_files_are_compressed(self):
+        handler = CompressedRotatingFileHandler(self.path, maxBytes=200, backupCount=2)
+        handler.setFormatter(JSONFormatter())
+        logger, listener = self.make_logger(handler)
+
+        for index in range(20):
+            logger.info('line %s', index)
+        listener.stop()
+
+        with gzip.open(f'{self.path}.1.gz', 'rt', encoding='utf-8') as rotated:
+            self.assertIn('"message": "line', rotated.read())
+        self.assertFalse(os.path.exists(f'{self.path}.3.gz'))
+
+    def test_processes_sharing_a_file_lose_no_lines(self):
+        # Two handlers on one file stand in for two processes.
+        handlers = [CompressedRotatingFileHandler(self.path, maxBytes=300, backupCount=20) for _ in range(2)]
+        for handler in handlers:
+            handler.setFormatter(JSONFormatter())
+            self.addCleanup(handler.close)
+        for index in range(40):
+            handler = handlers[index % 2]
+            handler.handle(logging.makeLogRecord({'msg': f'line {index}', 'levelno': logging.INFO}))
+            handler.flush()
+
+        lines = []
+        for name in os.listdir(os.path.dirname(self.path)):
+            path = os.path.join(os.path.dirname(self.path), name)
+            if name.endswith('.gz'):
+                with gzip.open(path, 'rt', encoding='utf-8') as rotated:
+                    lines += rotated.read().splitlines()
+            elif name.endswith('.log'):
+                with open(path, encoding='utf-8') as current:
+                    lines += current.read().splitlines()
+        self.assertTrue(os.path.exists(f'{self.path}.2.gz'))
+        self.assertEqual(
+            sorted(json.loads(line)['message'] for line in lines),
+            sorted(f'line {index}' for index in range(40)),
+        )
+
+    def test_records_are_formatted_once(self):
+        handler = CompressedRotatingFileHandler(self.path, maxBytes=200, backupCount=2)
+        self.addCleanup(handler.close)
+        formatter = JSONFormatter()
+        handler.setFormatter(formatter)
+        with patch.object(formatter, 'format', wraps=formatter.format) as format_record:
+            for index in range(5):
+                handler.handle(logging.makeLogRecord({'msg': f'line {index}', 'levelno': logging.INFO}))
+            handler.flush()
+        self.assertEqual(format_record.call_count, 5)
+
+
+class RequestTimingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = BookCategory.objects.create(category_name='Roman')
+        Book.objects.create(title='Book', category=category)
+
+    def phases(self, header):
+        return {
+            entry.split(';')[0].strip(): entry
+            for entry in header.split(',')
+        }
+
+    def test_server_timing_splits_the_request(self):
+        first = self.phases(self.client.get('/api/v1/books/')['Server-Timing'])
+        self.assertEqual(set(first), {'total', 'db', 'cache', 'serialize'})
+        self.assertIn('0 hits/1 misses', first['cache'])
+        self.assertNotIn('desc="0 queries"', first['db'])
+
+        second = self.phases(self.client.get('/api/v1/books/')['Server-Timing'])
+        self.assertIn('1 hits/0 misses', second['cache'])
+        self.assertIn('desc="0 queries"', second['db'])
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/v1/categories/'))
+
+    def test_histograms_are_exported_to_prometheus(self):
+        routes = routed_views()
+        self.assertIn(('apis:books', 'GET'), routes)
+        request_metrics.reset(routes)
+        self.client.get('/api/v1/books/')
+        self.client.get('/api/v1/books/')
+
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(
+                self.client.get('/api/v1/metrics/', HTTP_AUTHORIZATION='Metrics wrong').status_code,
+                status.HTTP_401_UNAUTHORIZED,
+            )
+            response = self.client.get('/api/v1/metrics/', HTTP_AUTHORIZATION='Metrics secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE libraff_request_total_seconds histogram', text)
+        self.assertIn(
+            'libraff_request_total_seconds_bucket{view="apis:books",method="GET",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn('libraff_request_cache_hits_total{view="apis:books",method="GET"} 1', text)
+
+    def test_buckets_are_cumulative(self):
+        timing = RequestTiming()
+        timing.seconds.update(total=0.003, db=0.0, cache=0.0, serialize=20.0)
+        request_metrics.reset([('view', 'GET')])
+        request_metrics.observe('view', 'GET', timing)
+        request_metrics.flush()
+
+        text = render_prometheus(request_metrics.collect([('view', 'GET')]))
+        self.assertIn('libraff_request_total_seconds_bucket{view="view",method="GET",le="0.0025"} 0', text)
+        self.assertIn('libraff_request_total_seconds_bucket{view="view",method="GET",le="0.005"} 1', text)
+        self.assertIn('libraff_request_serialize_seconds_bucket{view="view",method="GET",le="10.0"} 0', text)
+        self.assertIn('libraff_request_serialize_seconds_bucket{view="view",method="GET",le="+Inf"} 1', text)
+        self.assertIn('libraff_request_total_seconds_sum{view="view",method="GET"} 0.003', text)
+
+
+class AsyncReadPathTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = BookCategory.objects.create(category_name='Roman')
+        for index in range(12):
+            Book.objects.create(title=f'Book {index}', author='Nizami', category=self.category, price=20)
+        self.book = Book.objects.first()
+        self.reader = CustomerUser.objects.create_user(username='reader', email='reader@libraff.az')
+        Comment.objects.create(user=self.reader, book=self.book, content='Great')
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.reader).access_token}'}
+        self.async_client = AsyncClient()
+        self.urls = [
+            '/api/v1/categories/',
+            f'/api/v1/categories/{self.category.id}/books/?page=2',
+            f'/api/v1/categories/{self.category.id}/books/?cursor=',
+            '/api/v1/books/search/?query=Book',
+            '/api/v1/books/filter/?price_from=10&author=Nizami',
+            '/api/v1/books/filter/?author=nizami&facets=true',
+            f'/api/v1/book/{self.book.id}/comments/',
+            f'/api/v1/book/{self.book.id}/',
+        ]
+
+    def test_hot_routes_are_async_under_asgi(self):
+        requests = runner.route_requests({
+            'category_id': self.category.id,
+            'book_id': self.book.id,
+            'comment_id': 1,
+            'user_id': self.reader.id,
+            'favorite_id': 1,
+            'query': 'Book',
+        })
+        for name in concurrency.HOT_ROUTES:
+            match = resolve(requests[name][0], urlconf=settings.ASGI_URLCONF)
+            self.assertTrue(issubclass(match.func.view_class, AsyncAPIView), name)
+            self.assertFalse(issubclass(resolve(requests[name][0]).func.view_class, AsyncAPIView))
+
+    def test_async_views_take_their_declarations_from_the_sync_view(self):
+        requests = runner.route_requests({
+            'category_id': 1, 'book_id': 1, 'comment_id': 1, 'user_id': 1, 'favorite_id': 1, 'query': 'Book',
+        })
+        for name in concurrency.HOT_ROUTES:
+            view = resolve(requests[name][0], urlconf=settings.ASGI_URLCONF).func.view_class
+            for attribute in AsyncAPIView.SHARED_WITH_SYNC_VIEW:
+                self.assertEqual(
+                    getattr(view, attribute, None), getattr(view.sync_view, attribute, None), (name, attribute),
+                )
+        with self.assertRaises(TypeError):
+            type('Drifted', (AsyncAPIView,), {'sync_view': BookListAPIView, 'query_budget': 9})
+
+    async def test_async_views_answer_like_the_drf_views(self):
+        for url in self.urls:
+            await cache.aclear()
+            expected = await self.sync_get(url)
+            await cache.aclear()
+            response = await self.async_client.get(url, headers=self.auth)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertEqual(json.loads(response.content), expected, url)
+
+    async def test_cache_entries_are_shared_with_the_wsgi_views(self):
+        url = f'/api/v1/categories/{self.category.id}/books/'
+        await self.sync_get(url)
+        response = await self.async_client.get(url)
+        self.assertIn('1 hits/0 misses', response['Server-Timing'])
+        self.assertIn('desc="0 queries"', response['Server-Timing'])
+
+    async def test_errors_match_drf(self):
+        response = await self.async_client.get(f'/api/v1/book/{self.book.id}/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        response = await self.async_client.get('/api/v1/categories/999/books/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            json.loads(response.content),
+            {'detail': 'No BookCategory matches the given query.'},
+        )
+
+        response = await self.async_client.get(f'/api/v1/book/{self.book.id}/comments/?page=9')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_other_methods_reach_the_drf_view(self):
+        response = await self.async_client.patch(
+            f'/api/v1/book/{self.book.id}/',
+            {'status': UserBookStatus.FINISHED},
+            content_type='application/json',
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get(f'/api/v1/book/{self.book.id}/', headers=self.auth)
+        self.assertEqual(json.loads(response.content)['user_status'], UserBookStatus.FINISHED)
+
+    @override_settings(QUERY_BUDGET_MODE='warn')
+    async def test_async_queries_are_counted(self):
+        response = await self.async_client.get(f'/api/v1/book/{self.book.id}/', headers=self.auth)
+        self.assertEqual(response['X-Query-Budget'], '3/4')
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+    async def sync_get(self, url):
+        response = await sync_to_async(self.client.get)(url, headers=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return json.loads(response.content)
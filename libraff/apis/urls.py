@@ -5,6 +5,7 @@ from .user_apis import *
 from .book_apis import *
 from .interaction_apis import *
 from .favorite_apis import *
+from .cache_apis import *
 
 app_name = 'apis'
 
@@ -21,15 +22,18 @@ urlpatterns = [
     path('categories/<int:category_id>/books/', BookListForCategoryAPIView.as_view(), name='category-books'),
     path('books/', BookListAPIView.as_view(), name='books'),
     path('book/<int:book_id>/', BookDetailAPIView.as_view(), name='book-detail'),
-    path('book/<int:book_id>/comments/', CommentManagementAPIView.as_view(), name='manage-comments'),
     path('book/<int:book_id>/download/', BookDownloadAPIView.as_view(), name='download-book'),
+    path('book/<int:book_id>/similar/', SimilarBooksAPIView.as_view(), name='similar-books'),
     path('books/search/', BookSearchAPIView.as_view(), name='book-search'),
     path('books/filter/', BookFilterAPIView.as_view(), name='book-filter'),
+    path('books/trending/', TrendingBooksAPIView.as_view(), name='trending-books'),
+    path('books/trending/category/<int:category_id>/', TrendingBooksForCategoryAPIView.as_view(), name='trending-books-for-category'),
 
     # İnteraksiya endpoint-ləri:
     path('book/<int:book_id>/comments/', CommentsForBookAPIView.as_view(), name='comments-for-book'),
     path('book/<int:book_id>/comment/create/', CreateCommentAPIView.as_view(), name='create-comment'),
     path('book/<int:book_id>/comment/<int:comment_id>/detail/', CommentDetailAPIView.as_view(), name='comment-detail'),
+    path('comment/<int:comment_id>/manage/', CommentManagementAPIView.as_view(), name='manage-comments'),
     path('user/<int:user_id>/comments/', CommentListForUserAPIView.as_view(), name='user-comments'),
     path('book/<int:book_id>/likes/', LikeListForBookAPIView.as_view(), name='likes-for-book'),
     path('comment/<int:comment_id>/likes/', LikeListForCommentAPIView.as_view(), name='likes-for-comment'),
@@ -43,6 +47,10 @@ urlpatterns = [
     path('book/<int:book_id>/favorite/create/', CreateFavoriteAPIView.as_view(), name='create-favorite'),
     path('favorite/<int:favorite_id>/manage/', FavoriteManagementAPIView.as_view(), name='manage-favorite'),
 
+    # Keş endpoint-ləri:
+    path('cache/stats/', CacheStatsAPIView.as_view(), name='cache-stats'),
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),
+
     # JWT endpoint-ləri:
     path('api/token/', jwt_views.TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', jwt_views.TokenRefreshView.as_view(), name='token_refresh'),
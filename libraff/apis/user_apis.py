@@ -4,9 +4,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.db import transaction
-from django.core.cache import cache
 
-from libraff.settings import CACHETIMEOUT
+from utils.cache_mixins import CachedResponseMixin
 from utils.custom_pagination import CustomPagination
 from users.models import CustomerUser
 from users.serializers import (
@@ -86,58 +85,49 @@ class LogoutAPIView(APIView):
             )
 
 
-class UserListAPIView(APIView):
+class UserListAPIView(CachedResponseMixin, APIView):
     """API view for listing users."""
     permission_classes = [AllowAny]
     pagination_class = CustomPagination
+    cache_family = 'User_list'
+    cache_vary_on = ('page', 'page_size', 'cursor')
+    cursor_ordering = ('id',)
+    cache_depends_on = ('User_list',)
+    query_budget = 5
 
     def get(self, request):
         """Get paginated list of users."""
-        page = int(request.query_params.get('page', '1'))
-        page_size = int(request.query_params.get('page_size', '10'))
-        cache_key = f'User_list_page_{page}_size_{page_size}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        try:
+        def compute():
             pagination = self.pagination_class()
-            user = CustomerUser.objects.all()
-            result_page = pagination.paginate_queryset(user, request)
+            user = CustomerUser.objects.prefetch_related(
+                'groups',
+                'user_permissions',
+            ).order_by('id')
+            result_page = pagination.paginate_queryset(user, request, view=self)
             serializer = CustomerUserSerializer(result_page, many=True)
-            paginated_response = pagination.get_paginated_response(
-                serializer.data,
-            ).data
-            cache.set(cache_key, paginated_response, timeout=CACHETIMEOUT)
-            return Response(
-                paginated_response,
-                status=status.HTTP_200_OK,
-            )
-        except CustomerUser.DoesNotExist:
-            return Response(
-                {'message': 'Users not found'},
-                status=status.HTTP_404_NOT_FOUND,
-            )
+            return pagination.get_paginated_response(serializer.data).data
+
+        paginated_response = self.get_cached_data(compute)
+        return Response(paginated_response, status=status.HTTP_200_OK)
 
 
-class AccountDetailAPIView(APIView):
+class AccountDetailAPIView(CachedResponseMixin, APIView):
     """API view for user account details."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    cache_family = 'User_detail'
+    cache_vary_on = ('user_id',)
+    cache_depends_on = ('User_detail_{user_id}',)
+    query_budget = {'GET': 4}
 
     def get(self, request, user_id):
         """Get user details."""
-        cache_key = f'User_detail_{user_id}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        
-        user = get_object_or_404(CustomerUser, id=user_id)
-        serializer = CustomerUserSerializer(user)
-        cache.set(cache_key, serializer.data, timeout=CACHETIMEOUT)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def compute():
+            user = get_object_or_404(CustomerUser, id=user_id)
+            return CustomerUserSerializer(user).data
+
+        data = self.get_cached_data(compute)
+        return Response(data, status=status.HTTP_200_OK)
 
     def patch(self, request, user_id):
         """Update user account details."""
@@ -0,0 +1,10 @@
+"""
+Endpoint benchmarks.
+
+``dataset`` seeds a deterministic catalog at a chosen scale, ``runner``
+drives every GET route of ``apis.urls`` through the test client with a
+cold and a warm cache, and ``report`` summarises, saves and compares runs.
+``python manage.py benchmark_api`` ties them together. ``concurrency``
+loads the hot read endpoints with many concurrent clients through the WSGI
+and the ASGI handler (``python manage.py benchmark_concurrency``).
+"""
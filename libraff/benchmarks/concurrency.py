@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from benchmarks.report import percentile
+from benchmarks.runner import route_requests
+
+WSGI = 'wsgi'
+ASGI = 'asgi'
+HANDLERS = (WSGI, ASGI)
+
+# The endpoints that have async views in apis.async_urls.
+HOT_ROUTES = (
+    'apis:categories',
+    'apis:category-books',
+    'apis:book-detail',
+    'apis:book-search',
+    'apis:book-filter',
+    'apis:comments-for-book',
+)
+
+
+def hot_requests(ids: dict) -> list:
+    requests = route_requests(ids)
+    return [requests[name] for name in HOT_ROUTES]
+
+
+def run_wsgi(requests: list, total: int, concurrency: int, headers: dict) -> list:
+    """``total`` requests from ``concurrency`` threads, like a threaded WSGI worker."""
+    local = threading.local()
+
+    def send(index):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        url, params = requests[index % len(requests)]
+        started = time.perf_counter()
+        response = client.get(url, params, headers=headers)
+        return time.perf_counter() - started, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(send, range(total)))
+
+
+async def run_asgi(requests: list, total: int, concurrency: int, headers: dict) -> list:
+    """``total`` requests from ``concurrency`` tasks on one event loop."""
+    client = AsyncClient()
+    indexes = iter(range(total))
+    results = []
+
+    async def worker():
+        for index in indexes:
+            url, params = requests[index % len(requests)]
+            started = time.perf_counter()
+            # What ASGIHandler does around every request.
+            async with ThreadSensitiveContext():
+                response = await client.get(url, params, headers=headers)
+            results.append((time.perf_counter() - started, response.status_code))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def measure(handler: str, requests: list, total: int, concurrency: int, headers: dict) -> dict:
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    if handler == WSGI:
+        results = run_wsgi(requests, total, concurrency, headers)
+    else:
+        results = asyncio.run(run_asgi(requests, total, concurrency, headers))
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    latencies = [seconds * 1000 for seconds, _ in results]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, status_code in results if status_code >= 400),
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'rps': round(len(results) / wall, 1),
+        # One process is one core's worth of work: requests per CPU-second.
+        'rps_per_core': round(len(results) / max(cpu, 1e-9), 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+def run(ids: dict, total: int = 2000, concurrency: int = 50) -> dict:
+    """
+    Load the hot read endpoints through each handler with a warm cache and
+    ``concurrency`` clients in flight; return the throughput of each.
+    """
+    headers = {'Authorization': f'Bearer {RefreshToken.for_user(ids["user"]).access_token}'}
+    requests = hot_requests(ids)
+    client = Client()
+    for url, params in requests:
+        client.get(url, params, headers=headers)
+    return {
+        handler: measure(handler, requests, total, concurrency, headers)
+        for handler in HANDLERS
+    }
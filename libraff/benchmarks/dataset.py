@@ -0,0 +1,138 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+
+from books.models import Book, BookCategory, UserBookStatus
+from books.search import index_books
+from books.tasks import reconcile_counters
+from favorites.models import Favorite
+from interactions.models import Comment, Like
+from users.models import CustomerUser
+
+SCALES = {
+    'tiny': {'categories': 3, 'books': 30, 'users': 10, 'comments': 60, 'likes': 120, 'favorites': 40},
+    'small': {'categories': 10, 'books': 1000, 'users': 200, 'comments': 5000, 'likes': 10000, 'favorites': 2000},
+    'medium': {'categories': 30, 'books': 10000, 'users': 2000, 'comments': 50000, 'likes': 100000, 'favorites': 20000},
+    'large': {'categories': 60, 'books': 100000, 'users': 20000, 'comments': 500000, 'likes': 1000000, 'favorites': 200000},
+}
+BATCH_SIZE = 5000
+WORDS = (
+    'kitab roman tarix elm sevgi qala deniz ulduz yol gece seher bag '
+    'daglar xatire nagil dastan insan zaman yuxu kend seher'
+).split()
+
+
+def _skewed(rng, size: int) -> int:
+    # A few books, users and comments attract most of the activity.
+    return min(int(rng.paretovariate(1.16)) - 1, size - 1)
+
+
+def _unique_pairs(rng, count, left, right):
+    pairs = set()
+    attempts = 0
+    while len(pairs) < count and attempts < count * 20:
+        pairs.add((_skewed(rng, left), rng.randrange(right)))
+        attempts += 1
+    return sorted(pairs)
+
+
+def seed(scale: str = 'small', seed: int = 42) -> dict:
+    """
+    Fill the database with the ``scale`` dataset and return the ids the
+    benchmark routes are driven with. The same ``seed`` gives the same data.
+    """
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+
+    categories = BookCategory.objects.bulk_create(
+        BookCategory(category_name=f'Category {index}')
+        for index in range(sizes['categories'])
+    )
+    books = Book.objects.bulk_create(
+        (
+            Book(
+                category=categories[index % len(categories)],
+                title=' '.join(rng.choices(WORDS, k=3)).title(),
+                author=f'Author {rng.randrange(sizes["books"] // 5 + 1)}',
+                context=' '.join(rng.choices(WORDS, k=20)),
+                price=rng.randint(1, 150),
+            )
+            for index in range(sizes['books'])
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    password = make_password(None)
+    users = CustomerUser.objects.bulk_create(
+        (
+            CustomerUser(
+                username=f'bench_{index}',
+                email=f'bench_{index}@libraff.az',
+                password=password,
+                is_staff=index == 0,
+            )
+            for index in range(sizes['users'])
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    comments = Comment.objects.bulk_create(
+        (
+            Comment(
+                user=users[rng.randrange(len(users))],
+                book=books[_skewed(rng, len(books))],
+                content=' '.join(rng.choices(WORDS, k=12)),
+            )
+            for _ in range(sizes['comments'])
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    book_likes = _unique_pairs(rng, sizes['likes'] // 2, len(books), len(users))
+    comment_likes = _unique_pairs(rng, sizes['likes'] // 2, len(comments), len(users))
+    Like.objects.bulk_create(
+        [Like(book=books[book], user=users[user]) for book, user in book_likes]
+        + [Like(comment=comments[comment], user=users[user]) for comment, user in comment_likes],
+        batch_size=BATCH_SIZE,
+    )
+    favorites = Favorite.objects.bulk_create(
+        (
+            Favorite(
+                book=books[book],
+                user=users[user],
+                status=Favorite.OPEN if rng.random() < 0.7 else Favorite.PRIVATE,
+            )
+            for book, user in _unique_pairs(rng, sizes['favorites'], len(books), len(users))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    UserBookStatus.objects.bulk_create(
+        (
+            UserBookStatus(
+                user=users[user],
+                book=books[book],
+                status=rng.choice([choice for choice, _ in UserBookStatus.STATUS_LIST]),
+            )
+            for book, user in _unique_pairs(rng, sizes['favorites'], len(books), len(users))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    # bulk_create skips the signals that keep these in step.
+    index_books(Book.objects.all())
+    reconcile_counters()
+
+    # The most active book, and a comment and favorite the driving user
+    # (users[0], a staff member) may open.
+    comment = Comment.objects.filter(book=books[0]).first() or comments[0]
+    favorite = (
+        Favorite.objects.filter(user=users[0]).first()
+        or Favorite.objects.filter(status=Favorite.OPEN).first()
+        or favorites[0]
+    )
+    return {
+        'user': users[0],
+        'category_id': categories[0].id,
+        'book_id': comment.book_id,
+        'comment_id': comment.id,
+        'user_id': users[0].id,
+        'favorite_id': favorite.id,
+        'query': books[0].title.split()[0],
+    }
@@ -0,0 +1,77 @@
+import json
+import math
+import platform
+from datetime import datetime, timezone
+
+from django.db import connection
+
+from benchmarks.runner import COLD, WARM
+
+MODES = (COLD, WARM)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(samples: dict, meta: dict) -> dict:
+    routes = {}
+    for name, route in samples.items():
+        routes[name] = {'url': route['url'], 'params': route['params']}
+        for mode in MODES:
+            runs = route[mode]
+            latencies = [run['ms'] for run in runs]
+            routes[name][mode] = {
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'queries': max(run['queries'] for run in runs),
+                'bytes': max(run['bytes'] for run in runs),
+                'status': runs[-1]['status'],
+            }
+    return {
+        'meta': {
+            **meta,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+        },
+        'routes': routes,
+    }
+
+
+def save(report: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+
+def load(path: str) -> dict:
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2) -> list:
+    """
+    Return one line per regression of ``current`` against ``baseline``:
+    any extra query, or bytes or p95 latency more than ``threshold`` higher.
+    """
+    regressions = []
+    for name, route in current['routes'].items():
+        before = baseline['routes'].get(name)
+        if before is None:
+            continue
+        for mode in MODES:
+            old, new = before[mode], route[mode]
+            if new['queries'] > old['queries']:
+                regressions.append(f'{name} [{mode}] queries {old["queries"]} -> {new["queries"]}')
+            if new['bytes'] > old['bytes'] * (1 + threshold):
+                regressions.append(f'{name} [{mode}] bytes {old["bytes"]} -> {new["bytes"]}')
+            if new['p95_ms'] > old['p95_ms'] * (1 + threshold):
+                regressions.append(
+                    f'{name} [{mode}] p95 {old["p95_ms"]:.2f}ms -> {new["p95_ms"]:.2f}ms'
+                )
+    return regressions
@@ -0,0 +1,85 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from rest_framework.test import APIClient
+
+COLD = 'cold'
+WARM = 'warm'
+
+
+def get_routes() -> list:
+    """Return ``(name, url kwargs)`` of every GET route in ``apis.urls``."""
+    routes = []
+
+    def walk(patterns, namespace=None):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                walk(pattern.url_patterns, pattern.namespace or namespace)
+                continue
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if namespace != 'apis' or view_class is None or not hasattr(view_class, 'get'):
+                continue
+            routes.append((f'{namespace}:{pattern.name}', list(pattern.pattern.converters)))
+
+    walk(get_resolver().url_patterns)
+    return routes
+
+
+def route_params(ids: dict) -> dict:
+    """Query parameters the list endpoints are driven with."""
+    return {
+        'apis:book-search': {'query': ids['query']},
+        'apis:book-filter': {'price_from': 10, 'price_to': 100},
+    }
+
+
+def route_requests(ids: dict) -> dict:
+    """Map every GET route to the ``(url, query parameters)`` it is driven with."""
+    params = route_params(ids)
+    return {
+        name: (
+            reverse(name, kwargs={argument: ids[argument] for argument in arguments}),
+            params.get(name, {}),
+        )
+        for name, arguments in get_routes()
+    }
+
+
+def _request(client, url, params):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url, params)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+    return {
+        'ms': elapsed * 1000,
+        'queries': len(queries),
+        'bytes': size,
+        'status': response.status_code,
+    }
+
+
+def run(ids: dict, iterations: int = 20) -> dict:
+    """
+    Time every route ``iterations`` times with an empty cache (cold) and
+    after one priming request (warm); return the raw samples per route.
+    """
+    client = APIClient()
+    client.force_authenticate(ids['user'])
+
+    samples = {}
+    for name, (url, query) in route_requests(ids).items():
+        cold = []
+        for _ in range(iterations):
+            cache.clear()
+            cold.append(_request(client, url, query))
+        _request(client, url, query)
+        warm = [_request(client, url, query) for _ in range(iterations)]
+        samples[name] = {'url': url, 'params': query, COLD: cold, WARM: warm}
+    return samples
@@ -0,0 +1,293 @@
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from books.models import Book
+
+# Words and word pairs of each field count this much towards a book's vector.
+FIELD_WEIGHTS = {'title': 2.0, 'author': 1.5, 'context': 1.0}
+TOKEN = re.compile(r'\w+')
+TEXT_FIELDS = ('id', 'title', 'author', 'context')
+
+META = 'meta.json'
+LOCK = 'lock'
+VECTORS = 'vectors.f32'
+IDS = 'ids.i64'
+IDF = 'idf.f32'
+MIN_CAPACITY = 1024
+
+
+def terms(title, author, context) -> dict:
+    """Words and word pairs of a book's text, weighted ``(1 + log tf) * field weight``."""
+    weights = Counter()
+    for field, text in (('title', title), ('author', author), ('context', context)):
+        words = TOKEN.findall((text or '').lower())
+        counts = Counter(words + [f'{first} {second}' for first, second in zip(words, words[1:])])
+        for term, count in counts.items():
+            weights[term] += (1 + math.log(count)) * FIELD_WEIGHTS[field]
+    return weights
+
+
+def hashed(weights: dict, dimensions: int):
+    """
+    ``(buckets, values)`` of ``weights`` hashed into ``dimensions`` buckets.
+    crc32 is the same in every process; its top bit signs the value so that
+    collisions cancel out on average instead of adding up.
+    """
+    hashes = np.fromiter(
+        (zlib.crc32(term.encode('utf-8')) for term in weights),
+        dtype=np.uint32,
+        count=len(weights),
+    )
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    values = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+    return (hashes % dimensions).astype(np.int64), signs * values
+
+
+def vectorize(rows: list, idf) -> np.ndarray:
+    """L2-normalized TF-IDF vectors of ``(id, title, author, context)`` rows."""
+    vectors = np.zeros((len(rows), len(idf)), dtype=np.float32)
+    for index, (_, title, author, context) in enumerate(rows):
+        buckets, values = hashed(terms(title, author, context), len(idf))
+        np.add.at(vectors[index], buckets, values.astype(np.float32))
+    vectors *= idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+def _book_rows(chunk_size: int):
+    rows = []
+    for row in Book.objects.order_by('id').values_list(*TEXT_FIELDS).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+class ContentIndex:
+    """
+    Hashed TF-IDF vectors of every book's title, author and context in a
+    memory-mapped file, for nearest-neighbour queries by text.
+
+    ``build`` writes a new version of the files and points ``meta.json``
+    at it; ``update`` rewrites or appends one book's row in place. Readers
+    map the files read-only and reopen them when ``meta.json`` changes, so
+    every process shares the same pages.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._stamp = None
+        self._meta = None
+        self._vectors = None
+        self._ids = None
+        self._idf = None
+
+    @property
+    def directory(self) -> str:
+        return self._directory or settings.CONTENT_INDEX_DIR
+
+    def _path(self, *names) -> str:
+        return os.path.join(self.directory, *names)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(LOCK), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict):
+        with open(self._path(f'{META}.tmp'), 'w') as file:
+            json.dump(meta, file)
+        os.replace(self._path(f'{META}.tmp'), self._path(META))
+
+    def _open(self, meta: dict, mode: str):
+        version = meta['version']
+        shape = (meta['capacity'], meta['dimensions'])
+        return (
+            np.memmap(self._path(version, VECTORS), dtype=np.float32, mode=mode, shape=shape),
+            np.memmap(self._path(version, IDS), dtype=np.int64, mode=mode, shape=(meta['capacity'],)),
+            np.fromfile(self._path(version, IDF), dtype=np.float32),
+        )
+
+    def _refresh(self) -> bool:
+        """Map the current version read-only; False while there is no index."""
+        try:
+            stat = os.stat(self._path(META))
+        except FileNotFoundError:
+            return False
+        # meta.json is replaced, never rewritten, so a new inode is a new state.
+        stamp = (self.directory, stat.st_ino, stat.st_mtime_ns)
+        if stamp != self._stamp:
+            meta = self._read_meta()
+            self._vectors, self._ids, self._idf = self._open(meta, 'r')
+            self._meta, self._stamp = meta, stamp
+        return True
+
+    def build(self, chunk_size: int = None, dimensions: int = None, capacity: int = None) -> dict:
+        """
+        Index every book from scratch: one pass over the catalog counts
+        document frequencies, a second writes the vectors ``chunk_size``
+        books at a time into a new version of the files.
+        """
+        chunk_size = chunk_size or settings.CONTENT_INDEX_CHUNK_SIZE
+        dimensions = dimensions or settings.CONTENT_INDEX_DIMENSIONS
+        with self._locked():
+            documents = 0
+            frequencies = np.zeros(dimensions, dtype=np.int64)
+            for rows in _book_rows(chunk_size):
+                for _, title, author, context in rows:
+                    buckets, _ = hashed(terms(title, author, context), dimensions)
+                    frequencies[np.unique(buckets)] += 1
+                documents += len(rows)
+            idf = (np.log((1 + documents) / (1 + frequencies)) + 1).astype(np.float32)
+
+            meta = {
+                'version': f'v{time.time_ns()}',
+                'dimensions': dimensions,
+                'capacity': max(capacity or documents + documents // 4, 1, documents),
+                'count': 0,
+            }
+            os.makedirs(self._path(meta['version']))
+            idf.tofile(self._path(meta['version'], IDF))
+            for name in (VECTORS, IDS):
+                open(self._path(meta['version'], name), 'wb').close()
+            self._resize(meta, meta['capacity'])
+            vectors, ids, _ = self._open(meta, 'r+')
+            for rows in _book_rows(chunk_size):
+                count = meta['count']
+                if count + len(rows) > meta['capacity']:
+                    # Books added since the first pass.
+                    del vectors, ids
+                    self._resize(meta, max(meta['capacity'] * 2, count + len(rows)))
+                    vectors, ids, _ = self._open(meta, 'r+')
+                vectors[count:count + len(rows)] = vectorize(rows, idf)
+                ids[count:count + len(rows)] = [row[0] for row in rows]
+                meta['count'] += len(rows)
+            vectors.flush()
+            ids.flush()
+            del vectors, ids
+
+            old = self._read_meta()
+            self._write_meta(meta)
+            # Processes that still map the old version keep their pages.
+            if old is not None:
+                shutil.rmtree(self._path(old['version']), ignore_errors=True)
+        return {'books': meta['count'], 'dimensions': dimensions}
+
+    def _resize(self, meta: dict, capacity: int):
+        """Grow the files of ``meta``'s version to ``capacity`` rows; new ids are -1."""
+        version = meta['version']
+        vectors_path, ids_path = self._path(version, VECTORS), self._path(version, IDS)
+        old_capacity = os.path.getsize(ids_path) // 8
+        with open(vectors_path, 'r+b') as file:
+            file.truncate(capacity * meta['dimensions'] * 4)
+        with open(ids_path, 'r+b') as file:
+            file.truncate(capacity * 8)
+            file.seek(old_capacity * 8)
+            file.write(np.full(capacity - old_capacity, -1, dtype=np.int64).tobytes())
+        meta['capacity'] = capacity
+
+    def update(self, book_id: int):
+        """
+        Bring one book's row up to date with the database: rewritten in
+        place, appended for a new book or blanked for a deleted one. IDF
+        weights stay those of the last ``build``. Returns what was done, or
+        None while there is no index.
+        """
+        if self._read_meta() is None:
+            return None
+        with self._locked():
+            meta = self._read_meta()
+            vectors, ids, idf = self._open(meta, 'r+')
+            rows = np.flatnonzero(ids[:meta['count']] == book_id)
+            book = Book.objects.filter(id=book_id).values_list(*TEXT_FIELDS).first()
+
+            if book is None:
+                if not len(rows):
+                    return None
+                vectors[rows[0]] = 0
+                ids[rows[0]] = -1
+                action = 'removed'
+            elif len(rows):
+                vectors[rows[0]] = vectorize([book], idf)[0]
+                action = 'updated'
+            else:
+                if meta['count'] == meta['capacity']:
+                    del vectors, ids
+                    self._resize(meta, max(meta['capacity'] * 2, MIN_CAPACITY))
+                    vectors, ids, idf = self._open(meta, 'r+')
+                vectors[meta['count']] = vectorize([book], idf)[0]
+                ids[meta['count']] = book_id
+                meta['count'] += 1
+                action = 'added'
+            vectors.flush()
+            ids.flush()
+            if action == 'added':
+                self._write_meta(meta)
+            return action
+
+    def neighbours(self, books: list, count: int, batch_size: int = None) -> list:
+        """
+        For each of ``books`` (Book instances, indexed yet or not), the
+        ``count`` books with the most similar text as ``(book_id, score)``
+        pairs. The vectors are scanned ``batch_size`` rows at a time with one
+        matrix product per batch for all the queries.
+        """
+        if not books or not self._refresh():
+            return [[] for _ in books]
+        batch_size = batch_size or settings.CONTENT_INDEX_BATCH_SIZE
+        queries = vectorize([[book.id, book.title, book.author, book.context] for book in books], self._idf)
+        own_ids = np.array([book.id for book in books], dtype=np.int64)
+
+        total = self._meta['count']
+        best_scores = np.full((len(books), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(books), 0), dtype=np.int64)
+        for start in range(0, total, batch_size):
+            ids = np.asarray(self._ids[start:start + batch_size])
+            scores = queries @ np.asarray(self._vectors[start:start + batch_size]).T
+            # Deleted rows and the books themselves never qualify.
+            scores[:, ids < 0] = -np.inf
+            scores[ids[None, :] == own_ids[:, None]] = -np.inf
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_ids = np.concatenate([best_ids, np.broadcast_to(ids, scores.shape)], axis=1)
+            if best_scores.shape[1] > count:
+                keep = np.argpartition(-best_scores, count - 1, axis=1)[:, :count]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+
+        results = []
+        for scores, ids in zip(best_scores, best_ids):
+            order = np.lexsort((ids, -scores))
+            results.append([
+                (int(ids[index]), round(float(scores[index]), 4))
+                for index in order
+                if scores[index] > 0
+            ])
+        return results
+
+
+content_index = ContentIndex()
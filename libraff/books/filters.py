@@ -0,0 +1,121 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from books.models import Book
+from utils.cache_stampede import cached_compute
+
+# The query parameters of the filter endpoint, in signature order.
+FILTER_PARAMS = ('price_from', 'price_to', 'category', 'author', 'context')
+WHOLE_NUMBER_PARAMS = ('price_from', 'price_to', 'category')
+
+# Lower edges of the price facet buckets; the last one is open-ended.
+PRICE_BUCKETS = (0, 10, 20, 30, 50)
+
+
+def normalize_filters(data) -> dict:
+    """
+    The filter query parameters of ``data``: numbers parsed, text stripped
+    and lowercased (the lookups ignore case), blanks dropped. Raises
+    ValueError with a message for the client on a malformed number.
+    """
+    filters = {}
+    for name in FILTER_PARAMS:
+        value = (data.get(name) or '').strip()
+        if not value:
+            continue
+        if name in WHOLE_NUMBER_PARAMS:
+            if not value.isdigit():
+                raise ValueError(f'{name} must be a whole number')
+            filters[name] = int(value)
+        else:
+            filters[name] = value.lower()
+    return filters
+
+
+def filter_signature(filters: dict) -> str:
+    """The same for every spelling of the same filter."""
+    signature = '&'.join(f'{name}={filters[name]}' for name in FILTER_PARAMS if name in filters)
+    return hashlib.md5(signature.encode('utf-8')).hexdigest()
+
+
+def filter_books(filters: dict):
+    """
+    Books matching normalized ``filters``, newest first. Price and category
+    are range and equality lookups on indexed columns; author and context
+    are substring matches narrowed down by them.
+    """
+    books = Book.objects.select_related('category').order_by('-created_at', '-id')
+    if 'price_from' in filters:
+        books = books.filter(price__gte=filters['price_from'])
+    if 'price_to' in filters:
+        books = books.filter(price__lte=filters['price_to'])
+    if 'category' in filters:
+        books = books.filter(category_id=filters['category'])
+    if 'author' in filters:
+        books = books.filter(author__icontains=filters['author'])
+    if 'context' in filters:
+        books = books.filter(context__icontains=filters['context'])
+    return books
+
+
+def price_bucket():
+    """The index in ``PRICE_BUCKETS`` of a book's price; NULL when it has none."""
+    return Case(
+        *(
+            When(price__gte=low, then=Value(index))
+            for index, low in reversed(list(enumerate(PRICE_BUCKETS)))
+        ),
+        default=None,
+        output_field=IntegerField(),
+    )
+
+
+def facet_counts(books) -> dict:
+    """
+    How many of ``books`` fall in each category, price bucket and, for the
+    ``FILTER_FACET_AUTHORS`` most frequent authors, by each author. One
+    query groups the books by all three; the rows are rolled up here.
+    """
+    rows = (
+        books.order_by()
+        .values('category_id', 'category__category_name', 'author', bucket=price_bucket())
+        .annotate(count=Count('id'))
+    )
+    categories, prices, authors = {}, [0] * len(PRICE_BUCKETS), {}
+    for row in rows.iterator():
+        category = categories.setdefault(
+            row['category_id'],
+            {'id': row['category_id'], 'name': row['category__category_name'], 'count': 0},
+        )
+        category['count'] += row['count']
+        if row['bucket'] is not None:
+            prices[row['bucket']] += row['count']
+        if row['author']:
+            authors[row['author']] = authors.get(row['author'], 0) + row['count']
+
+    edges = PRICE_BUCKETS[1:] + (None,)
+    return {
+        'categories': sorted(categories.values(), key=lambda item: (-item['count'], item['name'])),
+        'prices': [
+            {'from': low, 'to': high, 'count': count}
+            for low, high, count in zip(PRICE_BUCKETS, edges, prices)
+        ],
+        'authors': [
+            {'author': author, 'count': count}
+            for author, count in sorted(
+                authors.items(),
+                key=lambda item: (-item[1], item[0]),
+            )[:settings.FILTER_FACET_AUTHORS]
+        ],
+    }
+
+
+def cached_facet_counts(filters: dict) -> dict:
+    """``facet_counts`` of a filter, cached per filter rather than per page."""
+    return cached_compute(
+        f'Book_filter_facets_{filter_signature(filters)}',
+        lambda: facet_counts(filter_books(filters)),
+        namespaces=['Book_filter'],
+    )
@@ -0,0 +1,216 @@
+import csv
+import io
+import json
+import time
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from books.models import Book, BookCategory
+from books.search import index_books
+from utils.cache_namespaces import bump_generation
+
+CSV = 'csv'
+JSONL = 'jsonl'
+DEFAULT_CATEGORY = 'Uncategorized'
+COPY_COLUMNS = (
+    'category_id',
+    'title',
+    'author',
+    'context',
+    'price',
+    'pdf',
+    'likes_count',
+    'comments_count',
+    'favorites_count',
+    'book_image_variants',
+    'created_at',
+)
+
+
+def read_rows(stream, input_format: str):
+    """
+    Yield one dict per CSV record or JSONL line of ``stream``; a line that
+    is not valid JSON is yielded as ``None`` for the importer to skip.
+    """
+    if input_format == CSV:
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def _text(value, model, field: str):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    elif value is not None and not isinstance(value, str):
+        raise TypeError(f'{field} is not text: {value!r}')
+    value = (value or '').strip() or None
+    if value is not None and len(value) > model._meta.get_field(field).max_length:
+        raise ValueError(f'{field} too long: {len(value)} characters')
+    if value is not None and '\x00' in value:
+        # PostgreSQL text cannot hold NUL.
+        raise ValueError(f'{field} contains NUL')
+    return value
+
+
+def _parse(row) -> tuple:
+    """
+    The category name and ``Book`` field values of a feed ``row``. Raises
+    TypeError or ValueError for a row that would not fit the table.
+    """
+    if not isinstance(row, dict):
+        raise TypeError(f'not a record: {row!r}')
+    category = _text(row.get('category'), BookCategory, 'category_name') or DEFAULT_CATEGORY
+    return category, {
+        'title': _text(row.get('title'), Book, 'title'),
+        'author': _text(row.get('author'), Book, 'author'),
+        'context': _text(row.get('context'), Book, 'context'),
+        'price': _price(row.get('price')),
+        'pdf': _text(row.get('pdf'), Book, 'pdf') or '',
+    }
+
+
+def _price(value):
+    if value in (None, ''):
+        return None
+    price = int(value)
+    if not 0 <= price <= 32767:
+        raise ValueError(f'price out of range: {price}')
+    return price
+
+
+class BookImporter:
+    """
+    Loads books in batches without the per-row ``post_save`` work.
+
+    ``bulk_create`` (or COPY) sends no model signals, so the cache
+    namespaces are bumped once and the search index is refreshed in
+    batches by ``finish()``.
+    """
+
+    def __init__(self, batch_size: int = 5000, use_copy: bool = False):
+        if use_copy and connection.vendor != 'postgresql':
+            raise ValueError('COPY is only available on PostgreSQL')
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.categories = {}
+        self.touched_categories = set()
+        self.imported = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self.last_id = Book.objects.aggregate(last=Max('id'))['last'] or 0
+
+    @property
+    def rate(self) -> float:
+        return self.imported / max(time.monotonic() - self.started, 1e-9)
+
+    def import_rows(self, rows, progress=None):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                if progress:
+                    progress(self)
+        if batch:
+            self.import_batch(batch)
+            if progress:
+                progress(self)
+
+    def import_batch(self, rows):
+        # Rows are checked against the columns up front: one bad row must
+        # not fail the insert of the whole batch.
+        parsed = []
+        for row in rows:
+            try:
+                parsed.append(_parse(row))
+            except (TypeError, ValueError):
+                self.skipped += 1
+        with transaction.atomic():
+            self.resolve_categories({category for category, _ in parsed})
+            books = [Book(category_id=self.categories[category], **values) for category, values in parsed]
+            if self.use_copy:
+                self.copy(books)
+            else:
+                Book.objects.bulk_create(books, batch_size=self.batch_size)
+        self.touched_categories.update(book.category_id for book in books)
+        self.imported += len(books)
+
+    def resolve_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        for category_id, name in BookCategory.objects.filter(
+            category_name__in=missing,
+        ).order_by('-id').values_list('id', 'category_name'):
+            self.categories[name] = category_id
+        created = BookCategory.objects.bulk_create(
+            BookCategory(category_name=name)
+            for name in missing - self.categories.keys()
+        )
+        if created and created[0].pk is None:
+            created = BookCategory.objects.filter(
+                category_name__in=[category.category_name for category in created],
+            )
+        for category in created:
+            self.categories[category.category_name] = category.pk
+
+    def copy(self, books):
+        # COPY skips auto_now_add, so the batch gets its timestamp here.
+        created_at = timezone.now().isoformat()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for book in books:
+            writer.writerow([
+                '\\N' if value is None else value
+                for value in (
+                    book.category_id,
+                    book.title,
+                    book.author,
+                    book.context,
+                    book.price,
+                    book.pdf.name,
+                    0,
+                    0,
+                    0,
+                    json.dumps(book.book_image_variants),
+                    created_at,
+                )
+            ])
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY {Book._meta.db_table} ({", ".join(COPY_COLUMNS)}) '
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+
+    def finish(self):
+        """Index the imported books and invalidate the catalog caches once."""
+        last_id = self.last_id
+        while True:
+            ids = list(
+                Book.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                break
+            index_books(Book.objects.filter(id__gte=ids[0], id__lte=ids[-1]))
+            last_id = ids[-1]
+
+        bump_generation(
+            'Book_category_list',
+            'Book_list',
+            'Book_search',
+            'Book_filter',
+            *(f'Book_list_for_category_{category_id}' for category_id in self.touched_categories),
+        )
@@ -0,0 +1,56 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importer import CSV, JSONL, BookImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import books from a CSV or JSONL feed (title, author, context, price, category, pdf)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin")
+        parser.add_argument(
+            '--format',
+            choices=(CSV, JSONL),
+            help='Input format; guessed from the file extension by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Insert with PostgreSQL COPY instead of bulk_create',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            input_format = JSONL if extension in ('jsonl', 'ndjson') else CSV
+
+        try:
+            importer = BookImporter(
+                batch_size=options['batch_size'],
+                use_copy=options['copy'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            importer.import_rows(read_rows(stream, input_format), progress=self.progress)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write('Refreshing search index and caches...')
+        importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'{importer.imported} books imported, {importer.skipped} skipped '
+            f'({importer.rate:.0f} rows/s)'
+        ))
+
+    def progress(self, importer):
+        self.stdout.write(f'{importer.imported} books imported ({importer.rate:.0f} rows/s)')
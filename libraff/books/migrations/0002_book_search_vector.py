@@ -0,0 +1,58 @@
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# The GIN indexes are Postgres-only and the FTS5 table SQLite-only, so both
+# are created here per vendor rather than declared on the model.
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX book_search_vector_gin ON books_book USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX book_title_trgm ON books_book USING gin (title gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            'UPDATE books_book SET search_vector = '
+            "setweight(to_tsvector(%s::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(author, '')), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(context, '')), 'C')",
+            [settings.SEARCH_CONFIG] * 3,
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE books_book_fts USING fts5(title, author, context)'
+        )
+        schema_editor.execute(
+            'INSERT INTO books_book_fts (rowid, title, author, context) '
+            'SELECT id, title, author, context FROM books_book'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS book_search_vector_gin')
+        schema_editor.execute('DROP INDEX IF EXISTS book_title_trgm')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS books_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Like = apps.get_model('interactions', 'Like')
+    Comment = apps.get_model('interactions', 'Comment')
+    Favorite = apps.get_model('favorites', 'Favorite')
+    Book.objects.update(
+        likes_count=count_of(Like, 'book'),
+        comments_count=count_of(Comment, 'book'),
+        favorites_count=count_of(Favorite, 'book'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_search_vector'),
+        ('interactions', '0001_initial'),
+        ('favorites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarBooks',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similar_books', serialize=False, to='books.book')),
+                ('neighbours', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
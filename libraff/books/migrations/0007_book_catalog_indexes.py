@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+from utils.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('books', '0006_book_created_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['created_at', 'id'], name='book_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='book_category_created_idx'),
+        ),
+    ]
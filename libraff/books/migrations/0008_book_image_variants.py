@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='book_image_variants',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
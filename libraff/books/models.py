@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 
 from users.models import CustomerUser
 
@@ -17,6 +18,11 @@ class Book(models.Model):
         null=True,
         blank=True
     )
+    # Resized copies of book_image, written by books.tasks.build_book_image_variants.
+    book_image_variants = models.JSONField(
+        default=dict,
+        editable=False
+    )
     author = models.CharField(
         max_length=255,
         null=True,
@@ -42,9 +48,27 @@ class Book(models.Model):
         null=True, 
         blank=True
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    favorites_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Price ranges of the filter endpoint, alone or within a category.
+            models.Index(fields=['price'], name='book_price_idx'),
+            models.Index(fields=['category', 'price'], name='book_category_price_idx'),
+            # Newest first, in keyset order, overall and per category.
+            models.Index(fields=['created_at', 'id'], name='book_created_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='book_category_created_idx'),
+        ]
 
     def like_count(self):
-        return f'{self.likes.count()}'
+        return f'{self.likes_count}'
 
     def __str__(self):
         return f'{self.title}'
@@ -82,7 +106,47 @@ class UserBookStatus(models.Model):
     class Meta:
         unique_together = ('user', 'book')  
 
+    @classmethod
+    def statuses_for(cls, user, book_ids) -> dict:
+        """Map each of ``book_ids`` the user has a status for to that status."""
+        if not user.is_authenticated or not book_ids:
+            return {}
+        return dict(
+            cls.objects.filter(user=user, book_id__in=book_ids)
+            .values_list('book_id', 'status')
+        )
+
+    @classmethod
+    async def astatuses_for(cls, user, book_ids) -> dict:
+        """``statuses_for`` over the async ORM."""
+        if not user.is_authenticated or not book_ids:
+            return {}
+        return {
+            book_id: status
+            async for book_id, status in cls.objects.filter(
+                user=user,
+                book_id__in=book_ids,
+            ).values_list('book_id', 'status')
+        }
+
     def __str__(self):
         return f'{self.user.username} - {self.book.title} - {self.status}'
 
-    
+
+class SimilarBooks(models.Model):
+    """
+    The nearest neighbours of a book, precomputed by
+    ``books.recommendations.build``: ``neighbours`` is a list of
+    ``[book_id, similarity]`` pairs, most similar first.
+    """
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similar_books'
+    )
+    neighbours = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.book_id}: {len(self.neighbours)} similar books'
@@ -0,0 +1,168 @@
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, FloatField, Value, When
+from django.utils import timezone
+from scipy import sparse
+
+from books.models import Book, SimilarBooks, UserBookStatus
+from favorites.models import Favorite
+from interactions.models import Like
+from users.models import CustomerUser
+from utils.cache_namespaces import bump_generation
+
+# How strongly each interaction ties a reader to a book; a reader who does
+# several things with a book counts with the strongest one.
+STATUS_WEIGHTS = {
+    UserBookStatus.FINISHED: 2.0,
+    UserBookStatus.READING: 2.0,
+    UserBookStatus.WANT_TO_READ: 1.0,
+}
+LIKE_WEIGHT = 1.0
+FAVORITE_WEIGHT = 3.0
+
+
+def interaction_sources() -> list:
+    """Querysets of ``(id, user_id, book_id, weight)`` rows, one per source."""
+    return [
+        Like.objects.filter(book__isnull=False).annotate(
+            weight=Value(LIKE_WEIGHT, output_field=FloatField()),
+        ),
+        Favorite.objects.annotate(
+            weight=Value(FAVORITE_WEIGHT, output_field=FloatField()),
+        ),
+        UserBookStatus.objects.filter(status__in=STATUS_WEIGHTS).annotate(
+            weight=Case(
+                *(When(status=status, then=Value(weight)) for status, weight in STATUS_WEIGHTS.items()),
+                output_field=FloatField(),
+            ),
+        ),
+    ]
+
+
+def _chunks(queryset, chunk_size: int):
+    """``(id, user_id, book_id, weight)`` arrays of at most ``chunk_size`` rows."""
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'user_id', 'book_id', 'weight')[:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield np.array(rows, dtype=np.float64)
+
+
+def _positions(ids, values):
+    """
+    The index of each of ``values`` in the sorted ``ids`` and whether it is
+    there at all; users and books created after ``ids`` was read are not.
+    """
+    positions = np.minimum(np.searchsorted(ids, values), max(len(ids) - 1, 0))
+    found = ids[positions] == values if len(ids) else np.zeros(len(values), dtype=bool)
+    return positions, found
+
+
+def interaction_matrix(user_ids, book_ids, chunk_size: int):
+    """
+    The users x books matrix of interaction weights, read ``chunk_size``
+    rows at a time: memory grows with the matrix, not with the querysets.
+    Interactions of users or books missing from ``user_ids``/``book_ids``
+    are left out.
+    """
+    matrix = sparse.csr_matrix((len(user_ids), len(book_ids)), dtype=np.float32)
+    for queryset in interaction_sources():
+        for chunk in _chunks(queryset, chunk_size):
+            rows, known_users = _positions(user_ids, chunk[:, 1].astype(np.int64))
+            columns, known_books = _positions(book_ids, chunk[:, 2].astype(np.int64))
+            known = known_users & known_books
+            part = sparse.csr_matrix(
+                (chunk[known, 3].astype(np.float32), (rows[known], columns[known])),
+                shape=matrix.shape,
+            )
+            matrix = matrix.maximum(part)
+    return matrix
+
+
+def top_neighbours(similarity, row_ids, book_ids, count: int) -> dict:
+    """
+    Map each of ``row_ids`` (one per row of the sparse ``similarity`` block)
+    to its ``count`` most similar other books as ``[book_id, score]`` pairs.
+    """
+    neighbours = {}
+    for row, book_id in enumerate(row_ids):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        columns = similarity.indices[start:end]
+        scores = similarity.data[start:end]
+        others = book_ids[columns] != book_id
+        columns, scores = columns[others], scores[others]
+        if not len(scores):
+            continue
+        if len(scores) > count:
+            best = np.argpartition(-scores, count - 1)[:count]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((book_ids[columns], -scores))
+        neighbours[int(book_id)] = [
+            [int(book_ids[column]), round(float(score), 4)]
+            for column, score in zip(columns[order], scores[order])
+        ]
+    return neighbours
+
+
+def build(count: int = None, chunk_size: int = None, block_size: int = None) -> dict:
+    """
+    Recompute every book's ``count`` nearest neighbours by cosine similarity
+    of the readers who interacted with it, and store them in
+    ``SimilarBooks``. Similarities are computed for ``block_size`` books at
+    a time, so only one block of the books x books matrix is ever in memory.
+    """
+    count = count or settings.RECOMMENDATIONS_NEIGHBOURS
+    chunk_size = chunk_size or settings.RECOMMENDATIONS_CHUNK_SIZE
+    block_size = block_size or settings.RECOMMENDATIONS_BLOCK_SIZE
+    started = timezone.now()
+
+    user_ids = np.fromiter(
+        CustomerUser.objects.order_by('id').values_list('id', flat=True).iterator(),
+        dtype=np.int64,
+    )
+    book_ids = np.fromiter(
+        Book.objects.order_by('id').values_list('id', flat=True).iterator(),
+        dtype=np.int64,
+    )
+    matrix = interaction_matrix(user_ids, book_ids, chunk_size).tocsc()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = matrix @ sparse.diags(scale.astype(np.float32))
+    by_book = normalized.T.tocsr()
+
+    stored = 0
+    for start in range(0, len(book_ids), block_size):
+        block = by_book[start:start + block_size]
+        neighbours = top_neighbours(
+            (block @ normalized).tocsr(),
+            book_ids[start:start + block_size],
+            book_ids,
+            count,
+        )
+        SimilarBooks.objects.bulk_create(
+            [
+                SimilarBooks(book_id=book_id, neighbours=pairs, computed_at=started)
+                for book_id, pairs in neighbours.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['book'],
+            update_fields=['neighbours', 'computed_at'],
+        )
+        stored += len(neighbours)
+
+    # Books that lost all their neighbours since the last run.
+    SimilarBooks.objects.filter(computed_at__lt=started).delete()
+    bump_generation('Book_similar')
+    return {
+        'users': len(user_ids),
+        'books': len(book_ids),
+        'interactions': int(matrix.nnz),
+        'stored': stored,
+    }
@@ -0,0 +1,97 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from books.models import Book
+
+FTS_TABLE = 'books_book_fts'
+
+
+def book_search_vector():
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('author', weight='B', config=config)
+        + SearchVector('context', weight='C', config=config)
+    )
+
+
+def index_books(queryset):
+    """Refresh the search index entries of every book in ``queryset``."""
+    if connection.vendor == 'postgresql':
+        queryset.update(search_vector=book_search_vector())
+    elif connection.vendor == 'sqlite':
+        rows = list(queryset.values_list('id', 'title', 'author', 'context'))
+        # One transaction, not one commit (and fsync) per row.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, author, context) '
+                'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+
+def unindex_book(book_id: int):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [book_id])
+
+
+def search_books(query: str):
+    """Return books matching ``query`` on title, author or context, best first."""
+    if connection.vendor == 'postgresql':
+        return _postgres_search(query)
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(query)
+    return Book.objects.filter(
+        Q(title__icontains=query)
+        | Q(author__icontains=query)
+        | Q(context__icontains=query)
+    ).order_by('id')
+
+
+def _postgres_search(query):
+    search_query = SearchQuery(
+        query,
+        search_type='websearch',
+        config=settings.SEARCH_CONFIG,
+    )
+    # search_vector is served by its GIN index and title__trigram_similar
+    # by the gin_trgm_ops one, which also catches misspelled titles.
+    return Book.objects.filter(
+        Q(search_vector=search_query) | Q(title__trigram_similar=query)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), search_query),
+    ).order_by('-rank', 'id')
+
+
+def _sqlite_search(query):
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return Book.objects.none()
+
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0) LIMIT %s',
+            [match, settings.SEARCH_MAX_RESULTS],
+        )
+        book_ids = [row[0] for row in cursor.fetchall()]
+    if not book_ids:
+        return Book.objects.none()
+
+    position = Case(
+        *[When(id=book_id, then=Value(index)) for index, book_id in enumerate(book_ids)],
+        output_field=IntegerField(),
+    )
+    return Book.objects.filter(id__in=book_ids).annotate(
+        rank=position,
+    ).order_by('rank')
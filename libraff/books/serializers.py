@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Book, BookCategory, UserBookStatus
+from utils.images import variant_urls
 
 
 class BookCategorySerializer(serializers.ModelSerializer):
@@ -11,13 +12,22 @@ class BookCategorySerializer(serializers.ModelSerializer):
 class BookSerializer(serializers.ModelSerializer):
     category = serializers.StringRelatedField()
     user_status = serializers.SerializerMethodField()
-    like_count = serializers.CharField(source='like_count')
+    like_count = serializers.CharField(source='likes_count', read_only=True)
+    book_image_variants = serializers.SerializerMethodField()
      
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ['search_vector', 'likes_count']
+        read_only_fields = ['comments_count', 'favorites_count']
+
+    def get_book_image_variants(self, obj):
+        return variant_urls(obj.book_image_variants)
     
     def get_user_status(self, obj):
+        # List views resolve the whole page in one query and pass it here.
+        user_statuses = self.context.get('user_statuses')
+        if user_statuses is not None:
+            return user_statuses.get(obj.id, UserBookStatus.UNREAD)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             obj_status = UserBookStatus.objects.filter(user=request.user, book=obj).first()
@@ -1,18 +1,64 @@
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import receiver
 
+from books import trending
 from books.models import BookCategory, Book
+from books.search import index_books, unindex_book
+from books.tasks import build_book_image_variants, update_content_index
+from utils.cache_namespaces import bump_generation
 
 
 #BookCategory, Book, cache settings
 @receiver([post_save, post_delete], sender=BookCategory)
 def clean_book_category_cache(instance, sender, **kwargs):
-    cache.delete_pattern('Book_category_list')
+    # The filter facets name the categories.
+    bump_generation('Book_category_list', 'Book_filter')
 
 @receiver([post_save, post_delete], sender=Book)
 def clean_book_cache(instance, sender, **kwargs):
-    cache.delete_pattern('Book_list')
-    cache.delete_pattern(f'Book_list_for_category_{instance.category.id}_*')
-    cache.delete_pattern(f'Book_detail_{instance.id}_*')
+    bump_generation(
+        'Book_list',
+        f'Book_list_for_category_{instance.category_id}',
+        f'Book_detail_{instance.id}',
+        'Book_search',
+        'Book_filter',
+    )
+
+
+#search index
+@receiver(post_save, sender=Book)
+def index_book(instance, sender, **kwargs):
+    index_books(Book.objects.filter(id=instance.id))
+
+@receiver(post_delete, sender=Book)
+def remove_book_from_index(instance, sender, **kwargs):
+    unindex_book(instance.id)
+
+
+#trending
+@receiver(post_save, sender=Book)
+def remember_book_category(instance, sender, **kwargs):
+    cache.set(f'Book_category_of_{instance.id}', instance.category_id, settings.CACHETIMEOUT)
+
+@receiver(post_delete, sender=Book)
+def remove_book_from_trending(instance, sender, **kwargs):
+    cache.delete(f'Book_category_of_{instance.id}')
+    trending.forget(instance.id, instance.category_id)
+
+
+#content index
+@receiver([post_save, post_delete], sender=Book)
+def reindex_book_content(instance, sender, **kwargs):
+    book_id = instance.id
+    transaction.on_commit(lambda: update_content_index.delay(book_id))
+
 
+#image variants
+@receiver(post_save, sender=Book)
+def resize_book_image(instance, sender, **kwargs):
+    if (instance.book_image.name or None) != instance.book_image_variants.get('source'):
+        book_id = instance.id
+        transaction.on_commit(lambda: build_book_image_variants.delay(book_id))
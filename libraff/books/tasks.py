@@ -0,0 +1,115 @@
+from celery import shared_task
+from django.conf import settings
+from django.db.models import F, Q
+
+from books import recommendations, trending
+from books.content_index import content_index
+from books.models import Book
+from favorites.models import Favorite
+from interactions.models import Comment, Like
+from utils.cache_namespaces import bump_generation
+from utils.counters import count_of
+from utils.images import refresh_variants
+
+RECONCILE_BATCH_SIZE = 5000
+
+
+def _reconcile(model, counters: dict) -> list:
+    """Recount ``counters`` in id batches and return the ids that had drifted."""
+    fixed = []
+    last_id = 0
+    while True:
+        batch = list(
+            model.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:RECONCILE_BATCH_SIZE]
+        )
+        if not batch:
+            return fixed
+        last_id = batch[-1]
+
+        drift = Q()
+        for field in counters:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = list(
+            model.objects.filter(id__in=batch)
+            .annotate(**{f'actual_{field}': count for field, count in counters.items()})
+            .filter(drift)
+            .values_list('id', flat=True)
+        )
+        if drifted:
+            model.objects.filter(id__in=drifted).update(**counters)
+            fixed.extend(drifted)
+
+
+@shared_task
+def reconcile_counters():
+    """Repair the denormalized like, comment and favorite counters."""
+    books = _reconcile(Book, {
+        'likes_count': count_of(Like, 'book'),
+        'comments_count': count_of(Comment, 'book'),
+        'favorites_count': count_of(Favorite, 'book'),
+    })
+    comments = _reconcile(Comment, {
+        'likes_count': count_of(Like, 'comment'),
+    })
+
+    namespaces = [f'Book_detail_{book_id}' for book_id in books]
+    namespaces += [f'Comment_detail_{comment_id}' for comment_id in comments]
+    if books:
+        namespaces += ['Book_list', 'Book_filter', 'Book_search']
+    if namespaces:
+        bump_generation(*namespaces)
+    return {'books': len(books), 'comments': len(comments)}
+
+
+@shared_task
+def rebuild_trending():
+    """Recompute the trending boards from the database."""
+    if not settings.TRENDING_ENABLED:
+        return {'boards': 0, 'books': 0}
+    return trending.rebuild()
+
+
+@shared_task
+def build_recommendations():
+    """Recompute the similar books of every book."""
+    return recommendations.build()
+
+
+@shared_task
+def build_content_index():
+    """Rebuild the text vectors of every book."""
+    result = content_index.build()
+    bump_generation('Book_similar')
+    return result
+
+
+@shared_task
+def update_content_index(book_id: int):
+    """
+    Bring one book's text vector up to date after it was saved or deleted.
+    Only the book's own neighbours are refreshed; other books pick it up as
+    their cached neighbours expire, or at the next full build.
+    """
+    action = content_index.update(book_id)
+    if action is not None:
+        bump_generation(f'Book_similar_{book_id}')
+    return action
+
+
+@shared_task
+def build_book_image_variants(book_id: int):
+    """Resize a book's cover into its WebP and JPEG variants."""
+    book = Book.objects.filter(id=book_id).first()
+    if book is None or not refresh_variants(book, 'book_image', 'book_image_variants'):
+        return False
+    # The variants are written with an update, which sends no post_save.
+    bump_generation(
+        'Book_list',
+        f'Book_list_for_category_{book.category_id}',
+        f'Book_detail_{book.id}',
+        'Book_search',
+        'Book_filter',
+    )
+    return True
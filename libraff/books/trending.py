@@ -0,0 +1,141 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+from books.models import Book, BookCategory
+from favorites.models import Favorite
+from interactions.models import Comment, Like
+from utils.leaderboard import get_leaderboard
+
+# How much one like, comment or favorite adds to a book's score.
+WEIGHTS = {'like': 1.0, 'comment': 2.0, 'favorite': 3.0}
+
+# An event's weight halves every window.
+WINDOWS = {'24h': 24 * 60 * 60, '7d': 7 * 24 * 60 * 60}
+
+EPOCH_KEY = 'Trending_epoch'
+
+# Decayed scores below this are left off the boards: a like that has been
+# taken back, or one ten windows old.
+MIN_SCORE = 0.001
+
+
+def board_key(window: str, category_id=None) -> str:
+    if category_id is None:
+        return f'Trending_{window}'
+    return f'Trending_{window}_category_{category_id}'
+
+
+def _growth(timestamp: float, epoch: float, window: str) -> float:
+    # Scores are stored as weight * 2 ** ((t - epoch) / window). Newer events
+    # weigh more, so the ranking is the decayed one without ever rewriting
+    # old scores; a rebuild moves the epoch forward before they get large.
+    return 2 ** ((timestamp - epoch) / WINDOWS[window])
+
+
+def _epoch(leaderboard) -> float:
+    epoch = leaderboard.get_value(EPOCH_KEY)
+    if epoch is None:
+        leaderboard.add_value(EPOCH_KEY, time.time())
+        epoch = leaderboard.get_value(EPOCH_KEY)
+    return epoch
+
+
+def category_of(book_id: int):
+    return cache.get_or_set(
+        f'Book_category_of_{book_id}',
+        lambda: Book.objects.filter(id=book_id).values_list('category_id', flat=True).first(),
+        timeout=settings.CACHETIMEOUT,
+    )
+
+
+def record(book_id: int, kind: str, step: int = 1, timestamp: float = None):
+    """
+    Add ``step`` ``kind`` events of a book (a negative step takes them back)
+    to every window, globally and in its category. ``timestamp`` is when
+    the events happened, so taking one back removes what it added.
+    """
+    if not settings.TRENDING_ENABLED:
+        return
+    category_id = category_of(book_id)
+    if category_id is None:
+        return
+    leaderboard = get_leaderboard()
+    epoch = _epoch(leaderboard)
+    timestamp = time.time() if timestamp is None else timestamp
+    entries = []
+    for window in WINDOWS:
+        amount = step * WEIGHTS[kind] * _growth(timestamp, epoch, window)
+        entries.append((board_key(window), book_id, amount))
+        entries.append((board_key(window, category_id), book_id, amount))
+    leaderboard.incr(entries)
+
+
+def forget(book_id: int, category_id: int):
+    """Drop a deleted book from every board it was on."""
+    if not settings.TRENDING_ENABLED:
+        return
+    get_leaderboard().remove(
+        [board_key(window) for window in WINDOWS]
+        + [board_key(window, category_id) for window in WINDOWS],
+        book_id,
+    )
+
+
+def top(window: str, count: int, category_id=None) -> list:
+    """The ``count`` trending ``(book_id, score)`` pairs, scores decayed to now."""
+    leaderboard = get_leaderboard()
+    decay = 1 / _growth(time.time(), _epoch(leaderboard), window)
+    return [
+        (book_id, score * decay)
+        for book_id, score in leaderboard.top(board_key(window, category_id), count)
+        if score * decay >= MIN_SCORE
+    ]
+
+
+def rebuild(now: float = None) -> dict:
+    """
+    Recompute every board from the database with a fresh epoch. Events
+    older than ``TRENDING_HORIZON`` windows are left out; they no longer
+    move the ranking. Events are counted per book and hour.
+    """
+    now = time.time() if now is None else now
+    longest = max(WINDOWS.values())
+    since = now - longest * settings.TRENDING_HORIZON
+    sources = {
+        'like': Like.objects.filter(book__isnull=False),
+        'comment': Comment.objects.all(),
+        'favorite': Favorite.objects.all(),
+    }
+
+    # Every board is written, so books that went quiet drop off.
+    boards = {board_key(window): {} for window in WINDOWS}
+    for category_id in BookCategory.objects.values_list('id', flat=True):
+        for window in WINDOWS:
+            boards[board_key(window, category_id)] = {}
+
+    for kind, queryset in sources.items():
+        rows = (
+            queryset.filter(created_at__gte=datetime.fromtimestamp(since, tz=timezone.utc))
+            .annotate(hour=TruncHour('created_at'))
+            .order_by()
+            .values('book_id', 'book__category_id', 'hour')
+            .annotate(events=Count('id'))
+        )
+        for row in rows.iterator():
+            middle = row['hour'].timestamp() + 30 * 60
+            for window in WINDOWS:
+                amount = WEIGHTS[kind] * row['events'] * _growth(min(middle, now), now, window)
+                for key in (board_key(window), board_key(window, row['book__category_id'])):
+                    scores = boards.setdefault(key, {})
+                    scores[row['book_id']] = scores.get(row['book_id'], 0) + amount
+
+    get_leaderboard().replace(boards, {EPOCH_KEY: now})
+    return {
+        'boards': len(boards),
+        'books': len(set().union(*(boards[board_key(window)] for window in WINDOWS))),
+    }
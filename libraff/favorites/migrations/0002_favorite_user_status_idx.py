@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+from utils.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('favorites', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'status', 'created_at', 'id'], name='favorite_user_status_idx'),
+        ),
+    ]
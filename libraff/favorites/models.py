@@ -34,6 +34,10 @@ class Favorite(models.Model):
         unique_together = [
             ('user', 'book'),
         ]
+        indexes = [
+            # A user's open or private favorites, newest first in keyset order.
+            models.Index(fields=['user', 'status', 'created_at', 'id'], name='favorite_user_status_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} favorited {self.book.title} '
@@ -1,44 +1,71 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
 import logging
 
+from books import trending
+from books.models import Book
 from favorites.models import Favorite
+from utils.cache_namespaces import bump_generation
+from utils.counters import shift_counter
+
+
+#counter signals
+@receiver(post_save, sender=Favorite)
+def count_favorite_saved(instance, sender, created, counted=False, **kwargs):
+    if created and not counted:
+        shift_counter(Book, instance.book_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def count_favorite_deleted(instance, counted=False, **kwargs):
+    if not counted:
+        shift_counter(Book, instance.book_id, 'favorites_count', -1)
 
 
 #cache signals
 @receiver([post_save, post_delete], sender=Favorite)
 def clean_favorite_cache(instance, sender, **kwargs):
-    user_id = instance.user.id
+    user_id = instance.user_id
     favorite_id = instance.id
 
-    cache.delete_pattern(f'User_{user_id}_open_favorites_*')
-    cache.delete_pattern(f'User_{user_id}_private_favorites_*')
-    cache.delete(f'Favorite_detail_{favorite_id}')
+    bump_generation(
+        f'User_{user_id}_open_favorites',
+        f'User_{user_id}_private_favorites',
+        f'Favorite_detail_{favorite_id}',
+        f'Book_detail_{instance.book_id}',
+    )
  
 
+#trending signals
+@receiver(post_save, sender=Favorite)
+def trend_favorite_saved(instance, sender, created, **kwargs):
+    if created:
+        trending.record(instance.book_id, 'favorite', 1, instance.created_at.timestamp())
+
+
+@receiver(post_delete, sender=Favorite)
+def trend_favorite_deleted(instance, **kwargs):
+    if instance.created_at:
+        trending.record(instance.book_id, 'favorite', -1, instance.created_at.timestamp())
+
+
 #log signals
-logger = logging.getLogger('django')
+logger = logging.getLogger('favorites')
 
 @receiver(post_save, sender=Favorite)
 def log_favorite_saved(instance, sender, created, **kwargs):
-    user_id = instance.user.id
-    favorite_id = instance.id
-    book_id = instance.book.id
-    if created:
-        logger.info(f'User_{user_id}_add_favorite_{favorite_id}_book_{book_id}')
-
-    else:
-        logger.info(f'User_{user_id}__favorite_{favorite_id}_book_{book_id}')
+    action = 'add' if created else 'update'
+    logger.info(
+        'User_%s_%s_favorite_%s_book_%s',
+        instance.user_id, action, instance.id, instance.book_id,
+        extra={'user_id': instance.user_id, 'favorite_id': instance.id, 'book_id': instance.book_id},
+    )
         
 
 @receiver(post_delete, sender=Favorite)
 def log_favorite_deleted(instance, **kwargs):
-    user_id = instance.user.id
-    favorite_id = instance.id
-    book_id = instance.book.id
-    try:
-        logger.info(f'User_{user_id}_removed_favorite_{favorite_id}_book_{book_id}')
-    
-    except Exception as e:
-        logger.warning(f'Failed to log deleted favorite ID {instance.id}: {e}')
+    logger.info(
+        'User_%s_removed_favorite_%s_book_%s',
+        instance.user_id, instance.id, instance.book_id,
+        extra={'user_id': instance.user_id, 'favorite_id': instance.id, 'book_id': instance.book_id},
+    )
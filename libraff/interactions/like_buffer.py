@@ -0,0 +1,241 @@
+import logging
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from books import trending
+from books.models import Book
+from interactions.models import Comment, Like
+from users.models import CustomerUser
+from utils.cache_namespaces import bump_generation
+from utils.counters import count_of
+
+logger = logging.getLogger('interactions')
+
+TARGETS = {'book': Book, 'comment': Comment}
+STREAM = 'Like_buffer_ops'
+FLUSH_LOCK = 'Like_buffer_flush_lock'
+
+# Marks the user as (un)liking the target and, unless that was already the
+# buffered state, appends the op to the stream; one round trip per click.
+RECORD_SCRIPT = """
+local added
+if ARGV[2] == '1' then
+    redis.call('SREM', KEYS[2], ARGV[1])
+    added = redis.call('SADD', KEYS[1], ARGV[1])
+else
+    redis.call('SREM', KEYS[1], ARGV[1])
+    added = redis.call('SADD', KEYS[2], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+if added == 1 then
+    redis.call('XADD', KEYS[3], '*', 'target', ARGV[3], 'target_id', ARGV[4], 'user_id', ARGV[1], 'liked', ARGV[2])
+end
+return added
+"""
+
+
+def members_key(target: str, target_id: int, liked: bool) -> str:
+    return f'Like_buffer_{target}_{target_id}_{"liked" if liked else "unliked"}'
+
+
+def enabled() -> bool:
+    """Write-behind is opt-in and needs the Redis cache backend."""
+    return (
+        settings.LIKE_WRITE_BEHIND
+        and settings.CACHES['default']['BACKEND'].startswith('django_redis')
+    )
+
+
+def _client():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def record(user_id: int, target: str, target_id: int, liked: bool) -> bool:
+    """
+    Buffer a like (or unlike) of ``target`` in Redis. Returns False when it
+    repeats the user's buffered state, so double clicks never reach the
+    stream. ``flush`` writes the ops to the database.
+    """
+    client = _client()
+    added = client.register_script(RECORD_SCRIPT)(
+        keys=[
+            members_key(target, target_id, True),
+            members_key(target, target_id, False),
+            STREAM,
+        ],
+        args=[user_id, int(liked), target, target_id, settings.LIKE_BUFFER_MEMBERS_TIMEOUT],
+    )
+    return bool(added)
+
+
+def buffered_count(target: str, target_id: int) -> int:
+    """
+    The ``likes_count`` of ``target`` as it will be once the buffer is
+    flushed: the stored counter, corrected for the buffered users whose
+    like is not (or still) in the database. Raises ``DoesNotExist`` for an
+    unknown target.
+    """
+    model = TARGETS[target]
+    pipeline = _client().pipeline()
+    pipeline.smembers(members_key(target, target_id, True))
+    pipeline.smembers(members_key(target, target_id, False))
+    liked, unliked = ({int(member) for member in members} for members in pipeline.execute())
+
+    count = model.objects.filter(id=target_id).values_list('likes_count', flat=True).first()
+    if count is None:
+        raise model.DoesNotExist
+    if liked or unliked:
+        # Ops flushed meanwhile are in the database already and cancel out.
+        stored = set(
+            Like.objects.filter(
+                user_id__in=liked | unliked,
+                **{f'{target}_id': target_id},
+            ).values_list('user_id', flat=True)
+        )
+        count += len(liked - stored) - len(unliked & stored)
+    return count
+
+
+def flush(batch_size: int = None) -> dict:
+    """
+    Drain the stream in batches of ``batch_size`` ops into the database.
+    Only one flush runs at a time; a batch is removed from the stream after
+    it has been applied, and applying one twice is harmless.
+    """
+    batch_size = batch_size or settings.LIKE_BUFFER_BATCH_SIZE
+    client = _client()
+    lock = client.lock(FLUSH_LOCK, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    if not lock.acquire(blocking=False):
+        return {'ops': 0, 'books': 0, 'comments': 0}
+
+    totals = dict.fromkeys(('ops', 'books', 'comments'), 0)
+    try:
+        while True:
+            entries = client.xrange(STREAM, count=batch_size)
+            if not entries:
+                break
+            ops = [
+                (
+                    fields[b'target'].decode(),
+                    int(fields[b'target_id']),
+                    int(fields[b'user_id']),
+                    fields[b'liked'] == b'1',
+                )
+                for _, fields in entries
+            ]
+            for name, count in apply_ops(ops).items():
+                totals[name] += count
+
+            pipeline = client.pipeline(transaction=False)
+            pipeline.xdel(STREAM, *(entry_id for entry_id, _ in entries))
+            for target, target_id, user_id, liked in ops:
+                pipeline.srem(members_key(target, target_id, liked), user_id)
+            pipeline.execute()
+            if len(entries) < batch_size:
+                break
+    finally:
+        lock.release()
+    return totals
+
+
+def apply_ops(ops: list) -> dict:
+    """
+    Write a batch of ``(target, target_id, user_id, liked)`` ops: the last
+    op per user and target wins, likes are inserted with ON CONFLICT DO
+    NOTHING, unlikes deleted in one statement, then the touched counters are
+    recounted and their caches invalidated once for the whole batch.
+    """
+    latest = {}
+    for target, target_id, user_id, liked in ops:
+        latest[target, target_id, user_id] = liked
+
+    existing = {
+        target: set(
+            model.objects.filter(
+                id__in={target_id for kind, target_id, _ in latest if kind == target},
+            ).values_list('id', flat=True)
+        )
+        for target, model in TARGETS.items()
+    }
+    users = set(
+        CustomerUser.objects.filter(
+            id__in={user_id for _, _, user_id in latest},
+        ).values_list('id', flat=True)
+    )
+    # Targets or users deleted since the click are dropped.
+    latest = {
+        (target, target_id, user_id): liked
+        for (target, target_id, user_id), liked in latest.items()
+        if target_id in existing[target] and user_id in users
+    }
+
+    likes = [
+        Like(user_id=user_id, **{f'{target}_id': target_id})
+        for (target, target_id, user_id), liked in latest.items()
+        if liked
+    ]
+    unlikes = [
+        Q(user_id=user_id, **{f'{target}_id': target_id})
+        for (target, target_id, user_id), liked in latest.items()
+        if not liked
+    ]
+    touched = {target: set() for target in TARGETS}
+    for target, target_id, _ in latest:
+        touched[target].add(target_id)
+
+    with transaction.atomic():
+        # Neither path sends per-row signals; counters and caches are
+        # brought up to date below, once per target.
+        Like.objects.bulk_create(likes, ignore_conflicts=True, batch_size=1000)
+        if unlikes:
+            removed, params = Like.objects.filter(reduce(or_, unlikes)).values('id').query.sql_with_params()
+            table, pk = (connection.ops.quote_name(name) for name in (Like._meta.db_table, Like._meta.pk.column))
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table} WHERE {pk} IN ({removed})', params)
+        for target, model in TARGETS.items():
+            if touched[target]:
+                model.objects.filter(id__in=touched[target]).update(
+                    likes_count=count_of(Like, target),
+                )
+
+    bump_generation(
+        *(
+            namespace
+            for book_id in touched['book']
+            for namespace in (f'Likes_for_book_{book_id}', f'Book_detail_{book_id}')
+        ),
+        *(
+            namespace
+            for comment_id in touched['comment']
+            for namespace in (f'Likes_for_comment_{comment_id}', f'Comment_detail_{comment_id}')
+        ),
+    )
+    # Approximate: a like already in the database counts again until the
+    # next trending rebuild.
+    trend = Counter()
+    for (target, target_id, _), liked in latest.items():
+        if target == 'book':
+            trend[target_id] += 1 if liked else -1
+    for book_id, step in trend.items():
+        if step:
+            trending.record(book_id, 'like', step)
+
+    result = {
+        'ops': len(latest),
+        'books': len(touched['book']),
+        'comments': len(touched['comment']),
+    }
+    logger.info(
+        'Flushed_%s_like_ops_books_%s_comments_%s',
+        result['ops'], result['books'], result['comments'],
+        extra=result,
+    )
+    return result
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('interactions', 'Comment')
+    Like = apps.get_model('interactions', 'Like')
+    likes = (
+        Like.objects.filter(comment=OuterRef('pk'))
+        .order_by()
+        .values('comment')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Comment.objects.update(
+        likes_count=Coalesce(Subquery(likes, output_field=IntegerField()), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
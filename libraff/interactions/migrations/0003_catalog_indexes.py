@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+from utils.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('interactions', '0002_comment_likes_count'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['book', 'created_at', 'id'], name='comment_book_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='comment_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(fields=['book', 'created_at', 'id'], name='like_book_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(fields=['comment', 'created_at', 'id'], name='like_comment_created_idx'),
+        ),
+    ]
@@ -19,9 +19,17 @@ class Comment(models.Model):
     
     content = models.TextField(max_length=1000)
     created_at = models.DateTimeField(auto_now_add=True)
+    likes_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Newest first, in keyset order, per book and per user.
+            models.Index(fields=['book', 'created_at', 'id'], name='comment_book_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='comment_user_created_idx'),
+        ]
 
     def like_count(self):
-        return f'{self.likes.count()}'
+        return f'{self.likes_count}'
 
     def __str__(self):
         return f'{self.user.username}: {self.content[:50]}'
@@ -55,6 +63,11 @@ class Like(models.Model):
             ('user', 'book'),
             ('user', 'comment')
         ]
+        indexes = [
+            # Newest first, in keyset order, per book and per comment.
+            models.Index(fields=['book', 'created_at', 'id'], name='like_book_created_idx'),
+            models.Index(fields=['comment', 'created_at', 'id'], name='like_comment_created_idx'),
+        ]
 
     def clean(self):
         if self.book and self.comment:
@@ -62,6 +75,6 @@ class Like(models.Model):
         if not self.book and  not self.comment:
             raise ValidationError({'message': 'You must choose at least a book or a comment'})
 
-    def save(*args, **kwargs):
+    def save(self, *args, **kwargs):
         return super().save(*args, **kwargs)
   
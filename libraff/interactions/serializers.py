@@ -4,11 +4,11 @@ from .models import Comment, Like
 
 class CommentSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
-    like_count = serializers.CharField(source='like_count')
+    like_count = serializers.CharField(source='likes_count', read_only=True)
     
     class Meta:
         model = Comment
-        fields = [ 'content', 'created_at', 'user_name']
+        fields = [ 'content', 'created_at', 'user_name', 'like_count']
         read_only_fields = ['created_at', 'user', 'book', 'user_name']
         
 
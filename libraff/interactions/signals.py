@@ -1,80 +1,149 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from books.models import Book
 from interactions.models import Comment, Like
-from django.core.cache import cache
 import logging
 
+from books import trending
+from utils.cache_namespaces import bump_generation
+from utils.counters import shift_counter
+
+
+#counter signals
+@receiver(post_save, sender=Comment)
+def count_comment_saved(instance, sender, created, **kwargs):
+    if created:
+        shift_counter(Book, instance.book_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_deleted(instance, **kwargs):
+    shift_counter(Book, instance.book_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Like)
+def count_like_saved(instance, sender, created, counted=False, **kwargs):
+    if created and not counted:
+        shift_like_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Like)
+def count_like_deleted(instance, counted=False, **kwargs):
+    if not counted:
+        shift_like_counters(instance, -1)
+
+
+def shift_like_counters(like: Like, step: int):
+    if like.book_id:
+        shift_counter(Book, like.book_id, 'likes_count', step)
+
+    if like.comment_id:
+        shift_counter(Comment, like.comment_id, 'likes_count', step)
+
 #cache settings
 @receiver([post_save, post_delete], sender=Comment)
 def clean_comment_cache(instance, sender, **kwargs):
-    book_id = instance.book.id
+    book_id = instance.book_id
     comment_id = instance.id
 
-    cache.delete_pattern(f'Book_{book_id}_comments_page_*')
-    cache.delete(f'Comment_detail_{comment_id}')
-    cache.delete_pattern(f'User_{instance.user.id}_comments_page_*')
+    bump_generation(
+        f'Book_{book_id}_comments',
+        f'User_{instance.user_id}_comments',
+        f'Comment_detail_{comment_id}',
+        f'Book_detail_{book_id}',
+    )
 
 
 @receiver([post_save, post_delete], sender=Like)
 def clean_like_cache(instance, sender, **kwargs):
-    if instance.book:
-        cache.delete_pattern(f'Likes_for_book_{instance.book.id}_page_*')
+    if instance.book_id:
+        bump_generation(
+            f'Likes_for_book_{instance.book_id}',
+            f'Book_detail_{instance.book_id}',
+        )
 
-    if instance.comment:
-        cache.delete_pattern(f'Likes_for_comment_{instance.comment.id}_page_*')
+    if instance.comment_id:
+        bump_generation(
+            f'Likes_for_comment_{instance.comment_id}',
+            f'Comment_detail_{instance.comment_id}',
+        )
 
 
-#loging setting
-logger = logging.getLogger('django')
+#trending signals
 @receiver(post_save, sender=Comment)
-def log_comment_saved(instance, sender, created, **kwargs):
-    user_id = instance.user.id
-    book_id = instance.book.id
-    comment_id = instance.id
+def trend_comment_saved(instance, sender, created, **kwargs):
     if created:
-        logger.info(f'User_{user_id}_wrote_comment_{comment_id}_book_{book_id}')
+        trending.record(instance.book_id, 'comment', 1, instance.created_at.timestamp())
 
-    else:
-        logger.info(f'User_{user_id}_update_comment_{comment_id}_book_{book_id}')
 
 @receiver(post_delete, sender=Comment)
-def log_comment_deleted(instance, **kwargs):
-    try:
-        user_id = instance.user.id
-        book_id = instance.book.id
-        comment_id = instance.id
-        logger.info(f'User_{user_id}_delete_comment_{comment_id}_book_{book_id}')
-    except Exception as e:
-        logger.warning(f'Failed to log deleted comment ID {instance.id}: {e}')
+def trend_comment_deleted(instance, **kwargs):
+    trending.record(instance.book_id, 'comment', -1, instance.created_at.timestamp())
 
 
 @receiver(post_save, sender=Like)
-def log_like_saved(instance, sender, created, **kwargs):
-    user_id = instance.user.id
-    like_id = instance.id
-    if instance.book:
-        book_id = instance.book.id
-        logger.info(f'User_{user_id}_liked_{like_id}_book_{book_id}')
-    
-    if instance.comment:
-        comment_id = instance.comment.id
-        logger.info(f'User_{user_id}_liked_{like_id}_book_{comment_id}')
+def trend_like_saved(instance, sender, created, **kwargs):
+    if created and instance.book_id:
+        trending.record(instance.book_id, 'like', 1, instance.created_at.timestamp())
 
 
 @receiver(post_delete, sender=Like)
+def trend_like_deleted(instance, **kwargs):
+    # Without the like's own time the decayed weight it added is unknown;
+    # the next rebuild drops it instead.
+    if instance.book_id and instance.created_at:
+        trending.record(instance.book_id, 'like', -1, instance.created_at.timestamp())
+
+
+#loging setting
+logger = logging.getLogger('interactions')
+@receiver(post_save, sender=Comment)
+def log_comment_saved(instance, sender, created, **kwargs):
+    action = 'wrote' if created else 'update'
+    logger.info(
+        'User_%s_%s_comment_%s_book_%s',
+        instance.user_id, action, instance.id, instance.book_id,
+        extra={'user_id': instance.user_id, 'comment_id': instance.id, 'book_id': instance.book_id},
+    )
+
+@receiver(post_delete, sender=Comment)
 def log_comment_deleted(instance, **kwargs):
-    user_id = instance.user.id
-    like_id = instance.id
-    try:
-        if instance.book:
-            book_id = instance.book.id
-            logger.info(f'User_{user_id}_removed_like_{like_id}_book_{book_id}')
-        
-        if instance.comment:
-            comment_id = instance.comment.id
-            logger.info(f'User_{user_id}_removed_like_{like_id}_comment_{comment_id}')
+    logger.info(
+        'User_%s_delete_comment_%s_book_%s',
+        instance.user_id, instance.id, instance.book_id,
+        extra={'user_id': instance.user_id, 'comment_id': instance.id, 'book_id': instance.book_id},
+    )
 
-    except Exception as e:
-        logger.warning(f'Failed to log deleted like ID {instance.id}: {e}')
+
+@receiver(post_save, sender=Like)
+def log_like_saved(instance, sender, created, **kwargs):
+    if instance.book_id:
+        logger.info(
+            'User_%s_liked_%s_book_%s',
+            instance.user_id, instance.id, instance.book_id,
+            extra={'user_id': instance.user_id, 'like_id': instance.id, 'book_id': instance.book_id},
+        )
+    
+    if instance.comment_id:
+        logger.info(
+            'User_%s_liked_%s_comment_%s',
+            instance.user_id, instance.id, instance.comment_id,
+            extra={'user_id': instance.user_id, 'like_id': instance.id, 'comment_id': instance.comment_id},
+        )
 
 
+@receiver(post_delete, sender=Like)
+def log_like_deleted(instance, **kwargs):
+    if instance.book_id:
+        logger.info(
+            'User_%s_removed_like_%s_book_%s',
+            instance.user_id, instance.id, instance.book_id,
+            extra={'user_id': instance.user_id, 'like_id': instance.id, 'book_id': instance.book_id},
+        )
+    
+    if instance.comment_id:
+        logger.info(
+            'User_%s_removed_like_%s_comment_%s',
+            instance.user_id, instance.id, instance.comment_id,
+            extra={'user_id': instance.user_id, 'like_id': instance.id, 'comment_id': instance.comment_id},
+        )
@@ -0,0 +1,11 @@
+from celery import shared_task
+
+from interactions import like_buffer
+
+
+@shared_task
+def flush_like_buffer():
+    """Write the likes and unlikes buffered in Redis to the database."""
+    if not like_buffer.enabled():
+        return {'ops': 0, 'books': 0, 'comments': 0}
+    return like_buffer.flush()
@@ -1,7 +1,11 @@
 """
-ASGI config for myproject project.
+ASGI config for libraff project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests served through it are routed with ``ASGI_URLCONF``, whose hot read
+endpoints are async views; run it with an ASGI server, e.g.
+
+    uvicorn libraff.asgi:application --workers 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -11,6 +15,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'libraff.settings')
 
 application = get_asgi_application()
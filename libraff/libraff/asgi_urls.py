@@ -0,0 +1,16 @@
+"""
+URL configuration for requests served over ASGI.
+
+Same routes as ``libraff.urls``, except that the API is resolved with
+``apis.async_urls`` so its hot read endpoints run as async views.
+"""
+from django.urls import include, path
+
+from libraff import urls
+
+urlpatterns = [
+    path('api/v1/', include('apis.async_urls')),
+] + [
+    pattern for pattern in urls.urlpatterns
+    if getattr(pattern, 'namespace', None) != 'apis'
+]
@@ -1,25 +1,208 @@
 import logging
-from datetime import datetime, timezone
+import traceback
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from utils import request_timing
+from utils.request_metrics import METHODS, request_metrics
+from utils.request_timing import RequestTiming
 
 logger = logging.getLogger('middleware')
 
-class UserActionLoggingMiddleware:
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that must not push async views back onto a thread:
+    ``handle`` (sync) and ``ahandle`` (async) do the work, and the right one
+    is picked for the chain the middleware was loaded into.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        start_time = datetime.now(timezone.utc)
-        
-        # Qeyd etmək istədiyiniz vaxtı loga daxil edirik
-        log_data = {
-            'user': request.user.username if request.user.is_authenticated else 'anonymous',
-            'timestamp': start_time.strftime('%Y-%m-%d %H:%M:%S'),  # İstədiyiniz formatda vaxt
-            'method': request.method,
-            'path': request.path,
-        }
-
-        # Yalnız vaxt və istifadəçi haqqında məlumatı loglayaq
-        logger.info(f"User: {log_data['user']} | Time: {log_data['timestamp']} | Method: {log_data['method']} | Path: {log_data['path']}")
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class ASGIURLConfMiddleware(AsyncCapableMiddleware):
+    """Resolves requests that arrive over ASGI with ``ASGI_URLCONF``."""
+
+    def handle(self, request):
+        self.route(request)
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        self.route(request)
+        return await self.get_response(request)
+
+    def route(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_URLCONF
+
+
+class UserActionLoggingMiddleware(AsyncCapableMiddleware):
+    """
+    Logs every request together with how long it took, split into total,
+    DB (time and query count), cache (time, hits and misses) and
+    serialization time.
+
+    The split is sent back in a ``Server-Timing`` header (when
+    ``SERVER_TIMING_ENABLED``) and added to the per-view histograms that
+    ``metrics/`` exports.
+    """
+    header = 'Server-Timing'
+
+    def handle(self, request):
+        timing = RequestTiming()
+        token = request_timing.activate(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_timing.deactivate(token)
+        return self.finish(request, response, timing, request.user)
+
+    async def ahandle(self, request):
+        timing = RequestTiming()
+        token = request_timing.activate(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_timing.deactivate(token)
+        return self.finish(request, response, timing, await request.auser())
+
+    def finish(self, request, response, timing, user):
+        timing.finish()
+        if settings.SERVER_TIMING_ENABLED:
+            response[self.header] = timing.server_timing()
+        match = request.resolver_match
+        if (
+            match is not None
+            and getattr(match.func, 'view_class', None) is not None
+            and request.method in METHODS
+        ):
+            request_metrics.observe(match.view_name, request.method, timing)
+
+        if logger.isEnabledFor(logging.INFO):
+            user = user.username if user.is_authenticated else 'anonymous'
+            duration_ms = round(timing.seconds['total'] * 1000, 2)
+            logger.info(
+                'User: %s | Method: %s | Path: %s | Status: %s | Duration: %sms',
+                user, request.method, request.path, response.status_code, duration_ms,
+                extra={
+                    'user': user,
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': duration_ms,
+                    'db_ms': round(timing.seconds['db'] * 1000, 2),
+                    'queries': timing.queries,
+                },
+            )
+        return response
 
+    def process_template_response(self, request, response):
+        # Runs just before the response is rendered: DRF responses turn
+        # their data into bytes there.
+        timing = request_timing.current()
+        if timing is not None:
+            timing.start_render()
+            response.add_post_render_callback(timing.stop_render)
+        return response
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """
+    Counts the SQL queries of every request against the ``query_budget``
+    of the view that served it: a number, or a dict keyed by HTTP method
+    when only some methods are budgeted. Budgets include the query that
+    JWT authentication spends loading the user. Queries are seen through
+    the request timing, so ``UserActionLoggingMiddleware`` must come first.
+
+    ``QUERY_BUDGET_MODE`` 'warn' adds an ``X-Query-Budget: used/budget``
+    header and logs over-budget requests with their repeated SQL and where
+    the queries past the budget came from; 'raise' (for tests) raises
+    ``QueryBudgetExceeded`` instead; 'off' does nothing.
+    """
+    header = 'X-Query-Budget'
+
+    def handle(self, request):
+        queries = self.record(request)
         response = self.get_response(request)
+        return self.check(request, response, queries)
+
+    async def ahandle(self, request):
+        queries = self.record(request)
+        response = await self.get_response(request)
+        return self.check(request, response, queries)
+
+    def record(self, request):
+        timing = request_timing.current()
+        if settings.QUERY_BUDGET_MODE == 'off' or timing is None:
+            return None
+        queries = []
+
+        def listen(sql):
+            # Stacks are costly; only the queries past the budget need one.
+            budget = self.budget(request)
+            over = budget is not None and len(queries) >= budget
+            queries.append((sql, project_stack() if over else None))
+
+        timing.query_listeners.append(listen)
+        return queries
+
+    def check(self, request, response, queries):
+        budget = self.budget(request)
+        if queries is None or budget is None:
+            return response
+        response[self.header] = f'{len(queries)}/{budget}'
+        if len(queries) > budget:
+            report = budget_report(request, queries, budget)
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
         return response
+
+    def budget(self, request):
+        match = request.resolver_match
+        view_class = getattr(match.func, 'view_class', None) if match else None
+        budget = getattr(view_class, 'query_budget', None)
+        if isinstance(budget, dict):
+            budget = budget.get(request.method)
+        return budget
+
+
+def project_stack(limit=6):
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(('middleware.py', 'request_timing.py'))
+    ]
+    return frames[-limit:]
+
+
+def budget_report(request, queries, budget):
+    lines = [f'{request.method} {request.path} ran {len(queries)} queries, budget {budget}']
+    repeated = Counter(sql for sql, stack in queries)
+    for sql, count in repeated.most_common():
+        if count < 2:
+            break
+        lines.append(f'  {count}x {sql}')
+        stack = next((stack for statement, stack in queries if statement == sql and stack), [])
+        lines.extend(
+            f'      {frame.filename}:{frame.lineno} in {frame.name}' for frame in stack
+        )
+    return '\n'.join(lines)
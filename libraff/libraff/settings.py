@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     #apps
     'books',
@@ -77,11 +78,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'libraff.middleware.ASGIURLConfMiddleware',
     'libraff.middleware.UserActionLoggingMiddleware',
+    'libraff.middleware.QueryBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
 ]
 
+# Per-view SQL query budgets: 'warn' adds X-Query-Budget and logs overruns,
+# 'raise' fails the request (tests), 'off' skips counting
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'warn' if DEBUG else 'off')
+
 # Custom User 
 AUTH_USER_MODEL = 'users.CustomerUser'
 
@@ -104,6 +111,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'libraff.wsgi.application'
+ASGI_APPLICATION = 'libraff.asgi.application'
+# Requests arriving over ASGI are resolved with this URLconf instead, which
+# serves the hot read endpoints from async views
+ASGI_URLCONF = 'libraff.asgi_urls'
 
 
 # Database
@@ -165,6 +176,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 #Media
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
+# Widths (px) of the WebP and JPEG copies made of book covers and avatars
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.getenv('IMAGE_VARIANT_WIDTHS', '160,320,640').split(',')]
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+
+# How protected files are sent: 'python' streams them from the worker,
+# 'x-accel' (nginx) and 'x-sendfile' (Apache, lighttpd) hand them to the proxy
+FILE_DELIVERY_MODE = os.getenv('FILE_DELIVERY_MODE', 'python')
+# Internal nginx location that aliases MEDIA_ROOT, used in 'x-accel' mode
+FILE_ACCEL_REDIRECT_PREFIX = os.getenv('FILE_ACCEL_REDIRECT_PREFIX', '/protected/media/')
 
 
 #mail_settings
@@ -205,6 +225,76 @@ CACHES = {
 }
 
 CACHETIMEOUT = int(os.getenv('CACHE_TIMEOUT', 300)) 
+
+# Book search
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'simple')
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 1000))
+
+# Rows fetched and serialized per batch by streaming catalog exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# In-process L1 cache in front of the default cache
+CACHE_L1_ENABLED = os.getenv('CACHE_L1_ENABLED', 'False').lower() == 'true'
+CACHE_L1_MAX_ENTRIES = int(os.getenv('CACHE_L1_MAX_ENTRIES', 1024))
+CACHE_L1_TIMEOUT = int(os.getenv('CACHE_L1_TIMEOUT', 30))
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'libraff_cache_invalidation')
+
+# Stampede protection: how long expired values may still be served while
+# one worker recomputes, and the lock that elects that worker
+CACHE_STALE_TIMEOUT = int(os.getenv('CACHE_STALE_TIMEOUT', 60))
+CACHE_LOCK_TIMEOUT = int(os.getenv('CACHE_LOCK_TIMEOUT', 10))
+CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', 2))
+CACHE_EARLY_REFRESH_BETA = float(os.getenv('CACHE_EARLY_REFRESH_BETA', 0))
+
+# Per-key-family cache statistics are flushed to the cache this often
+# (seconds); payload sizes are measured on one recompute in so many
+CACHE_STATS_FLUSH_INTERVAL = int(os.getenv('CACHE_STATS_FLUSH_INTERVAL', 10))
+CACHE_STATS_PAYLOAD_SAMPLE_EVERY = int(os.getenv('CACHE_STATS_PAYLOAD_SAMPLE_EVERY', 10))
+
+# Request timing: a Server-Timing header on every response, per-view
+# histograms flushed to the cache this often (seconds), and the token a
+# Prometheus scrape job sends to metrics/ as 'Authorization: Metrics <token>'
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True').lower() == 'true'
+REQUEST_METRICS_FLUSH_INTERVAL = int(os.getenv('REQUEST_METRICS_FLUSH_INTERVAL', 10))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Write-behind likes: clicks are buffered in Redis (needs the django_redis
+# cache) and flushed to the database in batches of LIKE_BUFFER_BATCH_SIZE
+# every LIKE_BUFFER_FLUSH_INTERVAL seconds
+LIKE_WRITE_BEHIND = os.getenv('LIKE_WRITE_BEHIND', 'False').lower() == 'true'
+LIKE_BUFFER_FLUSH_INTERVAL = int(os.getenv('LIKE_BUFFER_FLUSH_INTERVAL', 5))
+LIKE_BUFFER_BATCH_SIZE = int(os.getenv('LIKE_BUFFER_BATCH_SIZE', 10000))
+LIKE_BUFFER_MEMBERS_TIMEOUT = int(os.getenv('LIKE_BUFFER_MEMBERS_TIMEOUT', 24 * 60 * 60))
+
+# Trending books: time-decayed scores in Redis sorted sets, kept up to date
+# by the like/comment/favorite signals and rebuilt from the database every
+# TRENDING_REBUILD_INTERVAL seconds from the last TRENDING_HORIZON windows
+TRENDING_ENABLED = os.getenv('TRENDING_ENABLED', 'True').lower() == 'true'
+TRENDING_HORIZON = int(os.getenv('TRENDING_HORIZON', 4))
+TRENDING_REBUILD_INTERVAL = int(os.getenv('TRENDING_REBUILD_INTERVAL', 60 * 60))
+TRENDING_MAX_RESULTS = int(os.getenv('TRENDING_MAX_RESULTS', 100))
+
+# "Readers also liked": nightly item-item similarity over likes, favorites
+# and reading statuses, keeping RECOMMENDATIONS_NEIGHBOURS per book; rows
+# are read in chunks and similarities computed in blocks of books
+RECOMMENDATIONS_NEIGHBOURS = int(os.getenv('RECOMMENDATIONS_NEIGHBOURS', 20))
+RECOMMENDATIONS_CHUNK_SIZE = int(os.getenv('RECOMMENDATIONS_CHUNK_SIZE', 100000))
+RECOMMENDATIONS_BLOCK_SIZE = int(os.getenv('RECOMMENDATIONS_BLOCK_SIZE', 1000))
+RECOMMENDATIONS_INTERVAL = int(os.getenv('RECOMMENDATIONS_INTERVAL', 24 * 60 * 60))
+
+# Similar books by text: hashed TF-IDF vectors of title, author and context
+# in memory-mapped files under CONTENT_INDEX_DIR (shared by the web and
+# Celery containers), updated per saved book and rebuilt, which refreshes
+# the IDF weights, every CONTENT_INDEX_INTERVAL seconds
+CONTENT_INDEX_DIR = os.getenv('CONTENT_INDEX_DIR', os.path.join(BASE_DIR, 'content_index'))
+CONTENT_INDEX_DIMENSIONS = int(os.getenv('CONTENT_INDEX_DIMENSIONS', 1024))
+CONTENT_INDEX_CHUNK_SIZE = int(os.getenv('CONTENT_INDEX_CHUNK_SIZE', 2000))
+CONTENT_INDEX_BATCH_SIZE = int(os.getenv('CONTENT_INDEX_BATCH_SIZE', 65536))
+CONTENT_INDEX_INTERVAL = int(os.getenv('CONTENT_INDEX_INTERVAL', 7 * 24 * 60 * 60))
+
+# How many of the most frequent authors the filter facets list
+FILTER_FACET_AUTHORS = int(os.getenv('FILTER_FACET_AUTHORS', 10))
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000').split(',')
 CORS_ALLOW_CREDENTIALS = os.getenv('CORS_ALLOW_CREDENTIALS', 'True').lower() == 'true'
@@ -222,9 +312,17 @@ MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10485760))  # 10MB
 ALLOWED_FILE_TYPES = os.getenv('ALLOWED_FILE_TYPES', 'pdf,epub,mobi').split(',')
 
 # Logging configuration
+# Records are queued by the logging call and written, as JSON lines, by a
+# background thread; files rotate at LOG_MAX_BYTES and old ones are gzipped
+LOGGING_CONFIG = 'utils.logging_pipeline.configure'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'queue': os.getenv('LOG_QUEUE_ENABLED', 'True').lower() == 'true',
+    'queue_size': int(os.getenv('LOG_QUEUE_SIZE', 100000)),
     'formatters': {
         'verbose': {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
@@ -234,31 +332,42 @@ LOGGING = {
             'format': '{levelname} {asctime} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'utils.logging_pipeline.JSONFormatter',
+        },
     },
     'handlers': {
         'file': {
             'level': os.getenv('LOG_LEVEL', 'INFO'),
-            'class': 'logging.FileHandler',
+            'class': 'utils.logging_pipeline.CompressedRotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
-            'formatter': 'verbose',
+            'maxBytes': LOG_MAX_BYTES,
+            'backupCount': LOG_BACKUP_COUNT,
+            'formatter': 'json',
         },
         'interactions_file': {
             'level': os.getenv('LOG_LEVEL', 'INFO'),
-            'class': 'logging.FileHandler',
+            'class': 'utils.logging_pipeline.CompressedRotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'interactions.log'),
-            'formatter': 'simple',
+            'maxBytes': LOG_MAX_BYTES,
+            'backupCount': LOG_BACKUP_COUNT,
+            'formatter': 'json',
         },
         'favorites_file': {
             'level': os.getenv('LOG_LEVEL', 'INFO'),
-            'class': 'logging.FileHandler',
+            'class': 'utils.logging_pipeline.CompressedRotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'favorites.log'),
-            'formatter': 'simple',
+            'maxBytes': LOG_MAX_BYTES,
+            'backupCount': LOG_BACKUP_COUNT,
+            'formatter': 'json',
         },
         'middleware_file': {
             'level': os.getenv('LOG_LEVEL', 'INFO'),
-            'class': 'logging.FileHandler',
+            'class': 'utils.logging_pipeline.CompressedRotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'middleware.log'),
-            'formatter': 'simple',
+            'maxBytes': LOG_MAX_BYTES,
+            'backupCount': LOG_BACKUP_COUNT,
+            'formatter': 'json',
         },
     },
     'loggers': {
@@ -298,4 +407,29 @@ CELERY_TIMEZONE = os.getenv('CELERY_TIMEZONE', 'UTC')
 CELERY_TASK_TRACK_STARTED = os.getenv('CELERY_TASK_TRACK_STARTED', 'True').lower() == 'true'
 CELERY_TASK_TIME_LIMIT = int(os.getenv('CELERY_TASK_TIME_LIMIT', 30 * 60))
 
-CELERY_CACHE_BACKEND = 'redis://localhost:6379' 
\ No newline at end of file
+CELERY_CACHE_BACKEND = 'redis://localhost:6379' 
+# Nightly repair of the denormalized like/comment/favorite counters, the
+# write-behind like flush, the trending rebuild, the recommendations and the
+# content index
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-counters': {
+        'task': 'books.tasks.reconcile_counters',
+        'schedule': int(os.getenv('COUNTER_RECONCILE_INTERVAL', 24 * 60 * 60)),
+    },
+    'flush-like-buffer': {
+        'task': 'interactions.tasks.flush_like_buffer',
+        'schedule': LIKE_BUFFER_FLUSH_INTERVAL,
+    },
+    'rebuild-trending': {
+        'task': 'books.tasks.rebuild_trending',
+        'schedule': TRENDING_REBUILD_INTERVAL,
+    },
+    'build-recommendations': {
+        'task': 'books.tasks.build_recommendations',
+        'schedule': RECOMMENDATIONS_INTERVAL,
+    },
+    'build-content-index': {
+        'task': 'books.tasks.build_content_index',
+        'schedule': CONTENT_INDEX_INTERVAL,
+    },
+}
@@ -18,6 +18,11 @@ class CustomerUser(AbstractUser):
         null=True, 
         blank=True
     )
+    # Resized copies of avatar, written by users.tasks.build_avatar_variants.
+    avatar_variants = models.JSONField(
+        default=dict,
+        editable=False
+    )
 
     def __str__(self):
         return f'{self.username}'
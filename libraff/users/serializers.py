@@ -2,12 +2,18 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import *
 from django.contrib.auth.password_validation import validate_password
+from utils.images import variant_urls
 
 class CustomerUserSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomerUser
         fields = '__all__'
 
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar_variants)
+
 
 class LoginSerializer(serializers.Serializer):
     user_name = serializers.CharField(max_length=150)
@@ -65,7 +71,7 @@ class AccountUpdateSerializer(serializers.ModelSerializer):
 
         if 'password' in validated_data:
             actual.set_password(validated_data['password'])  
-            actual.save()
+        actual.save()
         return actual
 
 
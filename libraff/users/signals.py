@@ -1,11 +1,12 @@
 from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
 from django.dispatch import receiver
 import logging
-from datetime import datetime, timezone
 
 from users.models import CustomerUser
-from .tasks import send_mail_func
+from utils.cache_namespaces import bump_generation
+from .tasks import build_avatar_variants, send_mail_func
 
 
 @receiver(post_save, sender=CustomerUser)
@@ -13,26 +14,33 @@ def send_mail_signal(sender, instance, created, **kwargs):
     if created:
         send_mail_func.delay(instance.username, instance.email)
 
+#image variants
+@receiver(post_save, sender=CustomerUser)
+def resize_avatar(instance, sender, **kwargs):
+    if (instance.avatar.name or None) != instance.avatar_variants.get('source'):
+        user_id = instance.id
+        transaction.on_commit(lambda: build_avatar_variants.delay(user_id))
+
+#cache signals
+@receiver([post_save, post_delete], sender=CustomerUser)
+def clean_user_cache(instance, sender, **kwargs):
+    bump_generation('User_list', f'User_detail_{instance.id}')
+
+
 #log signals
 logger = logging.getLogger('django')
 
 @receiver(post_save, sender=CustomerUser)
 def log_user_saved(instance, sender, created, **kwargs):
-    user_id = instance.id
-    if created:
-        logger.info(f'User_{user_id}_created_{datetime.now(timezone.utc)}')
-
-    else:
-        logger.info(f'User_{user_id}_updated_{datetime.now(timezone.utc)}')
+    action = 'created' if created else 'updated'
+    logger.info('User_%s_%s', instance.id, action, extra={'user_id': instance.id})
 
 
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
-    user_id = user.id 
-    logger.info(f'User_{user_id}_logged_in_{datetime.now(timezone.utc)}')
+    logger.info('User_%s_logged_in', user.id, extra={'user_id': user.id})
 
 
 @receiver(user_logged_out)
 def log_user_out(sender, request, user, **kwargs):
-    user_id = user.id 
-    logger.info(f'User_{user_id}_logged_in_{datetime.now(timezone.utc)}')
\ No newline at end of file
+    logger.info('User_%s_logged_out', user.id, extra={'user_id': user.id})
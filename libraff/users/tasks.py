@@ -1,6 +1,11 @@
 from celery import shared_task
 from django.core.mail import send_mail
 
+from users.models import CustomerUser
+from utils.cache_namespaces import bump_generation
+from utils.images import refresh_variants
+
+
 @shared_task
 def send_mail_func(user_name: str, user_email: str):
      send_mail(
@@ -9,4 +14,15 @@ def send_mail_func(user_name: str, user_email: str):
                 'ebilebilli3@gmail.com',
                 [user_email],
                 fail_silently=True                   
-            )
\ No newline at end of file
+            )
+
+
+@shared_task
+def build_avatar_variants(user_id: int):
+    """Resize a user's avatar into its WebP and JPEG variants."""
+    user = CustomerUser.objects.filter(id=user_id).first()
+    if user is None or not refresh_variants(user, 'avatar', 'avatar_variants'):
+        return False
+    # The variants are written with an update, which sends no post_save.
+    bump_generation('User_list', f'User_detail_{user.id}')
+    return True
@@ -0,0 +1,112 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+REDIS = 'redis'
+IN_PROCESS = 'in_process'
+THREAD = 'thread'
+
+
+class AsyncCache:
+    """
+    Non-blocking access to the ``default`` cache for the ASGI views.
+
+    With django-redis the keys are read and written through
+    ``redis.asyncio``, using the backend's own key function and
+    serializer, so entries are shared with the WSGI views. In-process
+    backends are called directly; anything else falls back to Django's
+    ``a*`` methods, which run the blocking call in a thread.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        # redis.asyncio connections belong to the event loop that opened them.
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def mode(self) -> str:
+        if settings.CACHES[self.alias]['BACKEND'].startswith('django_redis'):
+            return REDIS
+        if isinstance(self.backend, (LocMemCache, DummyCache)):
+            return IN_PROCESS
+        return THREAD
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            from redis.asyncio import Redis
+
+            config = settings.CACHES[self.alias]
+            options = config.get('OPTIONS', {})
+            client = Redis.from_url(
+                config['LOCATION'].split(',')[0],
+                socket_timeout=options.get('SOCKET_TIMEOUT'),
+                socket_connect_timeout=options.get('SOCKET_CONNECT_TIMEOUT'),
+                max_connections=options.get('MAX_CONNECTIONS'),
+            )
+            self._clients[loop] = client
+        return client
+
+    def _key(self, key):
+        return self.backend.client.make_key(key)
+
+    def _px(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.backend.default_timeout
+        return None if timeout is None else max(int(timeout * 1000), 1)
+
+    async def get(self, key, default=None):
+        mode = self.mode
+        if mode == IN_PROCESS:
+            return self.backend.get(key, default)
+        if mode == THREAD:
+            return await self.backend.aget(key, default)
+        value = await self._client().get(self._key(key))
+        return default if value is None else self.backend.client.decode(value)
+
+    async def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        mode = self.mode
+        if mode == IN_PROCESS:
+            return self.backend.set(key, value, timeout=timeout)
+        if mode == THREAD:
+            return await self.backend.aset(key, value, timeout=timeout)
+        await self._client().set(
+            self._key(key),
+            self.backend.client.encode(value),
+            px=self._px(timeout),
+        )
+
+    async def add(self, key, value, timeout=DEFAULT_TIMEOUT) -> bool:
+        mode = self.mode
+        if mode == IN_PROCESS:
+            return self.backend.add(key, value, timeout=timeout)
+        if mode == THREAD:
+            return await self.backend.aadd(key, value, timeout=timeout)
+        return bool(await self._client().set(
+            self._key(key),
+            self.backend.client.encode(value),
+            px=self._px(timeout),
+            nx=True,
+        ))
+
+    async def delete(self, key):
+        mode = self.mode
+        if mode == IN_PROCESS:
+            return self.backend.delete(key)
+        if mode == THREAD:
+            return await self.backend.adelete(key)
+        await self._client().delete(self._key(key))
+
+
+async_cache = AsyncCache()
+
@@ -0,0 +1,141 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from utils import request_timing
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that loads the user with the async ORM."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken('Token contained no recognizable user identification') from exc
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as exc:
+            raise AuthenticationFailed('User not found', code='user_not_found') from exc
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                "The user's password has been changed.",
+                code='password_changed',
+            )
+        return user
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async (ASGI) read views.
+
+    DRF views are synchronous, so these are plain Django views that answer
+    like their DRF counterparts: JWTs are checked with the async ORM, the
+    request is wrapped in a DRF ``Request`` so the caching and pagination
+    code is shared, errors get DRF's ``{'detail': ...}`` bodies and data is
+    rendered with DRF's JSON renderer. Only GET is async; other methods are
+    handed to ``sync_view`` so a route keeps all of its methods.
+
+    The caching, pagination and budget declarations (``SHARED_WITH_SYNC_VIEW``)
+    are taken from ``sync_view``: both views write the same cache keys, so
+    they must not be declared twice and drift apart.
+    """
+    SHARED_WITH_SYNC_VIEW = (
+        'pagination_class',
+        'cursor_ordering',
+        'cache_family',
+        'cache_vary_on',
+        'cache_depends_on',
+        'cache_timeout',
+        'query_budget',
+    )
+    sync_view = None
+    authentication_required = False
+    authenticator = AsyncJWTAuthentication()
+    renderer = JSONRenderer()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.sync_view is None:
+            return
+        for name in cls.SHARED_WITH_SYNC_VIEW:
+            if name in vars(cls):
+                raise TypeError(f'{cls.__name__}.{name} is taken from {cls.sync_view.__name__}')
+            if hasattr(cls.sync_view, name):
+                setattr(cls, name, getattr(cls.sync_view, name))
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Like DRF: tokens, not cookies, authenticate these requests.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            if self.sync_view is None:
+                return await self.http_method_not_allowed(request, *args, **kwargs)
+            sync_view = sync_to_async(self.sync_view.as_view())
+            return await sync_view(request, *args, **kwargs)
+
+        self.request = Request(request)
+        try:
+            self.request.user = await self.authenticate(request)
+            return await self.get(self.request, *args, **kwargs)
+        except Http404 as exc:
+            return self.error(exceptions.NotFound(*exc.args))
+        except exceptions.APIException as exc:
+            return self.error(exc)
+
+    async def authenticate(self, request):
+        result = await self.authenticator.aauthenticate(request)
+        if result is None:
+            if self.authentication_required:
+                raise exceptions.NotAuthenticated()
+            return AnonymousUser()
+        return result[0]
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        started = time.perf_counter()
+        response = HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type='application/json',
+        )
+        timing = request_timing.current()
+        if timing is not None:
+            timing.add('serialize', time.perf_counter() - started)
+        return response
+
+    def error(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authenticator.authenticate_header(self.request)
+        return response
@@ -0,0 +1,126 @@
+import hashlib
+import time
+
+from django.urls import get_resolver
+
+from utils import request_timing
+from utils.cache_stampede import acached_compute, cached_compute
+from utils.cache_stats import family_stats
+
+
+class CachedResponseMixin:
+    """
+    Declarative response caching for ``APIView`` classes.
+
+    ``cache_family`` names the key family, ``cache_vary_on`` lists what the
+    payload depends on (view kwargs, query parameters or ``'user'``) and
+    ``cache_depends_on`` holds generation namespaces, formatted with those
+    values, whose bump invalidates the entry.
+    """
+    cache_family = None
+    cache_vary_on = ()
+    cache_depends_on = ()
+    cache_timeout = None
+
+    def get_cache_params(self) -> dict:
+        params = {}
+        for name in self.cache_vary_on:
+            if name == 'user':
+                user = self.request.user
+                params[name] = user.id if user.is_authenticated else 'anonymous'
+            elif name in self.kwargs:
+                params[name] = self.kwargs[name]
+            else:
+                value = self.request.query_params.get(name)
+                params[name] = value.strip() if value is not None else None
+        return params
+
+    def get_cache_key(self, params: dict) -> str:
+        # Query values are user input, so they are hashed rather than
+        # embedded in the key.
+        signature = '&'.join(f'{name}={value}' for name, value in params.items())
+        digest = hashlib.md5(signature.encode('utf-8')).hexdigest()
+        return f'{self.cache_family}_{digest}'
+
+    def get_cached_data(self, compute):
+        """Return the cached payload, rebuilding it with ``compute`` on a miss."""
+        params = self.get_cache_params()
+        timing = request_timing.current()
+        recomputed = False
+        compute_seconds = 0.0
+
+        def instrumented_compute():
+            nonlocal recomputed, compute_seconds
+            recomputed = True
+            db_before = timing.seconds['db'] if timing is not None else 0.0
+            started = time.monotonic()
+            value = compute()
+            compute_seconds = time.monotonic() - started
+            if timing is not None:
+                # Whatever the queries did not take went into serializing.
+                timing.add('serialize', compute_seconds - (timing.seconds['db'] - db_before))
+            family_stats.record_recompute(self.cache_family, compute_seconds, value)
+            return value
+
+        started = time.monotonic()
+        data = cached_compute(
+            self.get_cache_key(params),
+            instrumented_compute,
+            namespaces=[namespace.format(**params) for namespace in self.cache_depends_on],
+            timeout=self.cache_timeout,
+        )
+        if timing is not None:
+            timing.record_cache(time.monotonic() - started - compute_seconds, hit=not recomputed)
+        if not recomputed:
+            family_stats.record_hit(self.cache_family)
+        return data
+
+    async def aget_cached_data(self, acompute):
+        """``get_cached_data`` for async views; ``acompute`` is a coroutine function."""
+        params = self.get_cache_params()
+        timing = request_timing.current()
+        recomputed = False
+        compute_seconds = 0.0
+
+        async def instrumented_compute():
+            nonlocal recomputed, compute_seconds
+            recomputed = True
+            db_before = timing.seconds['db'] if timing is not None else 0.0
+            started = time.monotonic()
+            value = await acompute()
+            compute_seconds = time.monotonic() - started
+            if timing is not None:
+                timing.add('serialize', compute_seconds - (timing.seconds['db'] - db_before))
+            family_stats.record_recompute(self.cache_family, compute_seconds, value)
+            return value
+
+        started = time.monotonic()
+        data = await acached_compute(
+            self.get_cache_key(params),
+            instrumented_compute,
+            namespaces=[namespace.format(**params) for namespace in self.cache_depends_on],
+            timeout=self.cache_timeout,
+        )
+        if timing is not None:
+            timing.record_cache(time.monotonic() - started - compute_seconds, hit=not recomputed)
+        if not recomputed:
+            family_stats.record_hit(self.cache_family)
+        return data
+
+
+def cached_families() -> list:
+    """Return the key families declared by the routed views."""
+    families = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                walk(pattern.url_patterns)
+                continue
+            view_class = getattr(pattern.callback, 'view_class', None)
+            family = getattr(view_class, 'cache_family', None)
+            if family:
+                families.add(family)
+
+    walk(get_resolver().url_patterns)
+    return sorted(families)
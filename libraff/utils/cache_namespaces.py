@@ -0,0 +1,47 @@
+import time
+
+from django.core.cache import cache
+
+from utils.async_cache import async_cache
+from utils.tiered_cache import tiered_cache
+
+
+def generation_key(namespace: str) -> str:
+    return f'Generation_{namespace}'
+
+
+def _seed_generation(key: str):
+    # Seed from the clock so a counter lost to eviction never hands out
+    # a generation that older entries were already stored under.
+    cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_generation(namespace: str) -> int:
+    """Return the current generation of a cache key family."""
+    key = generation_key(namespace)
+    generation = tiered_cache.get(key)
+    if generation is None:
+        _seed_generation(key)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation(namespace: str) -> int:
+    """``get_generation`` for async views."""
+    key = generation_key(namespace)
+    generation = await tiered_cache.aget(key)
+    if generation is None:
+        await async_cache.add(key, time.time_ns(), timeout=None)
+        generation = await async_cache.get(key)
+    return generation
+
+
+def bump_generation(*namespaces: str):
+    """Invalidate every key of the given families with one INCR each."""
+    keys = [generation_key(namespace) for namespace in namespaces]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            _seed_generation(key)
+    tiered_cache.invalidate(*keys)
@@ -0,0 +1,220 @@
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.async_cache import async_cache
+from utils.cache_namespaces import aget_generation, get_generation
+from utils.tiered_cache import tiered_cache
+
+counters = dict.fromkeys(
+    (
+        'hits',
+        'misses',
+        'recomputes',
+        'stale_served',
+        'waited',
+        'early_refreshes',
+        'lock_wait_timeouts',
+    ),
+    0,
+)
+_counters_lock = threading.Lock()
+
+FRESH = 'fresh'
+EARLY = 'early'
+STALE = 'stale'
+MISSING = 'missing'
+
+
+def _state(envelope, generation, beta):
+    if envelope is None:
+        return MISSING
+    if envelope['generation'] != generation:
+        return STALE
+    remaining = envelope['fresh_until'] - time.time()
+    if remaining <= 0:
+        return STALE
+    if beta:
+        # XFetch: the closer the expiry and the slower the recompute,
+        # the likelier a request volunteers to refresh ahead of time.
+        remaining += envelope['delta'] * beta * math.log(1.0 - random.random())
+        if remaining <= 0:
+            return EARLY
+    return FRESH
+
+
+def _read(key, generation, beta):
+    envelope = tiered_cache.get(key)
+    state = _state(envelope, generation, beta)
+    if state in (STALE, MISSING) and tiered_cache.local is not None:
+        # Another process may already have stored a fresher value in L2.
+        shared = cache.get(key)
+        shared_state = _state(shared, generation, beta)
+        if shared_state in (FRESH, EARLY):
+            tiered_cache.local.set(key, shared)
+            return shared, shared_state
+    return envelope, state
+
+
+def _recompute(key, compute, generation, timeout):
+    _count('recomputes')
+    started = time.monotonic()
+    value = compute()
+    envelope = {
+        'value': value,
+        'generation': generation,
+        'fresh_until': time.time() + timeout,
+        'delta': time.monotonic() - started,
+    }
+    tiered_cache.set(
+        key,
+        envelope,
+        timeout=timeout + settings.CACHE_STALE_TIMEOUT,
+    )
+    return value
+
+
+def cached_compute(key, compute, namespaces=(), timeout=None, beta=None):
+    """
+    Return the cached value of ``key``, calling ``compute`` to rebuild it.
+
+    Only the worker holding the short ``Lock_<key>`` recomputes; the others
+    keep serving the previous value (even one from an older generation of
+    ``namespaces``) or, when there is none, wait briefly for the winner.
+    A non-zero ``beta`` enables probabilistic early refresh.
+    """
+    timeout = settings.CACHETIMEOUT if timeout is None else timeout
+    beta = settings.CACHE_EARLY_REFRESH_BETA if beta is None else beta
+    generation = tuple(get_generation(namespace) for namespace in namespaces)
+
+    envelope, state = _read(key, generation, beta)
+    if state == FRESH:
+        _count('hits')
+        return envelope['value']
+
+    lock_key = f'Lock_{key}'
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout=settings.CACHE_LOCK_TIMEOUT):
+        if state == EARLY:
+            _count('early_refreshes')
+        elif state == MISSING:
+            _count('misses')
+        try:
+            return _recompute(key, compute, generation, timeout)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    if state == EARLY:
+        _count('hits')
+        return envelope['value']
+    if state == STALE:
+        _count('stale_served')
+        return envelope['value']
+
+    _count('misses')
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        envelope = cache.get(key)
+        if _state(envelope, generation, 0) == FRESH:
+            _count('waited')
+            return envelope['value']
+    _count('lock_wait_timeouts')
+    return _recompute(key, compute, generation, timeout)
+
+
+async def _aread(key, generation, beta):
+    envelope = await tiered_cache.aget(key)
+    state = _state(envelope, generation, beta)
+    if state in (STALE, MISSING) and tiered_cache.local is not None:
+        shared = await async_cache.get(key)
+        shared_state = _state(shared, generation, beta)
+        if shared_state in (FRESH, EARLY):
+            tiered_cache.local.set(key, shared)
+            return shared, shared_state
+    return envelope, state
+
+
+async def _arecompute(key, acompute, generation, timeout):
+    _count('recomputes')
+    started = time.monotonic()
+    value = await acompute()
+    envelope = {
+        'value': value,
+        'generation': generation,
+        'fresh_until': time.time() + timeout,
+        'delta': time.monotonic() - started,
+    }
+    await tiered_cache.aset(
+        key,
+        envelope,
+        timeout=timeout + settings.CACHE_STALE_TIMEOUT,
+    )
+    return value
+
+
+async def acached_compute(key, acompute, namespaces=(), timeout=None, beta=None):
+    """
+    ``cached_compute`` for async views, sharing its entries and locks;
+    ``acompute`` is a coroutine function. Waiting for another worker's
+    recompute yields to the event loop instead of sleeping the thread.
+    """
+    timeout = settings.CACHETIMEOUT if timeout is None else timeout
+    beta = settings.CACHE_EARLY_REFRESH_BETA if beta is None else beta
+    generation = tuple([await aget_generation(namespace) for namespace in namespaces])
+
+    envelope, state = await _aread(key, generation, beta)
+    if state == FRESH:
+        _count('hits')
+        return envelope['value']
+
+    lock_key = f'Lock_{key}'
+    token = uuid.uuid4().hex
+    if await async_cache.add(lock_key, token, timeout=settings.CACHE_LOCK_TIMEOUT):
+        if state == EARLY:
+            _count('early_refreshes')
+        elif state == MISSING:
+            _count('misses')
+        try:
+            return await _arecompute(key, acompute, generation, timeout)
+        finally:
+            if await async_cache.get(lock_key) == token:
+                await async_cache.delete(lock_key)
+
+    if state == EARLY:
+        _count('hits')
+        return envelope['value']
+    if state == STALE:
+        _count('stale_served')
+        return envelope['value']
+
+    _count('misses')
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        envelope = await async_cache.get(key)
+        if _state(envelope, generation, 0) == FRESH:
+            _count('waited')
+            return envelope['value']
+    _count('lock_wait_timeouts')
+    return await _arecompute(key, acompute, generation, timeout)
+
+
+def _count(name):
+    # += on a dict entry is not atomic across threads.
+    with _counters_lock:
+        counters[name] += 1
+
+
+def stats() -> dict:
+    with _counters_lock:
+        stats = dict(counters)
+    stats['recomputes_avoided'] = stats['stale_served'] + stats['waited']
+    return stats
@@ -0,0 +1,95 @@
+import pickle
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+COUNTERS = ('hits', 'recomputes', 'payload_bytes', 'payload_samples', 'recompute_us')
+
+
+class FamilyStats:
+    """
+    Per-key-family cache counters.
+
+    Counts are accumulated in process and added to the shared cache at most
+    every ``CACHE_STATS_FLUSH_INTERVAL`` seconds, so recording a request
+    costs no extra round trip. Payload sizes are measured by pickling one
+    recompute in ``CACHE_STATS_PAYLOAD_SAMPLE_EVERY``.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._recomputes = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record_hit(self, family: str):
+        self._add(family, hits=1)
+
+    def record_recompute(self, family: str, seconds: float, value):
+        with self._lock:
+            seen = self._recomputes[family] = self._recomputes.get(family, 0) + 1
+        sampled = (seen - 1) % settings.CACHE_STATS_PAYLOAD_SAMPLE_EVERY == 0
+        self._add(
+            family,
+            recomputes=1,
+            payload_bytes=len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) if sampled else 0,
+            payload_samples=int(sampled),
+            recompute_us=int(seconds * 1_000_000),
+        )
+
+    def _add(self, family, **deltas):
+        with self._lock:
+            pending = self._pending.setdefault(family, dict.fromkeys(COUNTERS, 0))
+            for name, delta in deltas.items():
+                pending[name] += delta
+        if time.monotonic() - self._last_flush >= settings.CACHE_STATS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        for family, counters in pending.items():
+            for name, delta in counters.items():
+                if not delta:
+                    continue
+                key = stats_key(family, name)
+                if not cache.add(key, delta, timeout=None):
+                    cache.incr(key, delta)
+
+    def collect(self, families) -> dict:
+        """Read the shared counters of ``families`` with one round trip."""
+        keys = {
+            stats_key(family, name): (family, name)
+            for family in families
+            for name in COUNTERS
+        }
+        values = cache.get_many(keys)
+        report = {family: dict.fromkeys(COUNTERS, 0) for family in families}
+        for key, value in values.items():
+            family, name = keys[key]
+            report[family][name] = value
+        for counters in report.values():
+            requests = counters['hits'] + counters['recomputes']
+            recomputes = counters['recomputes'] or 1
+            counters['hit_ratio'] = counters['hits'] / requests if requests else 0.0
+            counters['avg_payload_bytes'] = counters['payload_bytes'] // (counters['payload_samples'] or 1)
+            counters['avg_recompute_ms'] = counters['recompute_us'] / recomputes / 1000
+        return report
+
+    def reset(self, families):
+        with self._lock:
+            for family in families:
+                self._recomputes.pop(family, None)
+        cache.delete_many(
+            [stats_key(family, name) for family in families for name in COUNTERS]
+        )
+
+
+def stats_key(family: str, name: str) -> str:
+    return f'Cache_stats_{family}_{name}'
+
+
+family_stats = FamilyStats()
@@ -0,0 +1,23 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def shift_counter(model, pk, field: str, step: int):
+    """Atomically add ``step`` to a denormalized counter column of one row."""
+    queryset = model.objects.filter(pk=pk)
+    if step < 0:
+        # Never push a drifted counter below zero; reconciliation fixes it.
+        queryset = queryset.filter(**{f'{field}__gte': -step})
+    queryset.update(**{field: F(field) + step})
+
+
+def count_of(model, field: str):
+    """Subquery expression counting the ``model`` rows whose ``field`` is the outer row."""
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
@@ -1,6 +1,191 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
 class CustomPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches to keyset
+    pagination over ``cursor_ordering``: no COUNT query, no OFFSET, and
+    opaque ``next``/``previous`` cursors. Views can override the ordering
+    with their own ``cursor_ordering`` attribute, or set it to ``None`` when
+    their order cannot be expressed as a keyset.
+    """
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    cursor_mode = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        if ordering is None or self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        queryset = self._keyset_queryset(queryset, request, ordering)
+        return self._keyset_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, over the async ORM."""
+        ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        if ordering is None or self.cursor_query_param not in request.query_params:
+            return await self._apaginate_pages(queryset, request)
+
+        queryset = self._keyset_queryset(queryset, request, ordering)
+        return self._keyset_page([obj async for obj in queryset])
+
+    async def _apaginate_pages(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        # The paginator only needs the count; the page itself is fetched
+        # below so that neither query runs synchronously.
+        paginator = self.django_paginator_class(range(await queryset.acount()), page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number,
+                message=str(exc),
+            ))
+        bottom = (self.page.number - 1) * page_size
+        self.page.object_list = [
+            obj async for obj in queryset[bottom:bottom + page_size]
+        ]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+    def _keyset_queryset(self, queryset, request, ordering):
+        self.cursor_mode = True
+        self.request = request
+        self.ordering = tuple(ordering)
+        self.keyset_page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param],
+            queryset.model,
+        )
+
+        ordering = self._reversed(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self._after(ordering, self.position))
+        return queryset[:self.keyset_page_size + 1]
+
+    def _keyset_page(self, results):
+        page_size, position, reverse = self.keyset_page_size, self.position, self.reverse
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self._position(results[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self._position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(self.next_position, reverse=False),
+            'previous': self.get_cursor_link(self.previous_position, reverse=True),
+            'results': data,
+        })
+
+    def get_cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(position, reverse),
+        )
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor, model):
+        """
+        The position and direction of ``cursor``, each value converted by its
+        ``model`` field; a cursor that does not fit the ordering is rejected
+        here rather than failing in the query.
+        """
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [self._convert(model, name, value) for name, value in zip(self.ordering, position)], reverse
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _convert(model, name, value):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise TypeError(f'{value!r} is no cursor value')
+        field = model._meta.get_field(name.lstrip('-'))
+        value = field.to_python(value)
+        # Range checks, such as the database's integer bounds.
+        field.run_validators(value)
+        return value
+
+    def _position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Rows strictly after ``position`` in ``ordering``: ``a < x OR (a = x
+        AND b < y) ...``, plus the redundant bound ``a <= x``. Without that
+        bound the OR chain is no index range, and a deep page would filter
+        every row before the cursor instead of seeking to it.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        if len(ordering) > 1:
+            first = ordering[0]
+            bound = 'lte' if first.startswith('-') else 'gte'
+            condition &= Q(**{f'{first.lstrip("-")}__{bound}': position[0]})
+        return condition
@@ -0,0 +1,126 @@
+import hashlib
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+PYTHON = 'python'
+X_ACCEL = 'x-accel'
+X_SENDFILE = 'x-sendfile'
+
+
+def file_etag(field_file, modified: float) -> str:
+    """Strong validator built from the stored name, size and modification time."""
+    digest = hashlib.md5(
+        f'{field_file.name}:{field_file.size}:{modified}'.encode('utf-8')
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def parse_range(header: str, size: int):
+    """
+    Return the ``(start, end)`` byte span of a single-range header.
+
+    ``None`` means the header is absent, malformed or multi-range and the
+    whole file should be sent; ``ValueError`` means it is unsatisfiable.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_span(field_file, start: int, length: int):
+    with field_file.open('rb') as stream:
+        stream.seek(start)
+        while length > 0:
+            chunk = stream.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, field_file, filename: str, mode: str = None):
+    """
+    Send ``field_file`` as an attachment after the caller's access checks.
+
+    Conditional requests (``If-None-Match``, ``If-Modified-Since``) are
+    answered with 304 without touching the file. In ``x-accel`` and
+    ``x-sendfile`` mode the body is left to the front proxy; otherwise
+    Python streams it, honouring a single ``Range`` and ``If-Range``.
+    """
+    mode = mode or settings.FILE_DELIVERY_MODE
+    last_modified = field_file.storage.get_modified_time(field_file.name).timestamp()
+    etag = file_etag(field_file, last_modified)
+
+    conditional = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified),
+    )
+    if conditional is not None:
+        conditional['ETag'] = etag
+        return conditional
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if mode in (X_ACCEL, X_SENDFILE):
+        response = HttpResponse(content_type=content_type)
+        if mode == X_ACCEL:
+            response['X-Accel-Redirect'] = (
+                settings.FILE_ACCEL_REDIRECT_PREFIX + quote(field_file.name)
+            )
+        else:
+            response['X-Sendfile'] = field_file.path
+    else:
+        response = _python_response(request, field_file, etag, content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def _python_response(request, field_file, etag, content_type):
+    size = field_file.size
+    span = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range == etag:
+        try:
+            span = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = span or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(
+        _read_span(field_file, start, length),
+        status=206 if span else 200,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    if span:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
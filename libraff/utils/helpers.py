@@ -1,6 +1,6 @@
 import faker
 import random
-from books.models import Book, BookCategory
+from books.importer import BookImporter
 
 
 
@@ -12,18 +12,18 @@ def fake_data_gen(number:int = 1):
         "Psixologiya", "Dini", "Tarix", "Macerə",
         "Texnologiya", "Sənədli"
     ]
-    
-    categories = [BookCategory.objects.get_or_create(category_name=name)[0] for name in category_names]
 
-    for x in range(number):
-        Book.objects.create(
-            category = random.choice(categories),
-            author = fake.name(),
-            title = fake.words(),
-            context = fake.sentence(),
-            price = random.randint(1, 150),
-            like = 0,
-            pdf = fake.url()
-        )
+    rows = (
+        {
+            'category': random.choice(category_names),
+            'author': fake.name(),
+            'title': ' '.join(fake.words()),
+            'context': fake.sentence(),
+            'price': random.randint(1, 150),
+        }
+        for x in range(number)
+    )
+    importer = BookImporter()
+    importer.import_rows(rows)
+    importer.finish()
     print (f'{number} fake data created')
-
@@ -0,0 +1,109 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+# Encoder options per variant format; JPEG is the fallback for clients
+# without WebP support.
+FORMATS = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+
+def variant_widths(width: int) -> list:
+    """The configured widths an image ``width`` pixels wide is resized to; never upscaled."""
+    return [size for size in settings.IMAGE_VARIANT_WIDTHS if size <= width] or [width]
+
+
+def _open(source):
+    image = Image.open(source)
+    widest = max(settings.IMAGE_VARIANT_WIDTHS)
+    if image.width > widest:
+        # JPEG decodes straight to a smaller scale; a 4000px photo is
+        # never held in memory at full size.
+        image.draft('RGB', (widest, round(image.height * widest / image.width)))
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+
+def _encode(image, name: str) -> bytes:
+    if FORMATS[name]['format'] == 'JPEG' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, quality=settings.IMAGE_VARIANT_QUALITY, **FORMATS[name])
+    return buffer.getvalue()
+
+
+def build_variants(name: str) -> dict:
+    """
+    Write resized WebP and JPEG copies of the stored image ``name`` and
+    return ``{'source': name, 'webp': {width: path}, 'jpeg': {width: path}}``.
+    File names carry a hash of their content, so a URL always means the
+    same bytes and can be cached for good.
+    """
+    with default_storage.open(name, 'rb') as source:
+        image = _open(source)
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+
+    variants = {'source': name, **{format_name: {} for format_name in FORMATS}}
+    for width in variant_widths(image.width):
+        resized = image.resize(
+            (width, max(1, round(image.height * width / image.width))),
+            Image.Resampling.LANCZOS,
+        )
+        for format_name in FORMATS:
+            data = _encode(resized, format_name)
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            path = f'{directory}/variants/{stem}-{width}w.{digest}.{format_name}'
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(data))
+            variants[format_name][str(width)] = path
+    return variants
+
+
+def variant_paths(variants: dict) -> set:
+    return {path for format_name in FORMATS for path in variants.get(format_name, {}).values()}
+
+
+def refresh_variants(instance, field: str, variants_field: str) -> bool:
+    """
+    Bring ``instance``'s ``variants_field`` in line with its image ``field``:
+    build the variants of a new image, drop those of a replaced or removed
+    one. The row is only written if the image is still the one resized.
+    Returns whether anything changed.
+    """
+    name = getattr(instance, field).name or None
+    old = getattr(instance, variants_field) or {}
+    if old.get('source') == name:
+        return False
+
+    variants = build_variants(name) if name else {}
+    current = Q(**{field: name}) if name else Q(**{field: ''}) | Q(**{f'{field}__isnull': True})
+    updated = type(instance).objects.filter(current, pk=instance.pk).update(**{variants_field: variants})
+    if not updated:
+        # Replaced again meanwhile; the task queued for that save takes over.
+        return False
+    for path in variant_paths(old) - variant_paths(variants):
+        default_storage.delete(path)
+    return True
+
+
+def variant_urls(variants: dict) -> dict:
+    """``{format: {width: url}}`` of stored variants, for ``srcset`` attributes."""
+    return {
+        format_name: {
+            width: default_storage.url(path)
+            for width, path in variants.get(format_name, {}).items()
+        }
+        for format_name in FORMATS
+        if variants.get(format_name)
+    }
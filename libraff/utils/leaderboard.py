@@ -0,0 +1,119 @@
+import threading
+
+from django.conf import settings
+
+
+class RedisLeaderboard:
+    """Sorted sets in the Redis instance behind the ``default`` cache."""
+
+    def _client(self):
+        from django_redis import get_redis_connection
+
+        return get_redis_connection('default')
+
+    def incr(self, entries: list):
+        """Apply ``(key, member, amount)`` increments in one round trip."""
+        pipeline = self._client().pipeline(transaction=False)
+        for key, member, amount in entries:
+            pipeline.zincrby(key, amount, member)
+        pipeline.execute()
+
+    def top(self, key: str, count: int) -> list:
+        """The ``count`` highest ``(member, score)`` pairs, in O(log n + count)."""
+        return [
+            (int(member), score)
+            for member, score in self._client().zrevrange(key, 0, count - 1, withscores=True)
+        ]
+
+    def remove(self, keys: list, member):
+        pipeline = self._client().pipeline(transaction=False)
+        for key in keys:
+            pipeline.zrem(key, member)
+        pipeline.execute()
+
+    def get_value(self, key: str, default=None):
+        value = self._client().get(key)
+        return default if value is None else float(value)
+
+    def add_value(self, key: str, value: float):
+        """Set ``key`` unless it is already set."""
+        self._client().set(key, value, nx=True)
+
+    def replace(self, boards: dict, values: dict):
+        """
+        Swap in whole ``{key: {member: score}}`` boards and set plain
+        ``values`` atomically: readers see either the old state or the new.
+        """
+        client = self._client()
+        staging = client.pipeline(transaction=False)
+        for key, scores in boards.items():
+            staging.delete(f'{key}_rebuild')
+            if scores:
+                staging.zadd(f'{key}_rebuild', scores)
+        staging.execute()
+
+        swap = client.pipeline(transaction=True)
+        for key, scores in boards.items():
+            if scores:
+                swap.rename(f'{key}_rebuild', key)
+            else:
+                swap.delete(key)
+        for key, value in values.items():
+            swap.set(key, value)
+        swap.execute()
+
+
+class LocalLeaderboard:
+    """
+    Per-process stand-in for when the cache is not Redis (development and
+    tests); ``top`` sorts the whole board.
+    """
+
+    def __init__(self):
+        self._boards = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr(self, entries: list):
+        with self._lock:
+            for key, member, amount in entries:
+                board = self._boards.setdefault(key, {})
+                board[int(member)] = board.get(int(member), 0) + amount
+
+    def top(self, key: str, count: int) -> list:
+        with self._lock:
+            board = list(self._boards.get(key, {}).items())
+        return sorted(board, key=lambda item: (-item[1], -item[0]))[:count]
+
+    def remove(self, keys: list, member):
+        with self._lock:
+            for key in keys:
+                self._boards.get(key, {}).pop(int(member), None)
+
+    def get_value(self, key: str, default=None):
+        return self._values.get(key, default)
+
+    def add_value(self, key: str, value: float):
+        with self._lock:
+            self._values.setdefault(key, value)
+
+    def replace(self, boards: dict, values: dict):
+        with self._lock:
+            for key, scores in boards.items():
+                self._boards[key] = {int(member): score for member, score in scores.items()}
+            self._values.update(values)
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+            self._values.clear()
+
+
+_redis_leaderboard = RedisLeaderboard()
+_local_leaderboard = LocalLeaderboard()
+
+
+def get_leaderboard():
+    if settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+        return _redis_leaderboard
+    return _local_leaderboard
@@ -0,0 +1,273 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.config
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and extras."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class CompressedRotatingFileHandler(RotatingFileHandler):
+    """
+    Size-rotated log file whose rotated copies are gzipped.
+
+    ``emit`` leaves the data in the file buffer; the queue listener flushes
+    once per batch rather than once per record.
+
+    Several processes may share the file. Each holds a shared ``flock`` on
+    ``<file>.lock`` while it has a batch in its buffer, and rotating takes
+    the lock exclusively, so no process writes into a file being renamed
+    and compressed. A process notices a rotation done by another one when
+    it starts its next batch, and reopens the file.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding='utf-8', delay=True):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        super().__init__(
+            filename,
+            maxBytes=maxBytes,
+            backupCount=backupCount,
+            encoding=encoding,
+            delay=delay,
+        )
+        self.namer = lambda name: f'{name}.gz'
+        self.rotator = self.compress
+        self._lock_file = None
+        self._lock_pid = None
+        self._held = False
+        self._pending = 0
+
+    @staticmethod
+    def compress(source, destination):
+        with open(source, 'rb') as plain, gzip.open(destination, 'wb') as packed:
+            shutil.copyfileobj(plain, packed)
+        os.remove(source)
+
+    def emit(self, record):
+        try:
+            message = self.format(record) + self.terminator
+            self._hold()
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size() + len(message) >= self.maxBytes:
+                self._rollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(message)
+            self._pending += len(message)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self._pending = 0
+        self._release()
+
+    def close(self):
+        super().close()
+        self._release()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _size(self):
+        # Every process's flushed lines plus this one's buffered batch.
+        return os.fstat(self.stream.fileno()).st_size + self._pending
+
+    def _hold(self):
+        """Take the shared lock for this batch; reopen the file if it was rotated meanwhile."""
+        if self._held:
+            return
+        self._flock('SH')
+        self._held = True
+        if self.stream is not None and not self._is_current():
+            self.stream.close()
+            self.stream = None
+
+    def _release(self):
+        if self._held:
+            self._held = False
+            self._flock('UN')
+
+    def _rollover(self):
+        self.stream.flush()
+        self._pending = 0
+        self._flock('EX')
+        try:
+            # Another process may have rotated while this one waited.
+            if not self._is_current():
+                self.stream.close()
+                self.stream = None
+            elif os.fstat(self.stream.fileno()).st_size >= self.maxBytes:
+                self.doRollover()
+        finally:
+            self._flock('SH')
+
+    def _is_current(self) -> bool:
+        try:
+            on_disk = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return False
+        ours = os.fstat(self.stream.fileno())
+        return (on_disk.st_dev, on_disk.st_ino) == (ours.st_dev, ours.st_ino)
+
+    def _flock(self, operation: str):
+        if fcntl is None:
+            # No flock on Windows: one process per file is assumed there.
+            return
+        if self._lock_pid != os.getpid():
+            # A forked child must not share its parent's lock.
+            self._lock_file = open(f'{self.baseFilename}.lock', 'a')
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_file, getattr(fcntl, f'LOCK_{operation}'))
+
+
+class LogListener:
+    """
+    Background thread that writes queued records to their handlers.
+
+    Records are taken in batches of up to ``batch_size`` and every touched
+    handler is flushed once per batch. The thread is (re)started lazily in
+    each process, so forking servers get their own listener.
+    """
+
+    def __init__(self, maxsize=10000, batch_size=256):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='log-listener',
+                    daemon=True,
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._write(batch):
+                return
+
+    def _write(self, batch) -> bool:
+        touched = set()
+        running = True
+        for item in batch:
+            if item is None:
+                running = False
+                continue
+            handlers, record = item
+            for handler in handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    touched.add(handler)
+        for handler in touched:
+            handler.flush()
+        return running
+
+    def stop(self):
+        """Write out whatever is queued; used at interpreter exit."""
+        if self._thread is not None and self._pid == os.getpid():
+            self.queue.put(None)
+            self._thread.join(timeout=5)
+            self._pid = None
+
+
+class RoutingQueueHandler(QueueHandler):
+    """
+    Stands in for a logger's own handlers: records are queued together
+    with those handlers and written by the listener thread. Formatting is
+    left to the listener too, so callers only pay for building the record.
+    """
+
+    def __init__(self, listener, handlers):
+        super().__init__(listener.queue)
+        self.listener = listener
+        self.handlers = handlers
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        self.listener.ensure_started()
+        try:
+            self.queue.put_nowait((self.handlers, record))
+        except queue.Full:
+            self.listener.dropped += 1
+
+
+listener = LogListener()
+atexit.register(listener.stop)
+
+
+def configure(config):
+    """
+    ``LOGGING_CONFIG`` entry point: applies ``config`` with ``dictConfig``,
+    then moves the handlers of every configured logger behind one queue.
+    Set ``'queue': False`` in the config to keep writes synchronous, and
+    ``'queue_size'`` to bound how many records may wait (extra ones are
+    dropped and counted in ``listener.dropped``).
+    """
+    config = dict(config)
+    queued = config.pop('queue', True)
+    listener.queue.maxsize = config.pop('queue_size', listener.queue.maxsize)
+    logging.config.dictConfig(config)
+    if not queued:
+        return
+    for name in config.get('loggers', {}):
+        logger = logging.getLogger(name)
+        handlers = [
+            handler for handler in logger.handlers
+            if not isinstance(handler, QueueHandler)
+        ]
+        if handlers:
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(RoutingQueueHandler(listener, handlers))
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework import permissions
 
 
@@ -5,3 +7,19 @@ class OwnerOrAdminPermission(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.user == request.user or request.user.is_staff
 
+
+
+class MetricsTokenPermission(permissions.BasePermission):
+    """
+    Lets in requests carrying ``Authorization: Metrics <METRICS_TOKEN>``.
+
+    The scheme differs from the JWT ``Bearer`` one so that JWT
+    authentication leaves the header alone; an unset token lets no one in.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        return bool(token) and constant_time_compare(
+            request.headers.get('Authorization', ''),
+            f'Metrics {token}',
+        )
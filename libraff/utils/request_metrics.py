@@ -0,0 +1,154 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import get_resolver
+
+from utils.request_timing import PHASES
+
+# Upper bounds in seconds; the last bucket (+Inf) is implied.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+COUNTERS = ('queries', 'cache_hits', 'cache_misses')
+
+PREFIX = 'libraff_request'
+
+
+def _series_names():
+    for phase in PHASES:
+        for index in range(len(BUCKETS) + 1):
+            yield f'{phase}_bucket_{index}'
+        yield f'{phase}_sum_us'
+        yield f'{phase}_count'
+    yield from COUNTERS
+
+
+SERIES = tuple(_series_names())
+
+
+def _bucket(seconds: float) -> int:
+    for index, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(BUCKETS)
+
+
+class RequestMetrics:
+    """
+    Per-view latency histograms of every phase of ``RequestTiming``.
+
+    Like the cache family counters, observations are accumulated in
+    process and added to the shared cache at most every
+    ``REQUEST_METRICS_FLUSH_INTERVAL`` seconds, so all workers report
+    into the same histograms.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def observe(self, view: str, method: str, timing):
+        with self._lock:
+            pending = self._pending.setdefault((view, method), {})
+            for phase in PHASES:
+                seconds = timing.seconds[phase]
+                for name, delta in (
+                    (f'{phase}_bucket_{_bucket(seconds)}', 1),
+                    (f'{phase}_sum_us', int(seconds * 1_000_000)),
+                    (f'{phase}_count', 1),
+                ):
+                    pending[name] = pending.get(name, 0) + delta
+            for name in COUNTERS:
+                pending[name] = pending.get(name, 0) + getattr(timing, name)
+        if time.monotonic() - self._last_flush >= settings.REQUEST_METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        for (view, method), series in pending.items():
+            for name, delta in series.items():
+                if not delta:
+                    continue
+                key = metrics_key(view, method, name)
+                if not cache.add(key, delta, timeout=None):
+                    cache.incr(key, delta)
+
+    def collect(self, routes) -> dict:
+        """Read the shared series of ``(view, method)`` routes in one round trip."""
+        keys = {
+            metrics_key(view, method, name): (view, method, name)
+            for view, method in routes
+            for name in SERIES
+        }
+        report = {}
+        for key, value in cache.get_many(keys).items():
+            view, method, name = keys[key]
+            report.setdefault((view, method), dict.fromkeys(SERIES, 0))[name] = value
+        return report
+
+    def reset(self, routes):
+        cache.delete_many(
+            [metrics_key(view, method, name) for view, method in routes for name in SERIES]
+        )
+
+
+def metrics_key(view: str, method: str, name: str) -> str:
+    return f'Request_metrics_{view}_{method}_{name}'
+
+
+def routed_views() -> list:
+    """Return ``(view name, method)`` of every handler of the routed API views."""
+    routes = set()
+
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+                walk(pattern.url_patterns, prefix)
+                continue
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if view_class is None or not pattern.name:
+                continue
+            for method in METHODS:
+                if hasattr(view_class, method.lower()):
+                    routes.add((f'{namespace}{pattern.name}', method))
+
+    walk(get_resolver().url_patterns, '')
+    return sorted(routes)
+
+
+def render_prometheus(report: dict) -> str:
+    """Prometheus text exposition (format 0.0.4) of a ``collect`` report."""
+    lines = []
+    for phase in PHASES:
+        name = f'{PREFIX}_{phase}_seconds'
+        lines.append(f'# HELP {name} Time spent in the {phase} phase of a request.')
+        lines.append(f'# TYPE {name} histogram')
+        for (view, method), series in report.items():
+            labels = f'view="{view}",method="{method}"'
+            cumulative = 0
+            for index, bound in enumerate(BUCKETS + (None,)):
+                cumulative += series[f'{phase}_bucket_{index}']
+                le = '+Inf' if bound is None else repr(bound)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {series[f"{phase}_sum_us"] / 1_000_000}')
+            lines.append(f'{name}_count{{{labels}}} {series[f"{phase}_count"]}')
+
+    for counter, help_text in (
+        ('queries', 'SQL queries run by requests.'),
+        ('cache_hits', 'Cached payloads served without recomputing.'),
+        ('cache_misses', 'Cached payloads that had to be recomputed.'),
+    ):
+        name = f'{PREFIX}_{counter}_total'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (view, method), series in report.items():
+            lines.append(f'{name}{{view="{view}",method="{method}"}} {series[counter]}')
+    return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,103 @@
+import contextvars
+import time
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PHASES = ('total', 'db', 'cache', 'serialize')
+
+_current = contextvars.ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Where one request spent its time.
+
+    Every SQL query of the request is timed by ``time_queries`` and shown
+    to the ``query_listeners``; the cache layer adds its lookup time and
+    hit/miss through ``current()`` and serialization is added by whoever
+    builds or renders the payload.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.query_listeners = []
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        for listener in self.query_listeners:
+            listener(sql)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds['db'] += time.perf_counter() - started
+            self.queries += 1
+
+    def add(self, phase: str, seconds: float):
+        self.seconds[phase] += max(seconds, 0.0)
+
+    def record_cache(self, seconds: float, hit: bool):
+        self.add('cache', seconds)
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def stop_render(self, response=None):
+        if self._render_started is not None:
+            self.add('serialize', time.perf_counter() - self._render_started)
+            self._render_started = None
+
+    def finish(self):
+        self.seconds['total'] = time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value, durations in milliseconds."""
+        descriptions = {
+            'db': f'{self.queries} queries',
+            'cache': f'{self.cache_hits} hits/{self.cache_misses} misses',
+        }
+        entries = []
+        for phase in PHASES:
+            entry = f'{phase};dur={self.seconds[phase] * 1000:.2f}'
+            if phase in descriptions:
+                entry += f';desc="{descriptions[phase]}"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+def current():
+    """The ``RequestTiming`` of the request being served, if any."""
+    return _current.get()
+
+
+def activate(timing):
+    return _current.set(timing)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def time_queries(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # Connections are per thread, and async views query from worker
+    # threads, so every connection carries the wrapper for good and the
+    # context variable says which request (if any) the query belongs to.
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON = 'ndjson'
+JSON = 'json'
+CONTENT_TYPES = {
+    NDJSON: 'application/x-ndjson',
+    JSON: 'application/json',
+}
+
+
+def _serialized_rows(queryset, serializer_class, context, chunk_size):
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) == chunk_size:
+            yield from serializer_class(batch, many=True, context=context).data
+            batch = []
+    if batch:
+        yield from serializer_class(batch, many=True, context=context).data
+
+
+def _ndjson(rows, encoder):
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def _json_array(rows, encoder):
+    yield '['
+    for index, row in enumerate(rows):
+        yield (',\n' if index else '\n') + encoder.encode(row)
+    yield '\n]\n'
+
+
+def stream_export(queryset, serializer_class, export_format, context=None, chunk_size=None):
+    """
+    Stream every row of ``queryset`` as NDJSON or as one JSON array.
+
+    Rows are fetched with ``iterator()`` and serialized ``chunk_size`` at a
+    time, so memory stays flat however large the queryset is.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    rows = _serialized_rows(queryset, serializer_class, context or {}, chunk_size)
+    body = _ndjson(rows, encoder) if export_format == NDJSON else _json_array(rows, encoder)
+    return StreamingHttpResponse(body, content_type=CONTENT_TYPES[export_format])
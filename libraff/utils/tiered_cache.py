@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from utils.async_cache import async_cache
+
+logger = logging.getLogger('django')
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """Bounded in-process cache whose entries expire after ``timeout`` seconds."""
+
+    def __init__(self, max_entries: int, timeout: int):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None or timeout is DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        expires_at = time.monotonic() + min(timeout, self.timeout)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    Optional in-process L1 in front of the ``default`` cache (L2).
+
+    L1 entries are dropped when another process publishes their key on
+    ``CACHE_INVALIDATION_CHANNEL``, and expire after ``CACHE_L1_TIMEOUT``
+    seconds in any case, so a missed message only costs that long.
+    """
+
+    def __init__(self, backend=cache, enabled=None, max_entries=None, timeout=None):
+        if enabled is None:
+            enabled = settings.CACHE_L1_ENABLED
+        self.backend = backend
+        self.local = LocalLRUCache(
+            max_entries or settings.CACHE_L1_MAX_ENTRIES,
+            timeout or settings.CACHE_L1_TIMEOUT,
+        ) if enabled else None
+        self.channel = settings.CACHE_INVALIDATION_CHANNEL
+        self.counters = dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0,
+        )
+        self._counters_lock = threading.Lock()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def get(self, key, default=None):
+        if self.local is not None:
+            self._ensure_listener()
+            value = self.local.get(key, _MISSING)
+            if value is not _MISSING:
+                self._count('l1_hits')
+                return value
+            self._count('l1_misses')
+
+        value = self.backend.get(key, _MISSING)
+        if value is _MISSING:
+            self._count('l2_misses')
+            return default
+        self._count('l2_hits')
+        if self.local is not None:
+            self.local.set(key, value)
+        return value
+
+    async def aget(self, key, default=None):
+        """``get`` for async views: L1 is in memory, L2 goes through ``async_cache``."""
+        if self.local is not None:
+            self._ensure_listener()
+            value = self.local.get(key, _MISSING)
+            if value is not _MISSING:
+                self._count('l1_hits')
+                return value
+            self._count('l1_misses')
+
+        value = await async_cache.get(key, _MISSING)
+        if value is _MISSING:
+            self._count('l2_misses')
+            return default
+        self._count('l2_hits')
+        if self.local is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.backend.set(key, value, timeout=timeout)
+        if self.local is not None:
+            self.local.set(key, value, timeout)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT):
+        await async_cache.set(key, value, timeout=timeout)
+        if self.local is not None:
+            self.local.set(key, value, timeout)
+
+    def delete(self, key):
+        self.backend.delete(key)
+        self.invalidate(key)
+
+    def invalidate(self, *keys):
+        """Drop ``keys`` from this process's L1 and tell every other process to."""
+        if self.local is None:
+            # L1 is configured off everywhere; nobody listens.
+            return
+        for key in keys:
+            self.local.delete(key)
+        if keys and _uses_redis():
+            try:
+                from django_redis import get_redis_connection
+
+                get_redis_connection('default').publish(self.channel, '\n'.join(keys))
+            except Exception:
+                logger.warning('Failed to publish cache invalidation', exc_info=True)
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            stats = dict(self.counters)
+        stats['l1_enabled'] = self.local is not None
+        stats['l1_entries'] = len(self.local) if self.local is not None else 0
+        return stats
+
+    def _count(self, name):
+        # += on a dict entry is not atomic across threads.
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def _ensure_listener(self):
+        if self._listener is not None or not _uses_redis():
+            return
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen,
+                    name='cache-invalidation-listener',
+                    daemon=True,
+                )
+                self._listener.start()
+
+    def _listen(self):
+        from django_redis import get_redis_connection
+
+        while True:
+            try:
+                pubsub = get_redis_connection('default').pubsub(
+                    ignore_subscribe_messages=True,
+                )
+                pubsub.subscribe(self.channel)
+                # Messages sent while we were not subscribed are lost.
+                self.local.clear()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    for key in message['data'].decode().split('\n'):
+                        self.local.delete(key)
+            except Exception:
+                logger.warning('Cache invalidation listener disconnected', exc_info=True)
+                self.local.clear()
+                time.sleep(1)
+
+
+def _uses_redis() -> bool:
+    return settings.CACHES['default']['BACKEND'].startswith('django_redis')
+
+
+tiered_cache = TieredCache()
@@ -0,0 +1,148 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+
+
+def insert_counted(model, values: dict, counter_model, counter_pk, counter_field: str):
+    """
+    ``INSERT ... ON CONFLICT DO NOTHING`` one ``model`` row and add one to
+    ``counter_field`` of the ``counter_model`` row if it went in.
+
+    Returns ``(instance, counter)``: the new instance, or None when a unique
+    constraint already held an equal row, and the counter afterwards.
+    ``post_save`` is sent for a new row with ``counted=True`` so counter
+    receivers know the shift has been made.
+    """
+    columns, params = _columns(model, values)
+    row, count = _execute_counted(
+        f'INSERT INTO {_table(model)} ({", ".join(columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT DO NOTHING RETURNING {_pk(model)}',
+        params,
+        counter_model,
+        counter_pk,
+        counter_field,
+        1,
+    )
+    instance = None if row is None else model(pk=row[0], **values)
+    if instance is not None:
+        post_save.send(
+            sender=model,
+            instance=instance,
+            created=True,
+            update_fields=None,
+            raw=False,
+            using=connection.alias,
+            counted=True,
+        )
+    return instance, count
+
+
+def delete_counted(model, filters: dict, counter_model, counter_pk, counter_field: str):
+    """
+    Delete the ``model`` row whose columns equal ``filters`` (a unique key)
+    and take one off ``counter_field`` if a row went. Returns
+    ``(instance, counter)`` and sends ``post_delete`` like
+    :func:`insert_counted` does ``post_save``; the instance carries every
+    column of the deleted row, as read by ``RETURNING``.
+    """
+    columns, params = _columns(model, filters)
+    fields = model._meta.concrete_fields
+    row, count = _execute_counted(
+        f'DELETE FROM {_table(model)} '
+        f'WHERE {" AND ".join(f"{column} = %s" for column in columns)} '
+        f'RETURNING {", ".join(connection.ops.quote_name(field.column) for field in fields)}',
+        params,
+        counter_model,
+        counter_pk,
+        counter_field,
+        -1,
+    )
+    instance = None if row is None else _from_row(model, fields, row)
+    if instance is not None:
+        post_delete.send(
+            sender=model,
+            instance=instance,
+            using=connection.alias,
+            origin=instance,
+            counted=True,
+        )
+    return instance, count
+
+
+def _execute_counted(statement, params, counter_model, counter_pk, counter_field, step):
+    """
+    Run ``statement`` (which returns the changed row, pk first) and shift
+    the counter by ``step`` per changed row. Returns ``(row, counter)``,
+    ``row`` being None when nothing changed. On PostgreSQL both go in one
+    statement, so the common case is a single round trip; elsewhere they
+    share a transaction. A missing counter row raises
+    ``counter_model.DoesNotExist`` and rolls the change back.
+    """
+    with transaction.atomic():
+        if connection.vendor != 'postgresql':
+            row = _fetchone(statement, params)
+            return row, _shift(counter_model, counter_pk, counter_field, step if row else 0)
+
+        column = connection.ops.quote_name(counter_model._meta.get_field(counter_field).column)
+        shifted = f'{column} {"+" if step > 0 else "-"} (SELECT COUNT(*) FROM changed)'
+        row = _fetchone(
+            f'WITH changed AS ({statement}), '
+            f'counted AS (UPDATE {_table(counter_model)} '
+            # Never push a drifted counter below zero; reconciliation fixes it.
+            f'SET {column} = GREATEST({shifted}, 0) '
+            f'WHERE {_pk(counter_model)} = %s RETURNING {column} AS counter_value) '
+            f'SELECT counted.counter_value, changed.* '
+            f'FROM counted LEFT JOIN changed ON TRUE',
+            [*params, counter_pk],
+        )
+        if row is None:
+            raise counter_model.DoesNotExist
+        # The LEFT JOIN pads an unchanged row with NULLs.
+        return (None if row[1] is None else row[1:]), row[0]
+
+
+def _shift(model, pk, field: str, step: int) -> int:
+    queryset = model.objects.filter(pk=pk)
+    if step:
+        queryset.update(**{field: Greatest(F(field) + step, 0)})
+    count = queryset.values_list(field, flat=True).first()
+    if count is None:
+        raise model.DoesNotExist
+    return count
+
+
+def _fetchone(sql: str, params: list):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def _from_row(model, fields, row):
+    """A ``model`` instance of raw ``row`` values, converted like a query's."""
+    values = []
+    for field, value in zip(fields, row):
+        expression = field.get_col(model._meta.db_table)
+        for converter in connection.ops.get_db_converters(expression) + expression.get_db_converters(connection):
+            value = converter(value, expression, connection)
+        values.append(value)
+    return model.from_db(connection.alias, [field.attname for field in fields], values)
+
+
+def _columns(model, values: dict) -> tuple[list, list]:
+    fields = [model._meta.get_field(name) for name in values]
+    columns = [connection.ops.quote_name(field.column) for field in fields]
+    params = [
+        field.get_db_prep_save(values[name], connection)
+        for name, field in zip(values, fields)
+    ]
+    return columns, params
+
+
+def _table(model) -> str:
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _pk(model) -> str:
+    return connection.ops.quote_name(model._meta.pk.column)